@@ -1,3 +1,10 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import CartItem
+
+
+@admin.register(CartItem)
+class CartItemAdmin(admin.ModelAdmin):
+    list_display = ['id', 'user', 'product', 'quantity', 'price', 'time_update']
+    list_display_links = ['id', 'user']
+    raw_id_fields = ['user', 'product']
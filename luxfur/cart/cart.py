@@ -1,6 +1,81 @@
-from decimal import Decimal
-from config import settings
+from decimal import Decimal, InvalidOperation
+from shop.caching import get_price_version
 from shop.models import Product
+from .stores import get_cart_store, compact_price, encode_cart, decode_cart  # noqa: F401
+
+
+def parse_price(value):
+    """
+    Цена строки корзины из хранилища
+    :param value: строка цены
+    :return: Decimal или None, если цену не разобрать (например, 'None' у товара без цены,
+     попавшего в корзину до проверки цены при добавлении)
+    """
+    try:
+        price = Decimal(value)
+    except (InvalidOperation, TypeError, ValueError):
+        return None
+    return price if price.is_finite() else None
+
+
+class CartLine:
+    """
+    Строка корзины для шаблонов и оформления заказа. Неизменяемая, в сессии не хранится:
+    в сессии остаются только id товара, кол-во и цена (см. encode_cart)
+    """
+    __slots__ = ('product', 'quantity', 'price', 'total_price', 'previous_price', 'available')
+
+    def __init__(self, product, quantity: int, price: Decimal, previous_price=None, available=None):
+        """
+        :param previous_price: цена в корзине до сверки с каталогом, если она изменилась
+        :param available: остаток товара, если его меньше кол-ва в корзине
+        """
+        object.__setattr__(self, 'product', product)
+        object.__setattr__(self, 'quantity', quantity)
+        object.__setattr__(self, 'price', price)
+        object.__setattr__(self, 'total_price', price * quantity)
+        object.__setattr__(self, 'previous_price', previous_price)
+        object.__setattr__(self, 'available', available)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f'{type(self).__name__} нельзя изменить')
+
+    def __delattr__(self, name):
+        raise AttributeError(f'{type(self).__name__} нельзя изменить')
+
+    def __repr__(self):
+        return f'<CartLine {self.product.pk} x {self.quantity}>'
+
+
+class CartPricing:
+    """
+    Результат сверки корзины с текущими ценами и остатками каталога
+    """
+
+    def __init__(self, previous_prices: dict, available: dict, removed: list):
+        """
+        :param previous_prices: {id товара: прежняя цена} для строк, цена которых изменилась
+        :param available: {id товара: остаток} для строк, кол-во которых больше остатка
+        :param removed: id товаров, которые удалены из каталога или сняты с продажи и убраны из корзины
+        """
+        self.previous_prices = previous_prices
+        self.available = available
+        self.removed = removed
+
+    def __bool__(self):
+        return bool(self.previous_prices or self.available or self.removed)
+
+
+def get_cart(request) -> 'Cart':
+    """
+    Корзина текущего запроса. Создается один раз на запрос, поэтому контекстный процессор,
+    представление и шаблоны используют одни и те же загруженные строки и итоги
+    :param request: HttpRequest
+    :return: Cart
+    """
+    if not hasattr(request, '_cart'):
+        request._cart = Cart(request)
+    return request._cart
 
 
 class Cart(object):
@@ -8,17 +83,43 @@ class Cart(object):
     Класс позволяет управлять корзиной покупок
     """
 
-    def __init__(self, request):
+    def __init__(self, request, store=None):
         """
-        Инициализируем корзину
+        Инициализируем корзину. Хранилище при этом не читается и не изменяется, поэтому корзину
+        можно создавать на каждой странице: посетителю без корзины сессия не создается
+        :param store: хранилище корзины (см. cart.stores), по умолчанию выбирается по пользователю запроса
         """
         self.session = request.session  # Инициализируем сессию с помощью объекта request
         # также с помощью объекта request мы храним текущую сессию корзины для других методов класса
-        cart = self.session.get(settings.CART_SESSION_ID)  # пытаемся получить корзину из текущей сессии
-        if not cart:
-            cart = self.session[
-                settings.CART_SESSION_ID] = {}  # если корзина в сессии отсутствует мы создаем пустую корзину установив в ней пустой словарь
-        self.cart = cart
+        self.store = store or get_cart_store(request)
+        self._changed = set()  # id товаров, строки которых нужно записать в хранилище
+        self._removed = set()
+        self._cart = None
+        self._price_version = None
+        self._lines = None  # строки с товарами, загружаются при первом переборе
+        self._totals = None  # кол-во товаров и общая стоимость
+        self._pricing = None  # сверка с ценами и остатками каталога
+
+    @property
+    def cart(self):
+        """
+        Содержимое корзины. Хранилище читается при первом обращении, пустая корзина в него
+        не записывается, это делает только save() при изменении корзины
+        :return: словарь {id товара: {'quantity': кол-во, 'price': цена}}
+        """
+        if self._cart is None:
+            # пытаемся получить корзину из хранилища, если ее нет - корзина пуста
+            self._cart, self._price_version = self.store.load()
+        return self._cart
+
+    @property
+    def price_version(self):
+        """
+        Версия цен каталога на момент последнего изменения корзины, None - неизвестна
+        :return: номер версии или None
+        """
+        self.cart  # версия читается из хранилища вместе с корзиной
+        return self._price_version
 
     def add(self, product, quantity=1, update_quantity=False):
         """
@@ -28,6 +129,25 @@ class Cart(object):
         :param update_quantity:
         :return:
         """
+        self._add(product, quantity, update_quantity)
+        self.save()
+
+    def add_many(self, lines, update_quantity=False):
+        """
+        Добавляет несколько товаров в корзину в памяти и сохраняет корзину один раз
+        :param lines: список (товар, кол-во)
+        :param update_quantity: True - заменить кол-во, False - прибавить к кол-ву в корзине
+        :return: None
+        """
+        for product, quantity in lines:
+            self._add(product, quantity, update_quantity)
+        if lines:
+            self.save()
+
+    def _add(self, product, quantity, update_quantity):
+        """
+        Изменяет строку товара в корзине без сохранения
+        """
         product_id = str(product.id)  # присваиваем переменной id продукта в строковом формате(джанго для сериализации
         # использует JSON). Здесь id продукта используется в качестве ключа в словаре содержимого продукта
 
@@ -35,23 +155,27 @@ class Cart(object):
             # если продукта нет в корзине, то добавляем кол-во и цену
             self.cart[product_id] = {
                 'quantity': 0,
-                'price': str(product.price)
+                'price': compact_price(product.price)
             }
         if update_quantity:
             self.cart[product_id]['quantity'] = quantity
         else:
             self.cart[product_id]['quantity'] += quantity
-        self.save()
+        self._changed.add(product_id)
+        self._removed.discard(product_id)
 
     def save(self):
         """
         Сохраняет все изменения в корзине
         :return:
         """
-        # Обновление сессии cart
-        self.session[settings.CART_SESSION_ID] = self.cart
-        # Отметить сеанс как "измененный", чтобы убедиться, что он сохранен
-        self.session.modified = True
+        self._price_version = get_price_version()
+        # строки, итоги и сверка будут посчитаны заново
+        self._lines = None
+        self._totals = None
+        self._pricing = None
+        self.store.save(self.cart, self._price_version, self._changed, self._removed)
+        self._changed, self._removed = set(), set()
 
     def remove(self, product):
         """
@@ -62,23 +186,102 @@ class Cart(object):
 
         if product_id in self.cart:
             del self.cart[product_id]
+            self._changed.discard(product_id)
+            self._removed.add(product_id)
             self.save()
 
+    def get_pricing(self) -> CartPricing:
+        """
+        Сверка корзины с каталогом. Цены в корзине запоминаются при добавлении товара и могут устареть,
+        например после правки цен в админке или импорта, поэтому цена и остаток всех товаров корзины
+        выбираются одним узким запросом без загрузки самих товаров. Результат запоминается
+        до следующего изменения корзины
+        :return: CartPricing
+        """
+        if self._pricing is None:
+            rows = {}
+            # time_update не выбирается: чтобы пропускать по нему неизменные строки, корзине нужно хранить время
+            # последней сверки, а auto_now не меняется при queryset.update() без time_update. Цена и остаток
+            # сравниваются напрямую, это точнее и не дороже сравнения времени
+            if self.cart:
+                rows = {pk: (price, quantity) for pk, price, quantity in Product.objects.filter(
+                    pk__in=[int(product_id) for product_id in self.cart]).values_list('pk', 'price', 'quantity')}
+            self._reconcile(rows)
+        return self._pricing
+
+    def _reconcile(self, rows: dict) -> None:
+        """
+        Записывает в корзину изменившиеся цены и удаляет строки товаров, которых больше нет в каталоге
+        или у которых нет цены. Хранилище сохраняется один раз, только если корзина изменилась
+        :param rows: {id товара: (цена, остаток)} для товаров корзины
+        """
+        previous_prices, available, removed = {}, {}, []
+        for product_id, item in list(self.cart.items()):
+            price, quantity = rows.get(int(product_id), (None, None))
+            if price is None:
+                del self.cart[product_id]
+                self._changed.discard(product_id)
+                self._removed.add(product_id)
+                removed.append(int(product_id))
+                continue
+            stored = parse_price(item['price'])
+            if price != stored:
+                # испорченную цену заменяем ценой каталога без сообщения об изменении цены
+                if stored is not None:
+                    previous_prices[int(product_id)] = stored
+                item['price'] = compact_price(price)
+                self._changed.add(product_id)
+            if (quantity or 0) < item['quantity']:
+                available[int(product_id)] = quantity or 0
+        if self._changed or self._removed:
+            self.save()
+        self._pricing = CartPricing(previous_prices, available, removed)
+
     def __iter__(self):
         """
-        Перебор элементов в корзине и получение продуктов из базы данных.
+        Перебор строк корзины по ценам, сверенным с каталогом (см. get_pricing). Товары загружаются
+        одним запросом при первом переборе, только поля для вывода и, если сверки еще не было,
+        цена и остаток для нее. Повторный перебор в том же запросе использует загруженные строки
         """
+        if self._lines is None:
+            fields = ['pk', 'name', 'slug', 'image']
+            reconcile = self._pricing is None
+            if reconcile:
+                fields += ['price', 'quantity']
+            products = Product.objects.only(*fields).in_bulk([int(product_id) for product_id in self.cart])
+            if reconcile:
+                self._reconcile({pk: (product.price, product.quantity) for pk, product in products.items()})
+            pricing = self._pricing
+            self._lines = [CartLine(products[int(product_id)], item['quantity'], Decimal(item['price']),
+                                    pricing.previous_prices.get(int(product_id)),
+                                    pricing.available.get(int(product_id)))
+                           for product_id, item in self.cart.items() if int(product_id) in products]
+        return iter(self._lines)
 
-        product_ids = self.cart.keys()
-        # получение объектов product и добавление их в корзину
-        products = Product.objects.filter(id__in=product_ids)
-        for product in products:
-            self.cart[str(product.id)]['product'] = product
+    def get_line(self, product):
+        """
+        Строка корзины одного товара без загрузки остальных товаров корзины
+        :param product: товар
+        :return: CartLine или None, если товара нет в корзине
+        """
+        item = self.cart.get(str(product.id))
+        if item is None or parse_price(item['price']) is None:
+            return None
+        return CartLine(product, item['quantity'], parse_price(item['price']))
 
-        for item in self.cart.values():
-            item['price'] = Decimal(item['price'])
-            item['total_price'] = item['price'] * item['quantity']
-            yield item
+    def get_totals(self) -> tuple:
+        """
+        Кол-во товаров и общая стоимость по данным сессии, без обращения к базе данных.
+        Считаются один раз до изменения корзины. Строки с неразборчивой ценой не учитываются,
+        их исправляет или удаляет сверка с каталогом (см. get_pricing)
+        :return: (кол-во, стоимость)
+        """
+        if self._totals is None:
+            items = [(item['quantity'], parse_price(item['price'])) for item in self.cart.values()]
+            items = [(quantity, price) for quantity, price in items if price is not None]
+            self._totals = (sum(quantity for quantity, _ in items),
+                            Decimal(sum(price * quantity for quantity, price in items)))
+        return self._totals
 
     def __len__(self):
         """
@@ -86,16 +289,20 @@ class Cart(object):
         :return:
         """
 
-        return sum(item['quantity'] for item in self.cart.values())
+        return self.get_totals()[0]
 
     def get_total_price(self):
         """
         Подсчитывает стоимость всех товаров в корзине
         :return:
         """
-        return Decimal(sum(item['price'] * item['quantity'] for item in self.cart.values()))
+        return self.get_totals()[1]
 
     def clear(self):
-        # удаление корзины из сессии
-        del self.session[settings.CART_SESSION_ID]
-        self.session.modified = True
+        # удаление корзины из хранилища
+        self._cart = None
+        self._lines = None
+        self._totals = None
+        self._pricing = None
+        self._changed, self._removed = set(), set()
+        self.store.clear()
@@ -1,5 +1,5 @@
-from .cart import Cart
+from .cart import get_cart
 
 
 def cart_context_processor(request):
-    return {'cart': Cart(request)}
\ No newline at end of file
+    return {'cart': get_cart(request)}
\ No newline at end of file
@@ -1,4 +1,8 @@
 from django import forms
+from django.conf import settings
+from django.db.models import Q
+
+from shop.models import Product
 
 
 class CartAddProductForm(forms.Form):
@@ -6,4 +10,71 @@ class CartAddProductForm(forms.Form):
     PRODUCT_QUANTITY_CHOICES = [(i, str(i)) for i in range(1, 21)]
 
     quantity = forms.TypedChoiceField(choices=PRODUCT_QUANTITY_CHOICES, coerce=int)
-    update = forms.BooleanField(required=False, initial=False, widget=forms.HiddenInput)
\ No newline at end of file
+    update = forms.BooleanField(required=False, initial=False, widget=forms.HiddenInput)
+
+class CartBulkAddForm(forms.Form):
+    """
+    Оптовое добавление в корзину: список строк {"product_id": id, "quantity": кол-во}
+    или {"vendor_code": артикул, "quantity": кол-во}. Все товары проверяются одним запросом,
+    при ошибке в любой строке в корзину ничего не добавляется
+    """
+    items = forms.JSONField()
+    update = forms.BooleanField(required=False, initial=False)
+
+    def clean_items(self):
+        """
+        Проверяет строки и находит товары одним запросом по id и артикулам.
+        Строки с одним и тем же товаром объединяются
+        :return: список (товар, кол-во) в порядке первого упоминания товара
+        """
+        items = self.cleaned_data['items']
+        if not isinstance(items, list) or not items:
+            raise forms.ValidationError('Передайте непустой список строк')
+        if len(items) > settings.CART_BULK_MAX_LINES:
+            raise forms.ValidationError(f'Не больше {settings.CART_BULK_MAX_LINES} строк за один запрос')
+
+        keys = []
+        errors = []
+        for number, item in enumerate(items, 1):
+            if not isinstance(item, dict) or ('product_id' in item) == ('vendor_code' in item):
+                errors.append(f'Строка {number}: укажите product_id или vendor_code')
+                continue
+            quantity = item.get('quantity', 1)
+            if type(quantity) is not int or not 1 <= quantity <= settings.CART_BULK_MAX_QUANTITY:
+                errors.append(f'Строка {number}: кол-во должно быть от 1 до {settings.CART_BULK_MAX_QUANTITY}')
+                continue
+            if 'product_id' in item:
+                if type(item['product_id']) is not int:
+                    errors.append(f'Строка {number}: product_id должен быть числом')
+                    continue
+                keys.append((number, 'product_id', item['product_id'], quantity))
+            else:
+                if not isinstance(item['vendor_code'], str) or not item['vendor_code'].strip():
+                    errors.append(f'Строка {number}: vendor_code должен быть непустой строкой')
+                    continue
+                keys.append((number, 'vendor_code', item['vendor_code'].strip(), quantity))
+        if errors:
+            raise forms.ValidationError(errors)
+
+        ids = {key for _, kind, key, _ in keys if kind == 'product_id'}
+        codes = {key for _, kind, key, _ in keys if kind == 'vendor_code'}
+        by_id, by_code = {}, {}
+        for product in Product.objects.filter(Q(pk__in=ids) | Q(vendor_code__in=codes)).only(
+                'pk', 'name', 'slug', 'price', 'vendor_code', 'image'):
+            by_id[product.pk] = product
+            by_code[product.vendor_code] = product
+
+        lines = {}
+        for number, kind, key, quantity in keys:
+            product = (by_id if kind == 'product_id' else by_code).get(key)
+            if product is None:
+                errors.append(f'Строка {number}: товар {key} не найден')
+            elif product.price is None:
+                errors.append(f'Строка {number}: у товара "{product.name}" нет цены')
+            elif product.pk in lines:
+                lines[product.pk] = (product, lines[product.pk][1] + quantity)
+            else:
+                lines[product.pk] = (product, quantity)
+        if errors:
+            raise forms.ValidationError(errors)
+        return list(lines.values())
@@ -0,0 +1,48 @@
+import random
+import timeit
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management.base import BaseCommand, CommandError
+
+from cart.cart import encode_cart, decode_cart, compact_price
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает размер сессии и время ее кодирования и чтения для прежней записи корзины '
+            '(словарь) и компактной строки. Работает без базы данных')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', type=int, nargs='+', default=[1, 20, 200], help='Кол-во строк корзины')
+        parser.add_argument('--repeat', type=int, default=2000, help='Кол-во повторов для замера времени')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1 or min(options['lines']) < 1:
+            raise CommandError('--lines и --repeat должны быть больше нуля')
+        random.seed(0)
+        store = SessionStore()
+        self.stdout.write(f'{"строк":>6} {"формат":>10} {"байт":>8} {"запись, мкс":>12} {"чтение, мкс":>12}')
+        for lines in options['lines']:
+            # цены в рублях с копейками, как str(product.price) в прежней записи
+            prices = [Decimal(random.randint(1, 5000) * 10) / 10 for _ in range(lines)]
+            product_ids = random.sample(range(1, 200_000), lines)
+            quantities = [random.randint(1, 20) for _ in range(lines)]
+            legacy = {str(product_id): {'quantity': quantity, 'price': f'{price:.2f}'}
+                      for product_id, quantity, price in zip(product_ids, quantities, prices)}
+            compact = {str(product_id): {'quantity': quantity, 'price': compact_price(price)}
+                       for product_id, quantity, price in zip(product_ids, quantities, prices)}
+            formats = {
+                'словарь': (lambda: legacy, lambda value: value),
+                'строка': (lambda: encode_cart(compact, 1_712_345_678_000_000_000),
+                           lambda value: decode_cart(value)[0]),
+            }
+            for name, (encode, decode) in formats.items():
+                payload = store.encode({settings.CART_SESSION_ID: encode()})
+                # запись: корзина в значение сессии и сессия в строку для базы данных
+                write = timeit.timeit(lambda: store.encode({settings.CART_SESSION_ID: encode()}),
+                                      number=options['repeat'])
+                read = timeit.timeit(lambda: decode(store.decode(payload)[settings.CART_SESSION_ID]),
+                                     number=options['repeat'])
+                self.stdout.write(f'{lines:>6} {name:>10} {len(payload):>8} '
+                                  f'{write / options["repeat"] * 1e6:>12.1f} {read / options["repeat"] * 1e6:>12.1f}')
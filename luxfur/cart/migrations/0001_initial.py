@@ -0,0 +1,39 @@
+# Generated by Django 5.0.1 on 2026-10-18 13:34
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('shop', '0009_relatedproduct'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CartItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField(verbose_name='Кол-во товара')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10, null=True, verbose_name='Цена при добавлении')),
+                ('price_version', models.BigIntegerField(blank=True, null=True, verbose_name='Версия цен при добавлении')),
+                ('time_update', models.DateTimeField(auto_now=True, verbose_name='Время изменения')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='shop.product', verbose_name='Товар')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cart_items', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Товар в корзине',
+                'verbose_name_plural': 'Товары в корзине',
+                'ordering': ['user', 'pk'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='cartitem',
+            constraint=models.UniqueConstraint(fields=('user', 'product'), name='cart_cartitem_user_product_uniq'),
+        ),
+    ]
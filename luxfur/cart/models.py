@@ -1,3 +1,29 @@
+from django.conf import settings
 from django.db import models
 
-# Create your models here.
+from shop.models import Product
+
+
+class CartItem(models.Model):
+    """
+    Строка корзины авторизованного пользователя. Корзина хранится в базе данных,
+    поэтому доступна с любого устройства и не увеличивает сессию
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='cart_items',
+                             verbose_name="Пользователь")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+', verbose_name="Товар")
+    quantity = models.PositiveIntegerField(verbose_name="Кол-во товара")
+    price = models.DecimalField(max_digits=10, decimal_places=2, null=True, verbose_name="Цена при добавлении")
+    price_version = models.BigIntegerField(null=True, blank=True, verbose_name="Версия цен при добавлении")
+    time_update = models.DateTimeField(auto_now=True, verbose_name="Время изменения")
+
+    def __str__(self):
+        return f'{self.user_id}: {self.product_id} x {self.quantity}'
+
+    class Meta:
+        verbose_name = "Товар в корзине"
+        verbose_name_plural = "Товары в корзине"
+        ordering = ['user', 'pk']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'product'], name='cart_cartitem_user_product_uniq'),
+        ]
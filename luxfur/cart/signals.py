@@ -0,0 +1,17 @@
+from django.contrib.auth.signals import user_logged_in
+from django.dispatch import receiver
+
+from .stores import merge_guest_cart
+
+
+@receiver(user_logged_in)
+def merge_cart_on_login(sender, request, user, **kwargs):
+    """
+    Переносит корзину гостя в корзину пользователя при входе
+    """
+    if request is None:
+        return
+    merge_guest_cart(request.session, user)
+    # корзина запроса была создана до входа и читала сессию
+    if hasattr(request, '_cart'):
+        del request._cart
@@ -0,0 +1,80 @@
+// Изменение кол-ва и удаление товаров на странице корзины без перезагрузки: запрос уходит в API корзины,
+// строка, итог и шапка заменяются готовыми фрагментами из ответа
+(function () {
+    var table = document.querySelector('table.cart');
+    if (!table || !window.fetch) {
+        return;
+    }
+
+    function csrfToken() {
+        var match = document.cookie.match(/(?:^|;\s*)csrftoken=([^;]+)/);
+        return match ? decodeURIComponent(match[1]) : '';
+    }
+
+    function replace(element, html) {
+        if (!element) {
+            return;
+        }
+        if (html) {
+            element.insertAdjacentHTML('afterend', html);
+        }
+        element.remove();
+    }
+
+    function send(url, productId, quantity) {
+        var body = new FormData();
+        body.append('fragment', '1');
+        if (quantity !== undefined) {
+            body.append('quantity', quantity);
+        }
+        return fetch(url, {method: 'POST', body: body, headers: {'X-CSRFToken': csrfToken()}})
+            .then(function (response) {
+                if (!response.ok) {
+                    throw new Error(response.status);
+                }
+                return response.json();
+            })
+            .then(function (data) {
+                if (!data.count) {
+                    // пустая корзина: кнопка оформления заказа и рекомендации больше не нужны
+                    window.location.reload();
+                    return;
+                }
+                replace(document.getElementById('cart-line-' + productId), data.html.line);
+                replace(document.getElementById('cart-total'), data.html.total);
+                replace(document.getElementById('cart-summary'), data.html.summary);
+            });
+    }
+
+    table.addEventListener('click', function (event) {
+        var link = event.target.closest('a[data-cart-remove]');
+        if (!link) {
+            return;
+        }
+        event.preventDefault();
+        var row = link.closest('tr');
+        send(link.dataset.cartRemove, row.id.replace('cart-line-', ''))
+            .catch(function () { window.location.href = link.href; });
+    });
+
+    function update(form) {
+        var row = form.closest('tr');
+        send(form.dataset.cartUpdate, row.id.replace('cart-line-', ''), form.elements.quantity.value)
+            .catch(function () { form.submit(); });
+    }
+
+    table.addEventListener('change', function (event) {
+        var form = event.target.closest('form[data-cart-update]');
+        if (form) {
+            update(form);
+        }
+    });
+
+    table.addEventListener('submit', function (event) {
+        var form = event.target.closest('form[data-cart-update]');
+        if (form) {
+            event.preventDefault();
+            update(form);
+        }
+    });
+})();
@@ -0,0 +1,199 @@
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import transaction
+
+from shop.caching import bump_user_cart_version
+from .models import CartItem
+
+
+def compact_price(price) -> str:
+    """
+    Цена без лишних нулей: "1500.00" -> "1500", "99.90" -> "99.9"
+    """
+    try:
+        return format(Decimal(price).normalize(), 'f')
+    except (InvalidOperation, TypeError, ValueError):
+        return str(price)
+
+
+def encode_cart(cart: dict, price_version) -> str:
+    """
+    Компактная запись корзины для сессии: версия цен и строки "id:кол-во:цена" через запятую,
+    например "1712345678|12:2:1500,15:1:99.9". Строка короче словаря со строковыми ключами
+    и кодируется в JSON как одно значение при каждом сохранении сессии
+    :param cart: словарь {id товара: {'quantity': кол-во, 'price': цена}}
+    :param price_version: версия цен каталога, при которой цены записаны в корзину
+    :return: строка
+    """
+    lines = ','.join(f'{product_id}:{item["quantity"]}:{item["price"]}' for product_id, item in cart.items())
+    return f'{price_version or ""}|{lines}'
+
+
+def decode_cart(value) -> tuple:
+    """
+    Корзина из сессии. Понимает и компактную запись encode_cart, и прежний словарь,
+    который хранится в сессиях, созданных до перехода на компактную запись.
+    Испорченное значение считается пустой корзиной
+    :param value: значение из сессии
+    :return: (словарь {id товара: {'quantity': кол-во, 'price': цена}}, версия цен или None)
+    """
+    if not value:
+        return {}, None
+    if isinstance(value, dict):
+        return value, None
+    try:
+        price_version, _, packed = value.partition('|')
+        cart = {}
+        for line in filter(None, packed.split(',')):
+            product_id, quantity, price = line.split(':')
+            cart[product_id] = {'quantity': int(quantity), 'price': price}
+        return cart, int(price_version) if price_version else None
+    except (AttributeError, ValueError):
+        return {}, None
+
+
+class CartStore:
+    """
+    Хранилище корзины. Корзина в памяти - словарь {id товара строкой: {'quantity': кол-во, 'price': цена}},
+    хранилище загружает его целиком и записывает только измененные строки
+    """
+
+    def load(self) -> tuple:
+        """
+        :return: (словарь корзины, версия цен или None)
+        """
+        raise NotImplementedError
+
+    def save(self, cart: dict, price_version, changed: set, removed: set) -> None:
+        """
+        :param cart: вся корзина
+        :param price_version: версия цен каталога на момент изменения
+        :param changed: id товаров, строки которых добавлены или изменены
+        :param removed: id удаленных товаров
+        :return: None
+        """
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+
+class SessionCartStore(CartStore):
+    """
+    Корзина гостя в сессии в компактной записи encode_cart
+    """
+
+    def __init__(self, session):
+        self.session = session
+
+    def load(self) -> tuple:
+        return decode_cart(self.session.get(settings.CART_SESSION_ID))
+
+    def save(self, cart: dict, price_version, changed: set, removed: set) -> None:
+        # пустая корзина из сессии удаляется
+        if cart:
+            self.session[settings.CART_SESSION_ID] = encode_cart(cart, price_version)
+        else:
+            self.session.pop(settings.CART_SESSION_ID, None)
+        # Отметить сеанс как "измененный", чтобы убедиться, что он сохранен
+        self.session.modified = True
+
+    def clear(self) -> None:
+        if settings.CART_SESSION_ID in self.session:
+            del self.session[settings.CART_SESSION_ID]
+            self.session.modified = True
+
+
+class DatabaseCartStore(CartStore):
+    """
+    Корзина авторизованного пользователя в таблице CartItem. Измененные строки записываются
+    одним запросом INSERT ... ON CONFLICT, удаленные - одним DELETE
+    """
+
+    def __init__(self, user):
+        self.user = user
+
+    def load(self) -> tuple:
+        cart = {}
+        versions = []
+        for product_id, quantity, price, price_version in CartItem.objects.filter(user=self.user).order_by(
+                'pk').values_list('product_id', 'quantity', 'price', 'price_version'):
+            cart[str(product_id)] = {'quantity': quantity, 'price': compact_price(price)}
+            versions.append(price_version)
+        # цены корзины актуальны не позже самой старой строки
+        price_version = None if not versions or None in versions else min(versions)
+        return cart, price_version
+
+    def save(self, cart: dict, price_version, changed: set, removed: set) -> None:
+        with transaction.atomic():
+            if removed:
+                CartItem.objects.filter(user=self.user, product_id__in=[int(pk) for pk in removed]).delete()
+            rows = [CartItem(user=self.user, product_id=int(pk), quantity=cart[pk]['quantity'],
+                             price=cart[pk]['price'], price_version=price_version)
+                    for pk in changed if pk in cart]
+            if rows:
+                CartItem.objects.bulk_create(rows, update_conflicts=True, unique_fields=['user', 'product'],
+                                             update_fields=['quantity', 'price', 'price_version', 'time_update'])
+            # версия корзины в кеше заменяет чтение корзины при расчете ETag страниц
+            bump_user_cart_version(self.user.pk)
+
+    def clear(self) -> None:
+        CartItem.objects.filter(user=self.user).delete()
+        bump_user_cart_version(self.user.pk)
+
+
+class MemoryCartStore(CartStore):
+    """
+    Корзина в памяти процесса, для тестов и замеров без сессии и базы данных
+    """
+
+    def __init__(self, cart: dict = None, price_version=None):
+        self.cart = {pk: dict(item) for pk, item in (cart or {}).items()}
+        self.price_version = price_version
+        self.saves = 0
+
+    def load(self) -> tuple:
+        return {pk: dict(item) for pk, item in self.cart.items()}, self.price_version
+
+    def save(self, cart: dict, price_version, changed: set, removed: set) -> None:
+        self.cart = {pk: dict(item) for pk, item in cart.items()}
+        self.price_version = price_version
+        self.saves += 1
+
+    def clear(self) -> None:
+        self.cart = {}
+        self.price_version = None
+
+
+def get_cart_store(request) -> CartStore:
+    """
+    Хранилище корзины для запроса: таблица CartItem для авторизованного пользователя, сессия для гостя
+    :param request: HttpRequest
+    :return: CartStore
+    """
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return DatabaseCartStore(user)
+    return SessionCartStore(request.session)
+
+
+def merge_guest_cart(session, user) -> None:
+    """
+    Переносит корзину гостя из сессии в корзину пользователя в одной транзакции:
+    кол-во товаров, которые уже есть в корзине пользователя, складывается, цена берется из корзины гостя
+    :param session: сессия
+    :param user: пользователь
+    :return: None
+    """
+    guest = SessionCartStore(session)
+    cart, price_version = guest.load()
+    if not cart:
+        return
+    with transaction.atomic():
+        existing = dict(CartItem.objects.select_for_update().filter(
+            user=user, product_id__in=[int(pk) for pk in cart]).values_list('product_id', 'quantity'))
+        for pk, item in cart.items():
+            item['quantity'] += existing.get(int(pk), 0)
+        DatabaseCartStore(user).save(cart, price_version, set(cart), set())
+    guest.clear()
@@ -0,0 +1,187 @@
+import json
+
+from django.conf import settings
+from django.test import TestCase, RequestFactory
+from django.urls import reverse
+
+from cart.cart import Cart
+from cart.forms import CartBulkAddForm
+from cart.stores import MemoryCartStore
+from shop.models import Product, Material, Category
+
+
+class CartApiTestCase(TestCase):
+    """
+    Тестируем JSON API корзины
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        material = Material.objects.create(name='Латунь', slug='Latun')
+        category = Category.objects.create(name='Ручки для мебели', slug='ruchki-dlya-mebeli')
+        cls.handle = Product.objects.create(name='Ручка', slug='ruchka', price=100, quantity=5,
+                                            material=material, category=category)
+        cls.screw = Product.objects.create(name='Винт', slug='vint', price='10.50', quantity=5,
+                                           material=material, category=category)
+
+    def test_add_update_remove(self) -> None:
+        """
+        Тест добавления, изменения кол-ва и удаления: в ответе строка товара и итоги корзины
+        :return: None
+        """
+        self.client.post(reverse('cart:api_add', args=[self.screw.pk]), {'quantity': 2})
+        response = self.client.post(reverse('cart:api_add', args=[self.handle.pk]), {'quantity': 1})
+        self.assertEqual(response.json(), {
+            'count': 3, 'total_price': '121', 'product_id': self.handle.pk,
+            'line': {'product_id': self.handle.pk, 'name': 'Ручка', 'quantity': 1, 'price': '100',
+                     'total_price': '100'},
+        })
+
+        response = self.client.post(reverse('cart:api_update', args=[self.handle.pk]), {'quantity': 4})
+        self.assertEqual(response.json()['line']['quantity'], 4)
+        self.assertEqual(response.json()['total_price'], '421')
+
+        response = self.client.post(reverse('cart:api_remove', args=[self.handle.pk]))
+        self.assertEqual(response.json(), {'count': 2, 'total_price': '21', 'product_id': self.handle.pk,
+                                           'line': None})
+        self.assertEqual(self.client.session[settings.CART_SESSION_ID].split('|')[1], f'{self.screw.pk}:2:10.5')
+
+    def test_fragment(self) -> None:
+        """
+        Тест HTML-фрагментов строки, итога и шапки в ответе
+        :return: None
+        """
+        response = self.client.post(reverse('cart:api_add', args=[self.handle.pk]), {'quantity': 2, 'fragment': 1})
+        html = response.json()['html']
+        self.assertIn(f'id="cart-line-{self.handle.pk}"', html['line'])
+        self.assertIn('200 руб.', html['line'])
+        self.assertIn('csrfmiddlewaretoken', html['line'])
+        self.assertIn('200 руб.', html['total'])
+        self.assertIn('2 товар(ов) в корзине', html['summary'])
+
+        response = self.client.post(reverse('cart:api_remove', args=[self.handle.pk]), {'fragment': 1})
+        self.assertEqual(response.json()['html']['line'], '')
+        self.assertIn('Ваша корзина пуста', response.json()['html']['summary'])
+
+    def test_summary_without_catalog_queries(self) -> None:
+        """
+        Тест итогов корзины: товары каталога не загружаются, гостю без корзины сессия не создается
+        :return: None
+        """
+        response = self.client.get(reverse('cart:api_summary'))
+        self.assertEqual(response.json(), {'count': 0, 'total_price': '0'})
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, response.cookies)
+
+        self.client.post(reverse('cart:api_add', args=[self.screw.pk]), {'quantity': 3})
+        with self.assertNumQueries(1):  # только чтение сессии
+            response = self.client.get(reverse('cart:api_summary'))
+        self.assertEqual(response.json(), {'count': 3, 'total_price': '31.5'})
+
+    def test_errors(self) -> None:
+        """
+        Тест ошибок: неизвестный товар, товар без цены, неверное кол-во и неверный метод запроса
+        :return: None
+        """
+        response = self.client.post(reverse('cart:api_add', args=[self.screw.pk + 100]))
+        self.assertEqual(response.status_code, 404)
+        Product.objects.filter(pk=self.handle.pk).update(price=None)
+        for name in ('cart:api_add', 'cart:api_update'):
+            response = self.client.post(reverse(name, args=[self.handle.pk]), {'quantity': 1})
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json(), {'error': 'У товара "Ручка" нет цены'})
+        response = self.client.post(reverse('cart:api_update', args=[self.screw.pk]), {'quantity': 0})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('quantity', response.json()['errors'])
+        self.assertEqual(self.client.get(reverse('cart:api_add', args=[self.screw.pk])).status_code, 405)
+        self.assertNotIn(settings.CART_SESSION_ID, self.client.session)
+
+
+class CartBulkAddTestCase(TestCase):
+    """
+    Тестируем оптовое добавление товаров в корзину
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        material = Material.objects.create(name='Латунь', slug='Latun')
+        category = Category.objects.create(name='Ручки для мебели', slug='ruchki-dlya-mebeli')
+        cls.handle = Product.objects.create(name='Ручка', slug='ruchka', price=100, quantity=5, vendor_code='R-1',
+                                            material=material, category=category)
+        cls.screw = Product.objects.create(name='Винт', slug='vint', price='10.50', quantity=5, vendor_code='V-1',
+                                           material=material, category=category)
+        cls.knob = Product.objects.create(name='Кнопка', slug='knopka', quantity=5, vendor_code='K-1',
+                                          material=material, category=category)
+
+    def post(self, items, **extra):
+        return self.client.post(reverse('cart:api_bulk_add'), json.dumps({'items': items, **extra}),
+                                content_type='application/json')
+
+    def test_bulk_add(self) -> None:
+        """
+        Тест добавления по id и артикулам: строки одного товара складываются
+        :return: None
+        """
+        self.client.post(reverse('cart:api_add', args=[self.handle.pk]), {'quantity': 1})
+        response = self.post([{'product_id': self.screw.pk, 'quantity': 40}, {'vendor_code': 'R-1', 'quantity': 2},
+                              {'vendor_code': 'V-1', 'quantity': 10}])
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual((data['count'], data['total_price']), (53, '825'))
+        self.assertEqual([(line['product_id'], line['quantity']) for line in data['lines']],
+                         [(self.screw.pk, 50), (self.handle.pk, 3)])
+
+        response = self.post([{'vendor_code': 'R-1', 'quantity': 7}], update=True)
+        self.assertEqual(response.json()['lines'][0]['quantity'], 7)
+
+    def test_form_post(self) -> None:
+        """
+        Тест добавления обычной формой с JSON в поле items
+        :return: None
+        """
+        response = self.client.post(reverse('cart:api_bulk_add'),
+                                    {'items': json.dumps([{'vendor_code': 'V-1', 'quantity': 3}]), 'fragment': 1})
+        self.assertEqual(response.json()['count'], 3)
+        self.assertIn('3 товар(ов) в корзине', response.json()['html']['summary'])
+
+    def test_errors_leave_cart_unchanged(self) -> None:
+        """
+        Тест ошибок: перечислены все неверные строки, корзина не меняется
+        :return: None
+        """
+        response = self.post([{'product_id': self.handle.pk, 'quantity': 1}, {'vendor_code': 'NONE'},
+                              {'vendor_code': 'K-1'}, {'product_id': self.screw.pk, 'quantity': 0},
+                              {'product_id': 1, 'vendor_code': 'R-1'}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['message'] for error in response.json()['errors']['items']], [
+            'Строка 4: кол-во должно быть от 1 до 10000',
+            'Строка 5: укажите product_id или vendor_code',
+        ])
+        response = self.post([{'product_id': self.handle.pk}, {'vendor_code': 'NONE'}, {'vendor_code': 'K-1'}])
+        self.assertEqual([error['message'] for error in response.json()['errors']['items']], [
+            'Строка 2: товар NONE не найден',
+            'Строка 3: у товара "Кнопка" нет цены',
+        ])
+        self.assertEqual(self.post([]).status_code, 400)
+        response = self.client.post(reverse('cart:api_bulk_add'), '{', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn(settings.CART_SESSION_ID, self.client.session)
+
+    def test_one_query_and_one_save(self) -> None:
+        """
+        Тест: товары проверяются одним запросом, корзина сохраняется один раз
+        :return: None
+        """
+        items = [{'product_id': self.handle.pk, 'quantity': 1}, {'product_id': self.screw.pk, 'quantity': 2},
+                 {'vendor_code': 'R-1', 'quantity': 3}, {'vendor_code': 'V-1', 'quantity': 4}]
+        form = CartBulkAddForm({'items': json.dumps(items)})
+        with self.assertNumQueries(1):
+            self.assertTrue(form.is_valid())
+        request = RequestFactory().post('/')
+        request.session = {}
+        store = MemoryCartStore()
+        Cart(request, store=store).add_many(form.cleaned_data['items'])
+        self.assertEqual(store.saves, 1)
+        self.assertEqual(store.cart, {str(self.handle.pk): {'quantity': 4, 'price': '100'},
+                                      str(self.screw.pk): {'quantity': 6, 'price': '10.5'}})
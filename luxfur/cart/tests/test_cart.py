@@ -1,10 +1,17 @@
 from decimal import Decimal
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.sessions.middleware import SessionMiddleware
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.models import Session
+from django.db import connection
 from django.test import TestCase, RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 
-from cart.cart import Cart
+from cart.cart import Cart, get_cart, encode_cart, decode_cart, compact_price
+from cart.context_processors import cart_context_processor
 from shop.models import Product, Material, Category
 
 
@@ -265,3 +272,130 @@ class CartRemoveTestCase(CreatingAllEntities):
         cart.remove(self.product2)
         self.assertEqual(cart.cart, {'1': {'price': Decimal('1500'), 'product_id': 1, 'quantity': 5}}
                          )
+
+
+class CartLazySessionTestCase(CreatingAllEntities):
+    """
+    Тест ленивой корзины: сессия не создается, пока в корзину ничего не добавлено
+    """
+
+    def test_anonymous_visitor_without_session(self) -> None:
+        """
+        Тест страницы для посетителя без корзины: шапка с корзиной не обращается к сессии
+        и не записывает ее в базу данных
+        :return: None
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('cart:cart_detail'))
+        self.assertContains(response, 'Ваша корзина пуста')
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, response.cookies)
+        self.assertFalse([query for query in queries if 'django_session' in query['sql']])
+        self.assertFalse(Session.objects.exists())
+
+    def test_session_created_on_first_add(self) -> None:
+        """
+        Тест первой записи корзины в сессию при добавлении товара
+        :return: None
+        """
+        response = self.client.post(reverse('cart:cart_add', args=[self.product1.pk]), {'quantity': 2})
+        self.assertIn(settings.SESSION_COOKIE_NAME, response.cookies)
+        cart, _ = decode_cart(self.client.session[settings.CART_SESSION_ID])
+        self.assertEqual(cart[str(self.product1.pk)]['quantity'], 2)
+        response = self.client.get(reverse('cart:cart_detail'))
+        self.assertContains(response, '2 товар(ов) в корзине')
+
+
+class CartLinesTestCase(CreatingAllEntities):
+    """
+    Тест строк корзины CartLine
+    """
+
+    def setUp(self):
+        self.request = RequestFactory().get('/')
+        self.request.session = SessionStore()
+        cart = get_cart(self.request)
+        cart.add(self.product1, quantity=2)
+        cart.add(self.product2, quantity=1)
+
+    def test_lines_loaded_once(self) -> None:
+        """
+        Тест одного запроса товаров на весь запрос: повторный перебор, итоги и корзина
+        из контекстного процессора не обращаются к базе данных
+        :return: None
+        """
+        cart = get_cart(self.request)
+        with self.assertNumQueries(1):
+            lines = list(cart)
+            self.assertEqual(list(cart), lines)
+            self.assertEqual(len(cart), 3)
+            self.assertEqual(cart.get_total_price(), Decimal('3750'))
+            self.assertIs(cart_context_processor(self.request)['cart'], cart)
+        self.assertEqual([(line.product, line.quantity, line.total_price) for line in lines],
+                         [(self.product1, 2, Decimal('3000')), (self.product2, 1, Decimal('750'))])
+
+    def test_session_holds_primitives(self) -> None:
+        """
+        Тест содержимого сессии после перебора: только компактная строка с id, кол-вом и ценой
+        :return: None
+        """
+        cart = get_cart(self.request)
+        list(cart)
+        self.assertEqual(self.request.session[settings.CART_SESSION_ID],
+                         f'{cart.price_version}|{self.product1.pk}:2:1500,{self.product2.pk}:1:750')
+        cart.remove(self.product2)
+        self.assertEqual([line.product for line in cart], [self.product1])
+        self.assertEqual(len(cart), 2)
+
+    def test_line_is_immutable(self) -> None:
+        """
+        Тест неизменяемости строки корзины
+        :return: None
+        """
+        line = next(iter(get_cart(self.request)))
+        with self.assertRaises(AttributeError):
+            line.quantity = 10
+        self.assertFalse(hasattr(line, '__dict__'))
+
+
+class CartEncodingTestCase(TestCase):
+    """
+    Тест компактной записи корзины в сессии
+    """
+
+    def test_round_trip(self) -> None:
+        """
+        Тест записи и чтения корзины
+        :return: None
+        """
+        self.assertEqual(compact_price(Decimal('1500.00')), '1500')
+        self.assertEqual(compact_price(Decimal('99.90')), '99.9')
+        cart = {'12': {'quantity': 2, 'price': '1500'}, '7': {'quantity': 1, 'price': '99.9'}}
+        value = encode_cart(cart, 42)
+        self.assertEqual(value, '42|12:2:1500,7:1:99.9')
+        self.assertEqual(decode_cart(value), (cart, 42))
+
+    def test_legacy_and_broken_values(self) -> None:
+        """
+        Тест чтения корзин, сохраненных прежним словарем, и испорченных значений
+        :return: None
+        """
+        legacy = {'12': {'quantity': 2, 'price': '1500.00'}}
+        self.assertEqual(decode_cart(legacy), (legacy, None))
+        self.assertEqual(decode_cart('|'), ({}, None))
+        self.assertEqual(decode_cart('x|12:2'), ({}, None))
+        self.assertEqual(decode_cart(None), ({}, None))
+
+    def test_legacy_session_rewritten_on_change(self) -> None:
+        """
+        Тест перезаписи корзины из старой сессии в компактном виде при первом изменении
+        :return: None
+        """
+        request = RequestFactory().get('/')
+        request.session = SessionStore()
+        request.session[settings.CART_SESSION_ID] = {'12': {'quantity': 2, 'price': '1500.00'}}
+        cart = Cart(request)
+        self.assertEqual(len(cart), 2)
+        self.assertIsNone(cart.price_version)
+        cart.add(Product(pk=7, price=Decimal('99.90')))
+        self.assertEqual(request.session[settings.CART_SESSION_ID], f'{cart.price_version}|12:2:1500.00,7:1:99.9')
+        self.assertEqual(cart.get_total_price(), Decimal('3099.90'))
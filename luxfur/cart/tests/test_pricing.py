@@ -0,0 +1,124 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from cart.cart import Cart
+from cart.stores import MemoryCartStore
+from orders.models import Order
+from shop.models import Product, Material, Category
+
+
+class CartPricingTestCase(TestCase):
+    """
+    Тестируем сверку корзины с текущими ценами и остатками каталога
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = get_user_model().objects.create(username='pricing-buyer', email='pricing@example.com')
+        material = Material.objects.create(name='Латунь', slug='Latun')
+        category = Category.objects.create(name='Ручки для мебели', slug='ruchki-dlya-mebeli')
+        cls.handle = Product.objects.create(name='Ручка', slug='ruchka', price=100, quantity=5,
+                                            material=material, category=category)
+        cls.screw = Product.objects.create(name='Винт', slug='vint', price='10.50', quantity=5,
+                                           material=material, category=category)
+        cls.knob = Product.objects.create(name='Кнопка', slug='knopka', price=50, quantity=5,
+                                          material=material, category=category)
+
+    def make_cart(self, store: MemoryCartStore) -> Cart:
+        request = RequestFactory().get('/')
+        request.session = {}
+        return Cart(request, store=store)
+
+    def test_reconcile(self) -> None:
+        """
+        Тест сверки: новая цена записывается в корзину, нехватка остатка отмечается,
+        товар без цены удаляется из корзины, хранилище сохраняется один раз
+        :return: None
+        """
+        store = MemoryCartStore({str(self.handle.pk): {'quantity': 2, 'price': '90'},
+                                 str(self.screw.pk): {'quantity': 7, 'price': '10.5'},
+                                 str(self.knob.pk): {'quantity': 1, 'price': '50'}})
+        Product.objects.filter(pk=self.knob.pk).update(price=None)
+        cart = self.make_cart(store)
+        with self.assertNumQueries(1):
+            pricing = cart.get_pricing()
+            self.assertIs(cart.get_pricing(), pricing)
+        self.assertEqual(pricing.previous_prices, {self.handle.pk: Decimal('90')})
+        self.assertEqual(pricing.available, {self.screw.pk: 5})
+        self.assertEqual(pricing.removed, [self.knob.pk])
+        self.assertEqual(store.saves, 1)
+        self.assertEqual(store.cart, {str(self.handle.pk): {'quantity': 2, 'price': '100'},
+                                      str(self.screw.pk): {'quantity': 7, 'price': '10.5'}})
+
+        lines = list(cart)
+        self.assertEqual([(line.price, line.previous_price, line.available) for line in lines],
+                         [(Decimal('100'), Decimal('90'), None), (Decimal('10.5'), None, 5)])
+        self.assertEqual(cart.get_total_price(), Decimal('273.5'))
+
+        # в следующем запросе цены совпадают с каталогом, корзина не перезаписывается
+        cart = self.make_cart(store)
+        self.assertEqual(cart.get_pricing().previous_prices, {})
+        self.assertEqual(store.saves, 1)
+
+    def test_product_without_price(self) -> None:
+        """
+        Тест товара без цены: в корзину не добавляется, а строка с неразборчивой ценой,
+        сохраненная раньше, не ломает итоги и исправляется сверкой
+        :return: None
+        """
+        Product.objects.filter(pk=self.knob.pk).update(price=None)
+        response = self.client.post(reverse('cart:cart_add', args=[self.knob.pk]), {'quantity': 1})
+        self.assertRedirects(response, self.knob.get_absolute_url(), fetch_redirect_response=False)
+        self.assertNotIn(settings.CART_SESSION_ID, self.client.session)
+
+        store = MemoryCartStore({str(self.handle.pk): {'quantity': 2, 'price': 'None'},
+                                 str(self.screw.pk): {'quantity': 1, 'price': '10.5'}})
+        cart = self.make_cart(store)
+        self.assertEqual((len(cart), cart.get_total_price()), (1, Decimal('10.5')))
+        self.assertEqual(cart.get_pricing().previous_prices, {})
+        self.assertEqual(store.cart[str(self.handle.pk)], {'quantity': 2, 'price': '100'})
+        self.assertEqual((len(cart), cart.get_total_price()), (3, Decimal('210.5')))
+
+    def test_cart_page(self) -> None:
+        """
+        Тест страницы корзины после изменения цены в каталоге
+        :return: None
+        """
+        self.client.post(reverse('cart:cart_add', args=[self.handle.pk]), {'quantity': 2})
+        self.handle.price = 120
+        self.handle.save()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('cart:cart_detail'))
+        # товары корзины загружаются вместе со сверкой одним запросом
+        self.assertEqual(len([query for query in queries if 'FROM "shop_product" WHERE' in query['sql']]), 1)
+        self.assertContains(response, 'Цена изменилась, было 100 руб.')
+        self.assertContains(response, '240 руб.')
+        response = self.client.get(reverse('cart:cart_detail'))
+        self.assertNotContains(response, 'Цена изменилась')
+
+    def test_order_create_after_price_change(self) -> None:
+        """
+        Тест оформления заказа: при изменившейся цене заказ не создается, повторная отправка
+        оформляет заказ по новой цене
+        :return: None
+        """
+        self.client.force_login(self.user)
+        self.client.post(reverse('cart:cart_add', args=[self.screw.pk]), {'quantity': 2})
+        Product.objects.filter(pk=self.screw.pk).update(price=12)
+        data = {'first_name': 'Саша', 'last_name': 'Джус', 'email': 'pricing@example.com', 'phone_number': '1',
+                'address': 'ул. Ленина 1', 'postal_code': '299038', 'city': 'Севастополь'}
+        response = self.client.post(reverse('orders:order_create'), data)
+        self.assertContains(response, 'Цены или состав корзины изменились')
+        self.assertContains(response, 'цена изменилась, было 10,5 руб. за шт.')
+        self.assertFalse(Order.objects.filter(user=self.user).exists())
+
+        response = self.client.post(reverse('orders:order_create'), data)
+        self.assertTemplateUsed(response, 'orders/order_create_done.html')
+        self.assertEqual(Order.objects.get(user=self.user).order_items.get().product_price, Decimal('12'))
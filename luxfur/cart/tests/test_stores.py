@@ -0,0 +1,81 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import TestCase, RequestFactory
+from django.urls import reverse
+
+from cart.cart import Cart
+from cart.models import CartItem
+from cart.stores import MemoryCartStore
+from shop.models import Product, Material, Category
+
+
+class CartStoreTestCase(TestCase):
+    """
+    Тестируем хранилища корзины: сессия для гостя, база данных для пользователя, память для тестов
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = get_user_model().objects.create_user(username='cart-user', email='cart@example.com',
+                                                        password='secret-password-1')
+        material = Material.objects.create(name='Латунь', slug='Latun')
+        category = Category.objects.create(name='Ручки для мебели', slug='ruchki-dlya-mebeli')
+        cls.handle = Product.objects.create(name='Ручка', slug='ruchka', price=100, quantity=5,
+                                            material=material, category=category)
+        cls.screw = Product.objects.create(name='Винт', slug='vint', price='10.50', quantity=5,
+                                           material=material, category=category)
+
+    def items(self) -> list:
+        return list(CartItem.objects.filter(user=self.user).order_by('product_id')
+                    .values_list('product_id', 'quantity', 'price'))
+
+    def test_database_store_for_user(self) -> None:
+        """
+        Тест корзины авторизованного пользователя: строки в CartItem, сессия не содержит корзину
+        :return: None
+        """
+        self.client.force_login(self.user)
+        self.client.post(reverse('cart:cart_add', args=[self.handle.pk]), {'quantity': 2})
+        self.client.post(reverse('cart:cart_add', args=[self.screw.pk]), {'quantity': 1})
+        self.client.post(reverse('cart:cart_add', args=[self.handle.pk]), {'quantity': 1})
+        self.assertEqual(self.items(), [(self.handle.pk, 3, Decimal('100')), (self.screw.pk, 1, Decimal('10.50'))])
+        self.assertNotIn(settings.CART_SESSION_ID, self.client.session)
+
+        self.client.get(reverse('cart:cart_remove', args=[self.screw.pk]))
+        response = self.client.get(reverse('cart:cart_detail'))
+        self.assertEqual([line.product for line in response.context['cart']], [self.handle])
+        self.assertEqual(self.items(), [(self.handle.pk, 3, Decimal('100'))])
+
+    def test_merge_guest_cart_on_login(self) -> None:
+        """
+        Тест переноса корзины гостя при входе: кол-во одинаковых товаров складывается
+        :return: None
+        """
+        CartItem.objects.create(user=self.user, product=self.handle, quantity=1, price=100)
+        self.client.post(reverse('cart:cart_add', args=[self.handle.pk]), {'quantity': 2})
+        self.client.post(reverse('cart:cart_add', args=[self.screw.pk]), {'quantity': 3})
+
+        self.client.post(reverse('users:login'), {'username': 'cart-user', 'password': 'secret-password-1'})
+        self.assertEqual(self.items(), [(self.handle.pk, 3, Decimal('100')), (self.screw.pk, 3, Decimal('10.50'))])
+        self.assertNotIn(settings.CART_SESSION_ID, self.client.session)
+        response = self.client.get(reverse('cart:cart_detail'))
+        self.assertContains(response, '6 товар(ов) в корзине')
+
+    def test_memory_store(self) -> None:
+        """
+        Тест корзины в памяти без сессии и базы данных
+        :return: None
+        """
+        request = RequestFactory().get('/')
+        request.session = {}
+        store = MemoryCartStore({str(self.handle.pk): {'quantity': 1, 'price': '100'}})
+        cart = Cart(request, store=store)
+        cart.add(self.screw, quantity=2)
+        self.assertEqual(store.cart[str(self.screw.pk)], {'quantity': 2, 'price': '10.5'})
+        self.assertEqual(cart.get_total_price(), Decimal('121'))
+        self.assertEqual(request.session, {})
+        cart.clear()
+        self.assertEqual(len(Cart(request, store=store)), 0)
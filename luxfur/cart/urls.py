@@ -7,4 +7,9 @@ urlpatterns = [
     path('', CartDetailView.as_view(), name='cart_detail'),
     path('cart-add/<int:product_id>/', cart_add, name='cart_add'),
     path('cart-remove/<int:product_id>/', cart_remove, name='cart_remove'),
+    path('api/', cart_api_summary, name='api_summary'),
+    path('api/add/<int:product_id>/', cart_api_add, name='api_add'),
+    path('api/update/<int:product_id>/', cart_api_update, name='api_update'),
+    path('api/bulk-add/', cart_api_bulk_add, name='api_bulk_add'),
+    path('api/remove/<int:product_id>/', cart_api_remove, name='api_remove'),
 ]
\ No newline at end of file
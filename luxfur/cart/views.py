@@ -1,16 +1,25 @@
+import json
+
+from django.http import HttpRequest, JsonResponse
 from django.shortcuts import render, redirect, get_object_or_404
+from django.template.loader import render_to_string
+from django.views.decorators.http import require_GET, require_POST
 from django.views.generic import DetailView, TemplateView
 
 from config.settings import DEFAULT_PRODUCT_IMAGE
 from .cart import *
-from .forms import CartAddProductForm
+from .forms import CartAddProductForm, CartBulkAddForm
+from orders.bought_together import get_bought_together
 from shop.models import Product
 # Create your views here.
 
 
 def cart_add(request, product_id):
-    cart = Cart(request)
+    cart = get_cart(request)
     product = get_object_or_404(Product, id=product_id)
+    if product.price is None:
+        # товар без цены купить нельзя, как и при оптовом добавлении (см. CartBulkAddForm)
+        return redirect(product.get_absolute_url())
     if request.method == 'POST':
         form = CartAddProductForm(request.POST)
         if form.is_valid():
@@ -22,12 +31,162 @@ def cart_add(request, product_id):
 
 
 def cart_remove(request, product_id):
-    cart = Cart(request)
+    cart = get_cart(request)
     product = get_object_or_404(Product, id=product_id)
     cart.remove(product)
     return redirect('cart:cart_detail')
 
 
+def cart_line_json(product, line) -> dict:
+    """
+    Строка корзины для ответа API
+    :param product: товар
+    :param line: CartLine или None, если товара нет в корзине
+    :return: словарь или None
+    """
+    if line is None:
+        return None
+    return {
+        'product_id': product.id,
+        'name': product.name,
+        'quantity': line.quantity,
+        'price': compact_price(line.price),
+        'total_price': compact_price(line.total_price),
+    }
+
+
+def cart_data(request: HttpRequest, cart: Cart, product=None) -> dict:
+    """
+    Ответ API корзины: строка измененного товара, итоги корзины и кол-во товаров для шапки.
+    Итоги считаются по данным хранилища без загрузки товаров корзины, суммы - строками без лишних нулей.
+    С параметром fragment в ответ добавляются готовые HTML-фрагменты строки, итога и шапки,
+    чтобы страница обновлялась на месте без рендера всей корзины
+    :param request: HttpRequest
+    :param cart: корзина
+    :param product: измененный товар или None
+    :return: данные ответа
+    """
+    count, total_price = cart.get_totals()
+    data = {'count': count, 'total_price': compact_price(total_price)}
+    line = None
+    if product is not None:
+        line = cart.get_line(product)
+        data['product_id'] = product.id
+        data['line'] = cart_line_json(product, line)
+    if request.GET.get('fragment') or request.POST.get('fragment'):
+        context = {'cart': cart, 'item': line, 'default_image': DEFAULT_PRODUCT_IMAGE}
+        data['html'] = {
+            'line': render_to_string('cart/includes/cart_line.html', context, request) if line else '',
+            'total': render_to_string('cart/includes/cart_total.html', context, request),
+            'summary': render_to_string('cart/includes/cart_summary.html', context, request),
+        }
+    return data
+
+
+def cart_json(request: HttpRequest, cart: Cart, product=None) -> JsonResponse:
+    """
+    Ответ API корзины в JSON, см. cart_data
+    """
+    return JsonResponse(cart_data(request, cart, product))
+
+
+def cart_api_product(product_id: int):
+    """
+    Товар для API корзины или None, если его нет в каталоге
+    """
+    return Product.objects.filter(pk=product_id).first()
+
+
+def cart_api_change(request: HttpRequest, product_id: int, update_quantity: bool) -> JsonResponse:
+    """
+    Добавление товара или изменение его кол-ва через API корзины
+    :param request: POST-запрос с кол-вом в параметре quantity
+    :param product_id: id товара
+    :param update_quantity: True - заменить кол-во, False - прибавить к кол-ву в корзине
+    :return: JSON
+    """
+    product = cart_api_product(product_id)
+    if product is None:
+        return JsonResponse({'error': 'Товар не найден'}, status=404)
+    if product.price is None:
+        return JsonResponse({'error': f'У товара "{product.name}" нет цены'}, status=400)
+    form = CartAddProductForm({'quantity': request.POST.get('quantity', 1)})
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors.get_json_data()}, status=400)
+    cart = get_cart(request)
+    cart.add(product=product, quantity=form.cleaned_data['quantity'], update_quantity=update_quantity)
+    return cart_json(request, cart, product)
+
+
+@require_POST
+def cart_api_add(request: HttpRequest, product_id: int) -> JsonResponse:
+    """
+    API: добавляет товар в корзину
+    """
+    return cart_api_change(request, product_id, update_quantity=False)
+
+
+@require_POST
+def cart_api_update(request: HttpRequest, product_id: int) -> JsonResponse:
+    """
+    API: задает кол-во товара в корзине
+    """
+    return cart_api_change(request, product_id, update_quantity=True)
+
+
+@require_POST
+def cart_api_remove(request: HttpRequest, product_id: int) -> JsonResponse:
+    """
+    API: удаляет товар из корзины
+    """
+    product = cart_api_product(product_id)
+    if product is None:
+        return JsonResponse({'error': 'Товар не найден'}, status=404)
+    cart = get_cart(request)
+    cart.remove(product)
+    return cart_json(request, cart, product)
+
+
+@require_POST
+def cart_api_bulk_add(request: HttpRequest) -> JsonResponse:
+    """
+    API: оптовое добавление товаров в корзину. Принимает JSON {"items": [{"product_id": id, "quantity": кол-во}
+    или {"vendor_code": артикул, "quantity": кол-во}, ...], "update": false} или те же поля формой.
+    Товары проверяются одним запросом, корзина сохраняется один раз; при ошибке в любой строке
+    корзина не меняется
+    :param request: POST-запрос
+    :return: JSON с добавленными строками и итогами корзины
+    """
+    if request.content_type == 'application/json':
+        try:
+            payload = json.loads(request.body)
+        except ValueError:
+            return JsonResponse({'errors': {'__all__': [{'message': 'Неверный JSON', 'code': 'invalid'}]}},
+                                status=400)
+        if not isinstance(payload, dict):
+            payload = {'items': payload}
+        data = {'items': json.dumps(payload.get('items')), 'update': payload.get('update', False)}
+    else:
+        data = request.POST
+    form = CartBulkAddForm(data)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors.get_json_data()}, status=400)
+    cart = get_cart(request)
+    lines = form.cleaned_data['items']
+    cart.add_many(lines, update_quantity=form.cleaned_data['update'])
+    data = cart_data(request, cart)
+    data['lines'] = [cart_line_json(product, cart.get_line(product)) for product, _ in lines]
+    return JsonResponse(data)
+
+
+@require_GET
+def cart_api_summary(request: HttpRequest) -> JsonResponse:
+    """
+    API: итоги корзины и кол-во товаров для шапки, без запросов к каталогу
+    """
+    return cart_json(request, get_cart(request))
+
+
 class CartDetailView(TemplateView):
     template_name = 'cart/cart_detail.html'
     extra_context = {
@@ -37,8 +196,12 @@ class CartDetailView(TemplateView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        cart = Cart(self.request)
+        cart = get_cart(self.request)
         context['cart'] = cart
+        # строки загружаются до вывода шаблона: тем же запросом корзина сверяется с ценами и остатками каталога
+        list(cart)
+        context['pricing'] = cart.get_pricing()
+        context['bought_together'] = get_bought_together(cart.cart.keys())
         return context
 
 
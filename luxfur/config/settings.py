@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -90,6 +91,26 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+
+# версии каталога, закешированные страницы и итоги фильтров должны быть общими для всех процессов
+# веб-сервера и для команд (импорт каталога), поэтому кеш хранится в файлах, а не в памяти процесса
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        # CACHE_DIR задает тестовый прогон (см. config.test_runner), чтобы не трогать кеш сайта
+        'LOCATION': os.environ.get('CACHE_DIR', BASE_DIR / 'cache'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,  # по умолчанию 300, страниц категорий и материалов бывает больше
+        },
+    }
+}
+
+# тесты используют отдельный кеш во временной папке
+TEST_RUNNER = 'config.test_runner.IsolatedCacheTestRunner'
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -173,5 +194,39 @@ EMAIL_ADMIN = EMAIL_HOST_USER
 
 
 CART_SESSION_ID = 'cart'  #  это ключ, который будет использован для хранения корзины в сессии пользователя
-
-
+CART_BULK_MAX_LINES = 200  # максимальное кол-во строк в одном запросе оптового добавления в корзину
+CART_BULK_MAX_QUANTITY = 10000  # максимальное кол-во одного товара в строке оптового добавления
+
+CATALOG_PAGE_SIZE = 20  # кол-во товаров на одной странице каталога
+CATALOG_CACHE_TIMEOUT = 60 * 60  # время хранения закешированных страниц категорий и материалов, сек
+
+# диапазоны фильтров каталога (от, до), верхняя граница не включается, None - без верхней границы
+CATALOG_PRICE_BANDS = [(0, 100), (100, 500), (500, 1000), (1000, 5000), (5000, None)]
+CATALOG_SIZE_BANDS = [(0, 5), (5, 20), (20, 50), (50, None)]
+
+SEARCH_MAX_RESULTS = 200  # максимальное кол-во товаров в выдаче поиска
+SEARCH_MAX_QUERY_LENGTH = 100  # длина поисковой строки, остаток отбрасывается
+SEARCH_MAX_TERMS = 8  # максимальное кол-во условий в одном поисковом запросе
+SEARCH_COST_LIMIT = 2_000_000  # лимит инструкций SQLite на один поисковый запрос
+SEARCH_TIMEOUT_MS = 200  # statement_timeout поискового запроса для PostgreSQL
+SEARCH_CACHE_SIZE = 1000  # кол-во запросов в кеше результатов поиска каждого процесса
+SEARCH_CACHE_TTL = 5 * 60  # время жизни результата поиска в кеше, сек
+SUGGEST_LIMIT = 10  # кол-во подсказок при наборе в строке поиска
+SUGGEST_MIN_LENGTH = 2  # минимальная длина строки для подсказок
+SUGGEST_CHECK_INTERVAL = 30  # как часто индекс подсказок сверяет версию каталога, сек
+
+
+# уменьшенные копии изображений товаров: (ширина, высота, обрезать по размеру)
+THUMBNAIL_SIZES = {
+    'card': (150, 150, True),  # карточка товара в каталоге
+    'cart': (80, 80, True),  # строка корзины
+    'gallery': (800, 800, False),  # галерея на странице товара, пропорции сохраняются
+}
+THUMBNAIL_DIR = 'thumbnails'  # каталог уменьшенных копий внутри MEDIA_ROOT
+THUMBNAIL_JPEG_QUALITY = 80
+THUMBNAIL_WEBP_QUALITY = 75
+THUMBNAIL_WORKERS = 2  # кол-во процессов, в которых строятся уменьшенные копии
+THUMBNAIL_ASYNC = True  # False - копии строятся сразу в процессе запроса
+
+RELATED_PRODUCTS_COUNT = 6  # кол-во похожих товаров на странице товара
+BOUGHT_TOGETHER_COUNT = 5  # кол-во товаров "покупают вместе" на странице товара и в корзине
@@ -0,0 +1,36 @@
+import os
+import shutil
+import tempfile
+
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class IsolatedCacheTestRunner(DiscoverRunner):
+    """
+    Тесты получают свой файловый кеш во временной папке: cache.clear() в тестах не трогает кеш
+    работающего сайта, а процессы, запущенные из тестов, видят тот же кеш через CACHE_DIR
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.cache_dir = tempfile.mkdtemp(prefix='luxfur-test-cache-')
+        self.previous_cache_dir = os.environ.get('CACHE_DIR')
+        os.environ['CACHE_DIR'] = self.cache_dir
+        self.cache_settings = override_settings(CACHES={
+            'default': {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': self.cache_dir,
+                'OPTIONS': {'MAX_ENTRIES': 10000},
+            }
+        })
+        self.cache_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.cache_settings.disable()
+        if self.previous_cache_dir is None:
+            os.environ.pop('CACHE_DIR', None)
+        else:
+            os.environ['CACHE_DIR'] = self.previous_cache_dir
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_wsgi_application()
+
+# индекс подсказок поиска строится при старте процесса, а не на первом запросе
+from shop.search.suggest import suggestion_index  # noqa: E402
+
+suggestion_index.warm()
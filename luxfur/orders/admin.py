@@ -10,8 +10,9 @@ class OrderItemsTabularInline(admin.TabularInline):
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     list_display = ['id', 'user', 'first_name', 'last_name', 'email', 'address', 'postal_code',
-                    'city', 'time_create', 'time_update', 'paid']
+                    'city', 'time_create', 'time_update', 'paid', 'total_items', 'total_cost']
     list_display_links = ['id', 'user','first_name']
+    readonly_fields = ['total_items', 'total_cost']
     list_filter = ['paid', 'time_create', 'time_update']
     inlines = [OrderItemsTabularInline, ]
 
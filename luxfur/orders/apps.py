@@ -5,3 +5,6 @@ class OrdersConfig(AppConfig):
     verbose_name = 'Заказы'
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'orders'
+
+    def ready(self):
+        from . import signals  # noqa: F401 подключаем обработчики сигналов
@@ -0,0 +1,166 @@
+from collections import Counter
+from itertools import combinations, groupby
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import F, Max, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from .models import OrderItems, ProductPairCount, BoughtTogether, BoughtTogetherCheckpoint
+from shop.models import Product
+
+
+def iter_baskets(after_item_id: int, up_to_item_id: int, chunk_size: int = 2000):
+    """
+    Корзины заказов, в которых есть строки с id больше after_item_id. Строки читаются потоком
+    в порядке заказов, в память одновременно попадает одна пачка строк и один заказ
+    :param after_item_id: последняя учтенная строка OrderItems
+    :param up_to_item_id: последняя строка, которая учитывается в этот раз
+    :param chunk_size: кол-во строк, читаемых из базы данных за раз
+    :return: генератор пар (множество всех товаров заказа, множество товаров из уже учтенных строк)
+    """
+    items = OrderItems.objects.filter(id__lte=up_to_item_id)
+    if after_item_id:
+        # у заказа могли появиться новые строки после прошлого расчета, поэтому читаются все его строки
+        items = items.filter(order_id__in=OrderItems.objects.filter(
+            id__gt=after_item_id, id__lte=up_to_item_id).values('order_id'))
+    rows = items.order_by('order_id', 'id').values_list('order_id', 'product_id', 'id').iterator(chunk_size=chunk_size)
+    for _, order_rows in groupby(rows, key=lambda row: row[0]):
+        products, counted = set(), set()
+        for _, product_id, item_id in order_rows:
+            products.add(product_id)
+            if item_id <= after_item_id:
+                counted.add(product_id)
+        yield products, counted
+
+
+def basket_pairs(products: set, counted: set):
+    """
+    Пары товаров заказа, которые еще не учтены: пары из уже учтенных строк были посчитаны в прошлый раз
+    :param products: все товары заказа
+    :param counted: товары из уже учтенных строк
+    :return: генератор пар (меньший id, больший id)
+    """
+    for pair in combinations(sorted(products), 2):
+        if pair[0] not in counted or pair[1] not in counted:
+            yield pair
+
+
+def save_pair_counts(pairs: Counter) -> None:
+    """
+    Прибавляет кол-во заказов к парам товаров одним подготовленным запросом INSERT ... ON CONFLICT,
+    каждая пара записывается в обе стороны
+    :param pairs: Counter {(id товара, id товара): кол-во заказов}
+    :return: None
+    """
+    db = connections[router.db_for_write(ProductPairCount)]
+    table = db.ops.quote_name(ProductPairCount._meta.db_table)
+    product, partner, orders_count = (db.ops.quote_name(ProductPairCount._meta.get_field(name).column)
+                                      for name in ('product', 'partner', 'orders_count'))
+    sql = (f'INSERT INTO {table} ({product}, {partner}, {orders_count}) VALUES (%s, %s, %s) '
+           f'ON CONFLICT ({product}, {partner}) DO UPDATE SET {orders_count} = {table}.{orders_count} + '
+           f'excluded.{orders_count}')
+    params = []
+    for (first, second), total in pairs.items():
+        params.append((first, second, total))
+        params.append((second, first, total))
+    with db.cursor() as cursor:
+        cursor.executemany(sql, params)
+
+
+def refresh_bought_together(product_ids, count: int = None, chunk_size: int = 500) -> int:
+    """
+    Пересчитывает первые count партнеров товаров по ProductPairCount. Отбор первых партнеров
+    выполняется в базе данных оконной функцией, в Python попадают только нужные строки
+    :param product_ids: id товаров
+    :param count: кол-во партнеров, по умолчанию BOUGHT_TOGETHER_COUNT
+    :param chunk_size: кол-во товаров в одной транзакции
+    :return: кол-во пересчитанных товаров
+    """
+    count = count or settings.BOUGHT_TOGETHER_COUNT
+    product_ids = sorted(product_ids)
+    computed_at = timezone.now()
+    for start in range(0, len(product_ids), chunk_size):
+        chunk = product_ids[start:start + chunk_size]
+        rows = (ProductPairCount.objects.filter(product_id__in=chunk)
+                .annotate(rank=Window(RowNumber(), partition_by=[F('product_id')],
+                                      order_by=[F('orders_count').desc(), F('partner_id').asc()]))
+                .filter(rank__lte=count).values_list('product_id', 'partner_id', 'rank', 'orders_count'))
+        with transaction.atomic():
+            BoughtTogether.objects.filter(product_id__in=chunk).delete()
+            BoughtTogether.objects.bulk_create([
+                BoughtTogether(product_id=product_id, partner_id=partner_id, rank=rank, orders_count=orders_count,
+                               computed_at=computed_at)
+                for product_id, partner_id, rank, orders_count in rows
+            ])
+            Product.objects.filter(pk__in=chunk).update(time_recommendations=computed_at)
+    return len(product_ids)
+
+
+def update_bought_together(full: bool = False, count: int = None, chunk_size: int = 1000) -> dict:
+    """
+    Учитывает заказы, появившиеся после прошлого расчета, и пересчитывает партнеров затронутых товаров.
+    Удаленные заказы не вычитаются, для этого выполняется полный расчет
+    :param full: пересчитать все заказы заново
+    :param count: кол-во партнеров, по умолчанию BOUGHT_TOGETHER_COUNT
+    :param chunk_size: кол-во заказов, пары которых накапливаются в памяти перед записью
+    :return: словарь с кол-вом учтенных заказов, пар и пересчитанных товаров
+    """
+    stats = {'orders': 0, 'pairs': 0, 'products': 0}
+    with transaction.atomic():
+        checkpoint = BoughtTogetherCheckpoint.objects.select_for_update().first() or BoughtTogetherCheckpoint()
+        if full:
+            ProductPairCount.objects.all().delete()
+            BoughtTogether.objects.all().delete()
+            checkpoint.last_item_id = 0
+        # строки, добавленные во время расчета, попадут в следующий
+        up_to_item_id = OrderItems.objects.aggregate(last=Max('id'))['last'] or 0
+        if up_to_item_id <= checkpoint.last_item_id:
+            return stats
+
+        affected = set()
+        pairs = Counter()
+        for products, counted in iter_baskets(checkpoint.last_item_id, up_to_item_id):
+            stats['orders'] += 1
+            for pair in basket_pairs(products, counted):
+                pairs[pair] += 1
+                affected.update(pair)
+            if stats['orders'] % chunk_size == 0 and pairs:
+                stats['pairs'] += len(pairs)
+                save_pair_counts(pairs)
+                pairs = Counter()
+        if pairs:
+            stats['pairs'] += len(pairs)
+            save_pair_counts(pairs)
+
+        checkpoint.last_item_id = up_to_item_id
+        checkpoint.save()
+        stats['products'] = refresh_bought_together(affected, count)
+    return stats
+
+
+def get_bought_together(product_ids, limit: int = None) -> list:
+    """
+    Товары, которые покупают вместе с товарами, одним запросом вместе со строками каталога.
+    Для нескольких товаров (корзины) кол-во заказов партнеров складывается, товары из списка исключаются
+    :param product_ids: id товаров
+    :param limit: кол-во товаров, по умолчанию BOUGHT_TOGETHER_COUNT
+    :return: список строк каталога ProductListing
+    """
+    limit = limit or settings.BOUGHT_TOGETHER_COUNT
+    product_ids = [int(product_id) for product_id in product_ids]
+    if not product_ids:
+        return []
+    rows = (BoughtTogether.objects.filter(product_id__in=product_ids).exclude(partner_id__in=product_ids)
+            .select_related('partner__listing'))
+    if len(product_ids) == 1:
+        rows = rows.filter(rank__lte=limit).order_by('rank')
+    totals = Counter()
+    listings = {}
+    for row in rows:
+        if hasattr(row.partner, 'listing'):
+            totals[row.partner_id] += row.orders_count
+            listings[row.partner_id] = row.partner.listing
+    ranking = sorted(totals, key=lambda partner_id: (-totals[partner_id], partner_id))
+    return [listings[partner_id] for partner_id in ranking[:limit]]
@@ -0,0 +1,35 @@
+from decimal import Decimal
+
+from django.db import transaction
+
+from .models import Order, OrderItems
+from .stock import reserve_stock
+
+
+def create_order(form, user, cart) -> Order:
+    """
+    Оформляет заказ по корзине в одной транзакции: списание остатков, заказ и все его строки.
+    Строки заказа собираются в памяти из данных корзины, уже сверенных с каталогом (см. Cart.get_pricing),
+    без загрузки товаров, и записываются одним bulk_create, итоги заказа записываются вместе с заказом.
+    Существование товаров проверяет reserve_stock: строка удаленного товара не списывается, и заказ не создается.
+    Вместо отдельного INSERT с автофиксацией на каждую строку база данных фиксирует одну транзакцию
+    :param form: заполненная и проверенная OrderCreateForm
+    :param user: покупатель
+    :param cart: корзина
+    :return: созданный заказ
+    :raises OutOfStock: товара не хватает, ничего не записано
+    """
+    lines = [(int(product_id), item['quantity'], Decimal(item['price'])) for product_id, item in cart.cart.items()]
+    with transaction.atomic():
+        reserve_stock({product_id: quantity for product_id, quantity, _ in lines})
+        order = form.save(commit=False)
+        order.user = user
+        # итоги заказа считаются по тем же строкам, что и записываются
+        order.total_cost = sum(price * quantity for _, quantity, price in lines)
+        order.total_items = sum(quantity for _, quantity, _ in lines)
+        order.save()
+        OrderItems.objects.bulk_create([
+            OrderItems(order=order, product_id=product_id, product_amount=quantity, product_price=price)
+            for product_id, quantity, price in lines
+        ])
+    return order
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from orders.models import Order
+from orders.totals import update_order_totals
+
+
+class Command(BaseCommand):
+    help = ('Заполняет общую стоимость и кол-во товаров заказов по их строкам одним запросом UPDATE. '
+            'Нужна один раз после добавления полей и для сверки итогов, если строки менялись в обход сигналов')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--empty', action='store_true',
+                            help='Только заказы с нулевым кол-вом товаров, например созданные до добавления полей')
+
+    def handle(self, *args, **options):
+        orders = Order.objects.all()
+        if options['empty']:
+            orders = orders.filter(total_items=0)
+        started = time.perf_counter()
+        updated = update_order_totals(orders)
+        self.stdout.write(self.style.SUCCESS(
+            f'Итоги пересчитаны для {updated} заказов за {time.perf_counter() - started:.2f} с'))
@@ -0,0 +1,104 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, DatabaseError
+
+from orders.stock import OutOfStock, reserve_stock
+from shop.models import Product, Category, Material
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочная проверка списания остатков: несколько потоков одновременно оформляют заказы '
+            'на один и тот же товар. Создает временный товар и удаляет его после проверки')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help='Кол-во одновременных покупателей')
+        parser.add_argument('--checkouts', type=int, default=50, help='Кол-во заказов каждого покупателя')
+        parser.add_argument('--stock', type=int, default=200, help='Начальный остаток товара')
+        parser.add_argument('--amount', type=int, default=1, help='Кол-во товара в одном заказе')
+        parser.add_argument('--naive', action='store_true',
+                            help='Списывать чтением и записью остатка вместо условного UPDATE, для сравнения')
+
+    def handle(self, *args, **options):
+        for name in ('threads', 'checkouts', 'stock', 'amount'):
+            if options[name] < 1:
+                raise CommandError(f'--{name} должен быть больше нуля')
+        category = Category.objects.create(name='Проверка остатков', slug=f'benchmark-checkout-{time.time_ns()}')
+        material = Material.objects.create(name='Проверка остатков', slug=category.slug)
+        product = Product.objects.create(name='Проверка остатков', slug=category.slug, price=1,
+                                         quantity=options['stock'], category=category, material=material)
+        try:
+            self.run_benchmark(product.pk, options)
+        finally:
+            product.delete()
+            category.delete()
+            material.delete()
+
+    def run_benchmark(self, product_id: int, options: dict) -> None:
+        checkout = self.naive_checkout if options['naive'] else self.checkout
+        barrier = threading.Barrier(options['threads'])
+        results = {'sold': 0, 'rejected': 0, 'errors': 0}
+        latencies = []
+        lock = threading.Lock()
+
+        def worker():
+            local = {'sold': 0, 'rejected': 0, 'errors': 0}
+            timings = []
+            barrier.wait()
+            try:
+                for _ in range(options['checkouts']):
+                    started = time.perf_counter()
+                    try:
+                        local['sold' if checkout(product_id, options['amount']) else 'rejected'] += 1
+                    except DatabaseError:
+                        local['errors'] += 1
+                    timings.append(time.perf_counter() - started)
+            finally:
+                # у каждого потока свое соединение с базой данных
+                connection.close()
+            with lock:
+                for key, value in local.items():
+                    results[key] += value
+                latencies.extend(timings)
+
+        threads = [threading.Thread(target=worker) for _ in range(options['threads'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        remaining = Product.objects.get(pk=product_id).quantity
+        sold = results['sold'] * options['amount']
+        oversold = sold - (options['stock'] - remaining)
+        latencies.sort()
+        self.stdout.write(
+            f'Режим: {"чтение и запись" if options["naive"] else "условный UPDATE"}, потоков: {options["threads"]}, '
+            f'заказов: {len(latencies)} за {elapsed:.2f} с ({len(latencies) / elapsed:.0f} заказов/с)\n'
+            f'Оформлено: {results["sold"]}, отказов: {results["rejected"]}, ошибок базы данных: {results["errors"]}\n'
+            f'Остаток: {options["stock"]} -> {remaining}, продано: {sold}\n'
+            f'Задержка: p50 {latencies[len(latencies) // 2] * 1000:.1f} мс, '
+            f'p95 {latencies[int(len(latencies) * 0.95)] * 1000:.1f} мс')
+        if oversold or remaining < 0:
+            self.stdout.write(self.style.ERROR(f'Продано сверх остатка или потеряно списаний: {oversold}'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Продаж сверх остатка нет'))
+
+    @staticmethod
+    def checkout(product_id: int, amount: int) -> bool:
+        try:
+            reserve_stock({product_id: amount})
+        except OutOfStock:
+            return False
+        return True
+
+    @staticmethod
+    def naive_checkout(product_id: int, amount: int) -> bool:
+        product = Product.objects.get(pk=product_id)
+        if product.quantity < amount:
+            return False
+        product.quantity -= amount
+        product.save(update_fields=['quantity'])
+        return True
@@ -0,0 +1,103 @@
+import os
+import shutil
+import tempfile
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import override_settings
+
+from cart.cart import Cart
+from cart.stores import MemoryCartStore
+from orders.checkout import create_order
+from orders.forms import OrderCreateForm
+from orders.models import Order, OrderItems
+from orders.stock import reserve_stock
+from shop.models import Product, Category, Material
+
+
+class Command(BaseCommand):
+    help = ('Замер времени оформления заказа в зависимости от кол-ва строк корзины. '
+            'Выполняется на отдельной временной базе данных, рабочая база данных и кеш сайта не меняются')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1,10,30,100',
+                            help='Кол-во строк корзины через запятую')
+        parser.add_argument('--repeat', type=int, default=20, help='Кол-во заказов для каждого размера корзины')
+        parser.add_argument('--naive', action='store_true',
+                            help='Записывать строки заказа по одной без общей транзакции, для сравнения')
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(size) for size in options['sizes'].split(',')]
+        except ValueError:
+            raise CommandError('--sizes должен быть списком чисел через запятую')
+        if not sizes or min(sizes) < 1 or options['repeat'] < 1:
+            raise CommandError('Размеры корзины и --repeat должны быть больше нуля')
+
+        # отдельная база данных в файле: фиксации транзакций стоят столько же, сколько на рабочей базе
+        tmp_dir = tempfile.mkdtemp(prefix='benchmark-order-')
+        test_name = connection.settings_dict['TEST']['NAME']
+        if connection.vendor == 'sqlite':
+            connection.settings_dict['TEST']['NAME'] = os.path.join(tmp_dir, 'benchmark.sqlite3')
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            # сигналы моделей меняют версии каталога, они остаются в памяти этого процесса
+            with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                                       'LOCATION': 'benchmark-order-create'}}):
+                self.run_benchmarks(sizes, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            connection.settings_dict['TEST']['NAME'] = test_name
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def run_benchmarks(self, sizes: list, options: dict) -> None:
+        category = Category.objects.create(name='Замер заказов', slug='benchmark-order')
+        material = Material.objects.create(name='Замер заказов', slug='benchmark-order')
+        # первые товары входят в корзины всех размеров
+        stock = options['repeat'] * len(sizes)
+        products = Product.objects.bulk_create([
+            Product(name=f'Замер заказов {number}', slug=f'benchmark-order-{number}', price='99.90', quantity=stock,
+                    category=category, material=material)
+            for number in range(max(sizes))
+        ])
+        user = get_user_model().objects.create(username='benchmark-order', email='benchmark-order@example.com')
+        for size in sizes:
+            self.run_benchmark(user, products[:size], options)
+
+    def run_benchmark(self, user, products: list, options: dict) -> None:
+        place = self.naive_create_order if options['naive'] else create_order
+        data = {'first_name': 'Замер', 'last_name': 'Заказов', 'email': user.email, 'phone_number': '1',
+                'address': 'Замер', 'postal_code': '0', 'city': 'Замер'}
+        request = RequestFactory().post('/')
+        request.session = {}
+        latencies = []
+        for _ in range(options['repeat']):
+            cart = Cart(request, store=MemoryCartStore({str(product.pk): {'quantity': 1, 'price': '99.9'}
+                                                        for product in products}))
+            form = OrderCreateForm(data)
+            form.is_valid()
+            started = time.perf_counter()
+            place(form, user, cart)
+            latencies.append(time.perf_counter() - started)
+        latencies.sort()
+        self.stdout.write(
+            f'{"по одной строке" if options["naive"] else "bulk_create"}, строк: {len(products)}, '
+            f'заказов: {len(latencies)}: p50 {latencies[len(latencies) // 2] * 1000:.1f} мс, '
+            f'p95 {latencies[int(len(latencies) * 0.95)] * 1000:.1f} мс')
+
+    @staticmethod
+    def naive_create_order(form, user, cart) -> Order:
+        """
+        Прежнее оформление: каждая строка заказа - отдельный INSERT со своей фиксацией
+        """
+        reserve_stock({int(product_id): item['quantity'] for product_id, item in cart.cart.items()})
+        order = form.save(commit=False)
+        order.user = user
+        order.save()
+        for item in cart:
+            OrderItems.objects.create(order=order, product=item.product, product_amount=item.quantity,
+                                      product_price=item.price)
+        return order
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.bought_together import update_bought_together
+
+
+class Command(BaseCommand):
+    help = ('Обновляет индекс "покупают вместе" по строкам заказов. '
+            'По умолчанию учитываются только заказы, появившиеся после прошлого запуска')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Пересчитать все заказы заново')
+        parser.add_argument('--top', type=int, help='Кол-во партнеров товара, по умолчанию BOUGHT_TOGETHER_COUNT')
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='Кол-во заказов, пары которых накапливаются в памяти перед записью')
+
+    def handle(self, *args, **options):
+        if options['top'] is not None and options['top'] < 1:
+            raise CommandError('--top должен быть больше нуля')
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size должен быть больше нуля')
+        stats = update_bought_together(full=options['full'], count=options['top'], chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Учтено заказов: {stats["orders"]}, пар товаров: {stats["pairs"]}, '
+            f'пересчитано товаров: {stats["products"]}'))
@@ -0,0 +1,64 @@
+# Generated by Django 5.0.1 on 2026-10-18 13:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0002_initial'),
+        ('shop', '0009_relatedproduct'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BoughtTogetherCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_item_id', models.PositiveBigIntegerField(default=0, verbose_name='Последняя учтенная строка заказа')),
+                ('time_update', models.DateTimeField(auto_now=True, verbose_name='Время расчета')),
+            ],
+            options={
+                'verbose_name': 'Расчет совместных покупок',
+                'verbose_name_plural': 'Расчет совместных покупок',
+            },
+        ),
+        migrations.CreateModel(
+            name='BoughtTogether',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField(verbose_name='Место в списке')),
+                ('orders_count', models.PositiveIntegerField(verbose_name='Кол-во заказов')),
+                ('computed_at', models.DateTimeField(verbose_name='Время расчета')),
+                ('partner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='shop.product', verbose_name='Товар в том же заказе')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bought_together', to='shop.product', verbose_name='Товар')),
+            ],
+            options={
+                'verbose_name': 'Покупают вместе',
+                'verbose_name_plural': 'Покупают вместе',
+                'ordering': ['product', 'rank'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductPairCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('orders_count', models.PositiveIntegerField(default=0, verbose_name='Кол-во заказов')),
+                ('partner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='shop.product', verbose_name='Товар в том же заказе')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='shop.product', verbose_name='Товар')),
+            ],
+            options={
+                'verbose_name': 'Совместная покупка',
+                'verbose_name_plural': 'Совместные покупки',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='boughttogether',
+            constraint=models.UniqueConstraint(fields=('product', 'rank'), name='orders_boughttogether_product_rank_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='productpaircount',
+            constraint=models.UniqueConstraint(fields=('product', 'partner'), name='orders_productpaircount_pair_uniq'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.0.1 on 2026-10-18 13:45
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_order_totals(apps, schema_editor):
+    """
+    Заполняет итоги существующих заказов одним запросом UPDATE по их строкам, как orders.totals на момент миграции
+    """
+    Order = apps.get_model('orders', 'Order')
+    OrderItems = apps.get_model('orders', 'OrderItems')
+    items = OrderItems.objects.filter(order=OuterRef('pk')).order_by().values('order')
+    Order.objects.update(
+        total_cost=Coalesce(
+            Subquery(items.annotate(cost=Sum(F('product_price') * F('product_amount'))).values('cost')),
+            Value(Decimal('0')), output_field=models.DecimalField(max_digits=12, decimal_places=2)),
+        total_items=Coalesce(Subquery(items.annotate(amount=Sum('product_amount')).values('amount')), Value(0)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_bought_together'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='total_cost',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12, verbose_name='Общая стоимость'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='total_items',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Кол-во товаров'),
+        ),
+        migrations.RunPython(fill_order_totals, migrations.RunPython.noop),
+    ]
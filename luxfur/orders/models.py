@@ -22,7 +22,11 @@ class Order(models.Model):
     time_create = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания заказа")
     time_update = models.DateTimeField(auto_now=True, verbose_name="Дата обновления заказа")
     paid = models.BooleanField(default=False, verbose_name="Оплата")
-
+    # итоги заказа хранятся в самом заказе, чтобы списки заказов и отчеты не пересчитывали строки.
+    # Заполняются при оформлении и пересчитываются при изменении строк (см. orders.totals)
+    total_cost = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False,
+                                     verbose_name="Общая стоимость")
+    total_items = models.PositiveIntegerField(default=0, editable=False, verbose_name="Кол-во товаров")
 
     class Meta:
         verbose_name = "Заказ"
@@ -34,15 +38,13 @@ class Order(models.Model):
                                                          self.time_create.strftime("%Y-%m-%d %H:%M:%S"))
 
     def get_total_items(self):
-        order_item: OrderItems
-        return sum([order_item.product_amount for order_item in self.order_items.all()])
+        return self.total_items
 
     def get_items(self):
         return self.order_items.all()
 
     def get_total_cost(self):
-        items = self.get_items()
-        return sum(item.get_cost() for item in items.all())
+        return self.total_cost
 
     def get_absolute_url(self):
         return reverse('orders:order_detail', args=[str(self.id)])
@@ -68,5 +70,54 @@ class OrderItems(models.Model):
         return self.product_price * self.product_amount
 
 
+class ProductPairCount(models.Model):
+    """
+    Разреженная матрица совместных покупок: в скольких заказах товары куплены вместе.
+    Каждая пара хранится в обе стороны, чтобы партнеры товара выбирались по индексу product
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+', verbose_name="Товар")
+    partner = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+', verbose_name="Товар в том же заказе")
+    orders_count = models.PositiveIntegerField(default=0, verbose_name="Кол-во заказов")
+
+    class Meta:
+        verbose_name = "Совместная покупка"
+        verbose_name_plural = "Совместные покупки"
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'partner'], name='orders_productpaircount_pair_uniq'),
+        ]
 
 
+class BoughtTogether(models.Model):
+    """
+    Товары, которые чаще всего покупают вместе с товаром: первые BOUGHT_TOGETHER_COUNT партнеров
+    из ProductPairCount. Заполняется командой rebuild_bought_together
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='bought_together',
+                                verbose_name="Товар")
+    partner = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+', verbose_name="Товар в том же заказе")
+    rank = models.PositiveSmallIntegerField(verbose_name="Место в списке")
+    orders_count = models.PositiveIntegerField(verbose_name="Кол-во заказов")
+    computed_at = models.DateTimeField(verbose_name="Время расчета")
+
+    def __str__(self):
+        return f'{self.product_id} + {self.partner_id}'
+
+    class Meta:
+        verbose_name = "Покупают вместе"
+        verbose_name_plural = "Покупают вместе"
+        ordering = ['product', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'rank'], name='orders_boughttogether_product_rank_uniq'),
+        ]
+
+
+class BoughtTogetherCheckpoint(models.Model):
+    """
+    Последняя учтенная в ProductPairCount строка OrderItems. Одна запись на базу данных
+    """
+    last_item_id = models.PositiveBigIntegerField(default=0, verbose_name="Последняя учтенная строка заказа")
+    time_update = models.DateTimeField(auto_now=True, verbose_name="Время расчета")
+
+    class Meta:
+        verbose_name = "Расчет совместных покупок"
+        verbose_name_plural = "Расчет совместных покупок"
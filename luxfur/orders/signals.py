@@ -0,0 +1,45 @@
+import threading
+
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+
+from .models import Order, OrderItems
+from .totals import refresh_order_totals
+
+# id заказов, которые удаляются в текущем потоке
+_deleting = threading.local()
+
+
+def _deleting_order_ids() -> set:
+    if not hasattr(_deleting, 'order_ids'):
+        _deleting.order_ids = set()
+    return _deleting.order_ids
+
+
+@receiver(pre_delete, sender=Order)
+def mark_order_deleting(sender, instance: Order, **kwargs):
+    """
+    Заказ удаляется вместе со строками: строки удаляются каскадно раньше заказа,
+    и пересчитывать итоги удаляемого заказа после каждой строки незачем
+    """
+    _deleting_order_ids().add(instance.pk)
+
+
+@receiver(post_delete, sender=Order)
+def unmark_order_deleting(sender, instance: Order, **kwargs):
+    _deleting_order_ids().discard(instance.pk)
+
+
+@receiver(post_save, sender=OrderItems)
+@receiver(post_delete, sender=OrderItems)
+def update_order_totals_on_item_change(sender, instance: OrderItems, **kwargs):
+    """
+    Итоги заказа пересчитываются при добавлении, изменении и удалении строки, например в админке.
+    При оформлении строки записываются bulk_create без сигналов, итоги заполняет create_order
+    """
+    if instance.order_id in _deleting_order_ids():
+        return
+    order_field = OrderItems._meta.get_field('order')
+    # заказ, уже загруженный вместе со строкой, тоже получает новые итоги
+    order = instance.order if order_field.is_cached(instance) else None
+    refresh_order_totals(instance.order_id, order)
@@ -0,0 +1,67 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Now
+
+from shop.models import Product
+
+
+class OutOfStock(Exception):
+    """
+    Товара не хватает для заказа. В lines перечислены все строки, которые не удалось зарезервировать
+    """
+
+    def __init__(self, lines: list):
+        """
+        :param lines: список StockShortage
+        """
+        self.lines = lines
+        super().__init__('; '.join(str(line) for line in lines))
+
+
+class StockShortage:
+    """
+    Строка заказа, для которой не хватило товара
+    """
+
+    def __init__(self, product_id: int, name: str, available, requested: int):
+        self.product_id = product_id
+        self.name = name
+        self.available = available or 0
+        self.requested = requested
+
+    def __str__(self):
+        if not self.available:
+            return f'"{self.name}" нет в наличии'
+        return f'"{self.name}": в наличии {self.available} шт., в заказе {self.requested} шт.'
+
+
+def reserve_stock(lines: dict) -> None:
+    """
+    Списывает остатки товаров для заказа в одной транзакции. Каждая строка списывается условным запросом
+    UPDATE ... SET quantity = quantity - n WHERE quantity >= n, поэтому одновременные заказы не могут
+    продать больше остатка и не ждут друг друга дольше одного запроса. Товары списываются в порядке id,
+    чтобы транзакции с общими товарами не блокировали друг друга по кругу.
+    Если хотя бы одной строки не хватает, проверяются остальные строки, транзакция откатывается
+    и выбрасывается OutOfStock со всеми недостающими строками. Товар без указанного кол-ва считается
+    отсутствующим
+    :param lines: словарь {id товара: кол-во}
+    :return: None
+    """
+    short = {}
+    with transaction.atomic():
+        for product_id, amount in sorted(lines.items()):
+            # время изменения обновляется, так как остаток выводится на странице товара
+            updated = Product.objects.filter(pk=product_id, quantity__gte=amount).update(
+                quantity=F('quantity') - amount, time_update=Now())
+            if not updated:
+                short[product_id] = amount
+        if short:
+            current = {pk: (name, quantity) for pk, name, quantity in
+                       Product.objects.filter(pk__in=short).values_list('pk', 'name', 'quantity')}
+            # товар мог быть удален из каталога после добавления в корзину
+            shortages = [StockShortage(pk, *current.get(pk, (f'Товар {pk}', 0)), requested=short[pk])
+                         for pk in sorted(short)]
+            transaction.set_rollback(True)
+    if short:
+        raise OutOfStock(shortages)
+
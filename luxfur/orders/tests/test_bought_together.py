@@ -0,0 +1,92 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from orders.bought_together import update_bought_together, get_bought_together
+from orders.models import Order, OrderItems, ProductPairCount, BoughtTogether
+from shop.models import Material, Category, Product
+
+
+class BoughtTogetherTestCase(TestCase):
+    """
+    Тестируем индекс "покупают вместе"
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = get_user_model().objects.create(username='buyer', email='buyer@example.com')
+        material = Material.objects.create(name='Латунь', slug='Latun')
+        category = Category.objects.create(name='Ручки для мебели', slug='ruchki-dlya-mebeli')
+        cls.handle, cls.screw, cls.knob, cls.hinge = [
+            Product.objects.create(name=name, slug=slug, price=100, material=material, category=category)
+            for name, slug in (('Ручка', 'ruchka'), ('Винт', 'vint'), ('Кнопка', 'knopka'), ('Петля', 'petlya'))
+        ]
+
+    def create_order(self, *products) -> Order:
+        order = Order.objects.create(user=self.user, first_name='Саша', last_name='Джус', email='buyer@example.com',
+                                     address='ул. Ленина 1', postal_code='299038', city='Севастополь')
+        for product in products:
+            OrderItems.objects.create(order=order, product=product, product_price=product.price)
+        return order
+
+    def partners(self, product: Product) -> list:
+        return list(BoughtTogether.objects.filter(product=product).values_list('partner_id', 'orders_count'))
+
+    def test_top_partners(self) -> None:
+        """
+        Тест расчета партнеров: порядок по кол-ву заказов, повтор товара в заказе учитывается один раз
+        :return: None
+        """
+        self.create_order(self.handle, self.screw, self.screw)
+        self.create_order(self.handle, self.screw, self.knob)
+        self.create_order(self.hinge)
+        call_command('rebuild_bought_together', '--full', stdout=StringIO())
+
+        self.assertEqual(self.partners(self.handle), [(self.screw.pk, 2), (self.knob.pk, 1)])
+        self.assertEqual(self.partners(self.knob), [(self.handle.pk, 1), (self.screw.pk, 1)])
+        self.assertEqual(self.partners(self.hinge), [])
+        self.assertEqual(ProductPairCount.objects.get(product=self.screw, partner=self.handle).orders_count, 2)
+
+    def test_incremental_update(self) -> None:
+        """
+        Тест учета только новых заказов и новых строк уже учтенного заказа
+        :return: None
+        """
+        order = self.create_order(self.handle, self.screw)
+        update_bought_together(full=True)
+        self.assertEqual(update_bought_together()['orders'], 0)
+
+        OrderItems.objects.create(order=order, product=self.knob, product_price=100)
+        self.create_order(self.handle, self.knob)
+        stats = update_bought_together()
+        self.assertEqual(stats['orders'], 2)
+        self.assertEqual(self.partners(self.handle), [(self.knob.pk, 2), (self.screw.pk, 1)])
+        self.assertEqual(self.partners(self.screw), [(self.handle.pk, 1), (self.knob.pk, 1)])
+
+    def test_product_and_cart_pages(self) -> None:
+        """
+        Тест вывода на странице товара и в корзине: для корзины кол-во заказов складывается,
+        товары из корзины не выводятся
+        :return: None
+        """
+        self.create_order(self.handle, self.screw, self.knob)
+        self.create_order(self.handle, self.knob)
+        self.create_order(self.screw, self.hinge)
+        update_bought_together(full=True)
+
+        with self.assertNumQueries(1):
+            partners = get_bought_together([self.handle.pk])
+        self.assertEqual([row.pk for row in partners], [self.knob.pk, self.screw.pk])
+        self.assertEqual([row.pk for row in get_bought_together([self.handle.pk, self.screw.pk])],
+                         [self.knob.pk, self.hinge.pk])
+
+        response = self.client.get(self.handle.get_absolute_url())
+        self.assertEqual([row.pk for row in response.context['bought_together']], [self.knob.pk, self.screw.pk])
+
+        self.client.post(reverse('cart:cart_add', args=[self.hinge.pk]), {'quantity': 1})
+        response = self.client.get(reverse('cart:cart_detail'))
+        self.assertEqual([row.pk for row in response.context['bought_together']], [self.screw.pk])
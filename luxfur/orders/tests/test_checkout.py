@@ -0,0 +1,69 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from cart.cart import Cart
+from cart.stores import MemoryCartStore
+from orders.checkout import create_order
+from orders.forms import OrderCreateForm
+from orders.models import Order
+from orders.stock import OutOfStock
+from shop.models import Material, Category, Product
+
+
+class CreateOrderTestCase(TestCase):
+    """
+    Тестируем оформление заказа одной транзакцией
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = get_user_model().objects.create(username='checkout-buyer', email='checkout@example.com')
+        material = Material.objects.create(name='Латунь', slug='Latun')
+        category = Category.objects.create(name='Ручки для мебели', slug='ruchki-dlya-mebeli')
+        cls.products = [Product.objects.create(name=f'Ручка {number}', slug=f'ruchka-{number}', price=100 + number,
+                                               quantity=3, material=material, category=category)
+                        for number in range(30)]
+        cls.data = {'first_name': 'Саша', 'last_name': 'Джус', 'email': 'checkout@example.com', 'phone_number': '1',
+                    'address': 'ул. Ленина 1', 'postal_code': '299038', 'city': 'Севастополь'}
+
+    def make_cart(self, quantity: int) -> Cart:
+        request = RequestFactory().post('/')
+        request.session = {}
+        return Cart(request, store=MemoryCartStore({str(product.pk): {'quantity': quantity, 'price': str(product.price)}
+                                                    for product in self.products}))
+
+    def make_form(self) -> OrderCreateForm:
+        form = OrderCreateForm(self.data)
+        self.assertTrue(form.is_valid())
+        return form
+
+    def test_items_written_with_one_insert(self) -> None:
+        """
+        Тест: все строки заказа записываются одним INSERT, товары корзины не загружаются
+        :return: None
+        """
+        with CaptureQueriesContext(connection) as queries:
+            order = create_order(self.make_form(), self.user, self.make_cart(2))
+        sql = [query['sql'] for query in queries]
+        self.assertEqual(len([query for query in sql if query.startswith('INSERT INTO "orders_orderitems"')]), 1)
+        self.assertFalse([query for query in sql if query.startswith('SELECT') and '"shop_product"' in query])
+        self.assertEqual(order.order_items.count(), 30)
+        # итоги записаны вместе с заказом и совпадают с суммой строк
+        order.refresh_from_db()
+        self.assertEqual((order.total_items, order.total_cost),
+                         (60, Decimal(2 * sum(100 + number for number in range(30)))))
+
+    def test_shortage_writes_nothing(self) -> None:
+        """
+        Тест нехватки товара: ни заказ, ни строки, ни списание остатков не сохраняются
+        :return: None
+        """
+        with self.assertRaises(OutOfStock):
+            create_order(self.make_form(), self.user, self.make_cart(4))
+        self.assertFalse(Order.objects.filter(user=self.user).exists())
+        self.assertEqual(set(Product.objects.values_list('quantity', flat=True)), {3})
@@ -0,0 +1,69 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from orders.models import Order
+from orders.stock import OutOfStock, reserve_stock
+from shop.models import Material, Category, Product
+
+
+class ReserveStockTestCase(TestCase):
+    """
+    Тестируем списание остатков при оформлении заказа
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = get_user_model().objects.create(username='stock-buyer', email='stock@example.com')
+        material = Material.objects.create(name='Латунь', slug='Latun')
+        category = Category.objects.create(name='Ручки для мебели', slug='ruchki-dlya-mebeli')
+        cls.handle = Product.objects.create(name='Ручка', slug='ruchka', price=100, quantity=5,
+                                            material=material, category=category)
+        cls.screw = Product.objects.create(name='Винт', slug='vint', price=10, quantity=2,
+                                           material=material, category=category)
+        cls.knob = Product.objects.create(name='Кнопка', slug='knopka', price=50,
+                                          material=material, category=category)
+
+    def quantities(self) -> list:
+        return list(Product.objects.filter(pk__in=[self.handle.pk, self.screw.pk, self.knob.pk])
+                    .order_by('pk').values_list('quantity', flat=True))
+
+    def test_reserve(self) -> None:
+        """
+        Тест списания остатков всех строк заказа
+        :return: None
+        """
+        reserve_stock({self.handle.pk: 5, self.screw.pk: 1})
+        self.assertEqual(self.quantities(), [0, 1, None])
+
+    def test_shortage_rolls_back_all_lines(self) -> None:
+        """
+        Тест отказа: остатки не меняются, в ошибке перечислены все недостающие строки
+        :return: None
+        """
+        with self.assertRaises(OutOfStock) as context:
+            reserve_stock({self.handle.pk: 1, self.screw.pk: 3, self.knob.pk: 1})
+        self.assertEqual(self.quantities(), [5, 2, None])
+        self.assertEqual([(line.product_id, line.available, line.requested) for line in context.exception.lines],
+                         [(self.screw.pk, 2, 3), (self.knob.pk, 0, 1)])
+        self.assertEqual(str(context.exception.lines[1]), '"Кнопка" нет в наличии')
+
+    def test_order_create_out_of_stock(self) -> None:
+        """
+        Тест оформления заказа: при нехватке товара заказ не создается, посетитель видит причину
+        :return: None
+        """
+        self.client.force_login(self.user)
+        self.client.post(reverse('cart:cart_add', args=[self.screw.pk]), {'quantity': 3})
+        data = {'first_name': 'Саша', 'last_name': 'Джус', 'email': 'stock@example.com', 'phone_number': '1',
+                'address': 'ул. Ленина 1', 'postal_code': '299038', 'city': 'Севастополь'}
+        response = self.client.post(reverse('orders:order_create'), data)
+        self.assertContains(response, '&quot;Винт&quot;: в наличии 2 шт., в заказе 3 шт.')
+        self.assertFalse(Order.objects.filter(user=self.user).exists())
+
+        self.client.post(reverse('cart:cart_add', args=[self.screw.pk]), {'quantity': 2, 'update': True})
+        response = self.client.post(reverse('orders:order_create'), data)
+        self.assertTemplateUsed(response, 'orders/order_create_done.html')
+        self.assertEqual(Order.objects.get(user=self.user).order_items.get().product_amount, 2)
+        self.assertEqual(self.quantities(), [5, 0, None])
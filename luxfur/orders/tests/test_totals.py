@@ -0,0 +1,99 @@
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from orders.models import Order, OrderItems
+from orders.totals import update_order_totals
+from shop.models import Material, Category, Product
+
+
+class OrderTotalsTestCase(TestCase):
+    """
+    Тестируем итоги заказа, хранящиеся в самом заказе
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = get_user_model().objects.create(username='totals-buyer', email='totals@example.com')
+        material = Material.objects.create(name='Латунь', slug='Latun')
+        category = Category.objects.create(name='Ручки для мебели', slug='ruchki-dlya-mebeli')
+        cls.handle = Product.objects.create(name='Ручка', slug='ruchka', price=100, quantity=5,
+                                            material=material, category=category)
+        cls.screw = Product.objects.create(name='Винт', slug='vint', price='10.50', quantity=5,
+                                           material=material, category=category)
+
+    def make_order(self) -> Order:
+        return Order.objects.create(user=self.user, first_name='Саша', last_name='Джус', email='totals@example.com',
+                                    address='ул. Ленина 1', postal_code='299038', city='Севастополь')
+
+    def totals(self, order: Order) -> tuple:
+        return tuple(Order.objects.filter(pk=order.pk).values_list('total_items', 'total_cost').get())
+
+    def test_item_changes(self) -> None:
+        """
+        Тест пересчета итогов при добавлении, изменении и удалении строк заказа
+        :return: None
+        """
+        order = self.make_order()
+        self.assertEqual(self.totals(order), (0, Decimal('0')))
+        item = OrderItems.objects.create(order=order, product=self.handle, product_amount=2, product_price=100)
+        OrderItems.objects.create(order=order, product=self.screw, product_amount=3, product_price='10.50')
+        self.assertEqual(self.totals(order), (5, Decimal('231.50')))
+        self.assertEqual((order.get_total_items(), order.get_total_cost()), (5, Decimal('231.50')))
+
+        item.product_amount = 1
+        item.save()
+        self.assertEqual(self.totals(order), (4, Decimal('131.50')))
+        item.delete()
+        self.assertEqual(self.totals(order), (3, Decimal('31.50')))
+
+    def test_order_delete_skips_totals(self) -> None:
+        """
+        Тест удаления заказа: строки удаляются каскадно без пересчета итогов удаляемого заказа
+        :return: None
+        """
+        orders = [self.make_order(), self.make_order()]
+        order_ids = [order.pk for order in orders]
+        for order in orders:
+            OrderItems.objects.create(order=order, product=self.handle, product_amount=2, product_price=100)
+            OrderItems.objects.create(order=order, product=self.screw, product_amount=1, product_price='10.50')
+        with CaptureQueriesContext(connection) as queries:
+            orders[0].delete()
+            Order.objects.filter(pk=orders[1].pk).delete()
+        self.assertFalse([query for query in queries if query['sql'].startswith('UPDATE "orders_order"')])
+        self.assertFalse(OrderItems.objects.filter(order_id__in=order_ids).exists())
+
+        # после удаления заказа строки других заказов по-прежнему пересчитывают итоги
+        order = self.make_order()
+        OrderItems.objects.create(order=order, product=self.handle, product_amount=3, product_price=100)
+        self.assertEqual(self.totals(order), (3, Decimal('300')))
+
+    def test_backfill(self) -> None:
+        """
+        Тест заполнения итогов заказов одним запросом UPDATE
+        :return: None
+        """
+        first, second, empty = self.make_order(), self.make_order(), self.make_order()
+        OrderItems.objects.bulk_create([
+            OrderItems(order=first, product=self.handle, product_amount=2, product_price=100),
+            OrderItems(order=first, product=self.screw, product_amount=1, product_price='10.50'),
+            OrderItems(order=second, product=self.screw, product_amount=4, product_price=10),
+        ])
+        Order.objects.filter(pk=empty.pk).update(total_items=7, total_cost=70)
+        with self.assertNumQueries(1):
+            self.assertEqual(update_order_totals(Order.objects.filter(user=self.user)), 3)
+        self.assertEqual([self.totals(order) for order in (first, second, empty)],
+                         [(3, Decimal('210.50')), (4, Decimal('40')), (0, Decimal('0'))])
+
+        Order.objects.filter(pk=first.pk).update(total_items=0, total_cost=0)
+        output = StringIO()
+        call_command('backfill_order_totals', '--empty', stdout=output)
+        self.assertIn('Итоги пересчитаны для', output.getvalue())
+        self.assertEqual([self.totals(order) for order in (first, second)],
+                         [(3, Decimal('210.50')), (4, Decimal('40'))])
@@ -190,9 +190,9 @@ class OrderCreateViewTestCase(TestCase):
         # создание OrderItems
 
         for item in cart:
-            OrderItems.objects.create(order=Order.objects.get(pk=1), product=item['product'],
-                                      product_amount=item['quantity'],
-                                      product_price=item['price'])
+            OrderItems.objects.create(order=Order.objects.get(pk=1), product=item.product,
+                                      product_amount=item.quantity,
+                                      product_price=item.price)
 
         # Проверяем создание списка продуктов в заказе(OrderItems)
         response_order_items = self.client.get('/orders/order-detail/1/')
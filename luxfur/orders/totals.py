@@ -0,0 +1,38 @@
+from decimal import Decimal
+
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import Order, OrderItems
+
+
+def update_order_totals(orders) -> int:
+    """
+    Пересчитывает общую стоимость и кол-во товаров заказов одним запросом
+    UPDATE ... SET total_cost = (SELECT SUM(...)), total_items = (SELECT SUM(...)) по строкам заказов.
+    Заказ без строк получает нулевые итоги
+    :param orders: QuerySet заказов
+    :return: кол-во обновленных заказов
+    """
+    items = OrderItems.objects.filter(order=OuterRef('pk')).order_by().values('order')
+    return orders.update(
+        total_cost=Coalesce(
+            Subquery(items.annotate(cost=Sum(F('product_price') * F('product_amount'))).values('cost')),
+            Value(Decimal('0')), output_field=DecimalField(max_digits=12, decimal_places=2)),
+        total_items=Coalesce(Subquery(items.annotate(amount=Sum('product_amount')).values('amount')), Value(0)),
+    )
+
+
+def refresh_order_totals(order_id: int, order: Order = None) -> None:
+    """
+    Пересчитывает итоги одного заказа после изменения его строк
+    :param order_id: id заказа
+    :param order: загруженный заказ, если есть: его итоги обновляются из базы данных
+    :return: None
+    """
+    update_order_totals(Order.objects.filter(pk=order_id))
+    if order is not None:
+        # заказ может быть удален в другом запросе
+        totals = Order.objects.filter(pk=order_id).values_list('total_cost', 'total_items').first()
+        if totals is not None:
+            order.total_cost, order.total_items = totals
@@ -4,7 +4,9 @@ from django.views.generic import CreateView, DetailView
 
 from .forms import OrderCreateForm
 from .models import *
-from cart.cart import Cart
+from .checkout import create_order
+from .stock import OutOfStock
+from cart.cart import get_cart
 
 from .tasks import order_created
 
@@ -31,7 +33,8 @@ class OrderDetail(DetailView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         order: Order = self.object
-        order_item = OrderItems.objects.filter(order_id=order)
+        # товары строк загружаются тем же запросом, итог берется из заказа без пересчета строк
+        order_item = OrderItems.objects.filter(order_id=order).select_related('product')
         total_cost = order.get_total_cost()
         context['order'] = order
         context['order_item'] = order_item
@@ -42,24 +45,27 @@ class OrderDetail(DetailView):
 
 
 def order_create(request):
-    cart = Cart(request)
+    cart = get_cart(request)
     if request.method == 'POST':
         form = OrderCreateForm(request.POST)
+        pricing = cart.get_pricing()
+        if pricing.previous_prices or pricing.removed:
+            # корзина уже сверена с каталогом, покупатель подтверждает заказ по новым ценам повторной отправкой
+            form.add_error(None, 'Цены или состав корзины изменились, проверьте заказ и отправьте его еще раз')
         if form.is_valid():
-            order = form.save(commit=False)
-            order.user = request.user
-            order.save()
-            for item in cart:
-                OrderItems.objects.create(order=order, product=item['product'],
-                                          product_amount=item['quantity'],
-                                          product_price=item['price'])
-
-            cart.clear()
-            # order_created.delay(order.id)
-            data = {
-                'order': order,
-            }
-            return render(request, 'orders/order_create_done.html', context=data)
+            try:
+                # заказ сохраняется только вместе со списанием остатков всех его строк
+                order = create_order(form, request.user, cart)
+            except OutOfStock as exc:
+                for line in exc.lines:
+                    form.add_error(None, str(line))
+            else:
+                cart.clear()
+                # order_created.delay(order.id)
+                data = {
+                    'order': order,
+                }
+                return render(request, 'orders/order_create_done.html', context=data)
 
     else:
         form = OrderCreateForm()
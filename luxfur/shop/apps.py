@@ -5,3 +5,6 @@ class ShopConfig(AppConfig):
     verbose_name = 'Магазин'
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'shop'
+
+    def ready(self):
+        from . import signals  # noqa: F401 подключаем обработчики сигналов
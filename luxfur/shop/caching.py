@@ -0,0 +1,183 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import transaction
+
+
+CATALOG_VERSION_KEY = 'shop:catalog:version'
+PRICE_VERSION_KEY = 'shop:catalog:price_version'
+GROUP_VERSION_KEY = 'shop:groups:version'
+
+
+def _version_key(kind: str, group_id) -> str:
+    return f'shop:listing:{kind}:{group_id}:version'
+
+
+def _get_version(key: str) -> int:
+    version = cache.get(key)
+    if version is None:
+        # новая версия строится от времени, чтобы после вытеснения ключа не совпасть со старой
+        version = time.time_ns()
+        cache.add(key, version, None)
+        version = cache.get(key, version)
+    return version
+
+
+def _bump_version(key: str) -> None:
+    def bump():
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), None)
+
+    bump()
+    # повторно после фиксации транзакции: параллельный запрос мог закешировать данные до коммита
+    transaction.on_commit(bump)
+
+
+def get_listing_version(kind: str, group_id) -> int:
+    """
+    Текущая версия списка товаров группы (категории или материала).
+    Версия входит в ключи кеша страниц, поэтому ее смена делает все страницы группы недействительными
+    :param kind: category или material
+    :param group_id: id группы
+    :return: номер версии
+    """
+    return _get_version(_version_key(kind, group_id))
+
+
+def bump_listing_version(kind: str, group_id) -> None:
+    """
+    Делает недействительными закешированные страницы группы
+    :param kind: category или material
+    :param group_id: id группы
+    :return: None
+    """
+    if group_id is None:
+        return
+    _bump_version(_version_key(kind, group_id))
+
+
+def get_catalog_version() -> int:
+    """
+    Версия всего каталога, меняется при любом сохранении или удалении товара.
+    Хранится в общем кеше (файловый кеш из CACHES), поэтому видна всем процессам
+    :return: номер версии
+    """
+    return _get_version(CATALOG_VERSION_KEY)
+
+
+def bump_catalog_version() -> None:
+    """
+    Делает недействительными данные, построенные по всему каталогу (например, результаты поиска)
+    :return: None
+    """
+    _bump_version(CATALOG_VERSION_KEY)
+
+
+def get_price_version() -> int:
+    """
+    Версия цен каталога, меняется при изменении цены любого товара.
+    Запоминается в корзине, чтобы по ней понять, могли ли устареть цены в корзине
+    :return: номер версии
+    """
+    return _get_version(PRICE_VERSION_KEY)
+
+
+def bump_price_version() -> None:
+    """
+    Отмечает изменение цен каталога
+    :return: None
+    """
+    _bump_version(PRICE_VERSION_KEY)
+
+
+def get_group_version() -> int:
+    """
+    Версия категорий и материалов, меняется при их изменении или удалении.
+    Названия групп выводятся на странице товара, поэтому версия входит в ее ETag
+    :return: номер версии
+    """
+    return _get_version(GROUP_VERSION_KEY)
+
+
+def bump_group_version() -> None:
+    """
+    Отмечает изменение категорий или материалов
+    :return: None
+    """
+    _bump_version(GROUP_VERSION_KEY)
+
+
+def get_user_cart_version(user_id) -> int:
+    """
+    Версия корзины пользователя, хранящейся в базе данных. По ней ETag страниц учитывает корзину
+    без запроса к таблице корзины
+    :param user_id: id пользователя
+    :return: номер версии
+    """
+    return _get_version(f'cart:user:{user_id}:version')
+
+
+def bump_user_cart_version(user_id) -> None:
+    """
+    Отмечает изменение корзины пользователя
+    :param user_id: id пользователя
+    :return: None
+    """
+    _bump_version(f'cart:user:{user_id}:version')
+
+
+def get_cached_group(model, slug: str):
+    """
+    Категория или материал по slug из кеша
+    :param model: Category или Material
+    :param slug: slug группы
+    :return: словарь с pk, name и slug или None, если группа не найдена
+    """
+    key = f'shop:{model._meta.model_name}:slug:{slug}'
+    group = cache.get(key)
+    if group is None:
+        group = model.objects.filter(slug=slug).values('pk', 'name', 'slug').first()
+        if group is None:
+            return None
+        cache.set(key, group, settings.CATALOG_CACHE_TIMEOUT)
+    return group
+
+
+def forget_cached_group(model, *slugs) -> None:
+    cache.delete_many([f'shop:{model._meta.model_name}:slug:{slug}' for slug in slugs if slug])
+
+
+def get_listing_page(kind: str, group_id, queryset, page_number, per_page: int):
+    """
+    Страница упорядоченного списка товаров группы.
+    Страница целиком (товары и общее кол-во) кешируется под текущей версией группы,
+    при попадании в кеш запросов к базе данных нет
+    :param kind: category или material
+    :param group_id: id группы
+    :param queryset: упорядоченный набор товаров группы, выполняется только при промахе кеша
+    :param page_number: номер страницы из запроса
+    :param per_page: кол-во товаров на странице
+    :return: Page, у которой object_list - список товаров
+    """
+    try:
+        page_number = max(int(page_number), 1)
+    except (TypeError, ValueError):
+        page_number = 1
+    version = get_listing_version(kind, group_id)
+    key = f'shop:listing:{kind}:{group_id}:v{version}:{per_page}:{page_number}'
+    data = cache.get(key)
+    if data is None:
+        count = queryset.count()
+        page = Paginator(range(count), per_page).get_page(page_number)
+        products = list(queryset[page.start_index() - 1:page.end_index()]) if count else []
+        data = {'count': count, 'products': products}
+        cache.set(key, data, settings.CATALOG_CACHE_TIMEOUT)
+
+    # пагинатор строится по числу товаров, сами товары берутся из кеша
+    page = Paginator(range(data['count']), per_page).get_page(page_number)
+    page.object_list = data['products']
+    return page
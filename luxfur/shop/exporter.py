@@ -0,0 +1,105 @@
+import csv
+import json
+
+from django.db.models import Prefetch
+
+from .models import Product, ProductImage
+
+# колонки выгрузки, совместимы с командой import_catalog
+EXPORT_FIELDS = ['vendor_code', 'name', 'slug', 'price', 'quantity', 'description', 'category', 'category_name',
+                 'material', 'material_name', 'height', 'length', 'width', 'image', 'gallery']
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+
+
+class _Echo:
+    """
+    Файлоподобный объект для csv.writer: возвращает строку вместо записи в буфер
+    """
+
+    def write(self, value):
+        return value
+
+
+def export_queryset():
+    """
+    Товары для выгрузки: категория и материал в том же запросе, изображения галереи - одним запросом на пачку
+    :return: QuerySet
+    """
+    return (Product.objects.select_related('category', 'material')
+            .prefetch_related(Prefetch('product_image', queryset=ProductImage.objects.order_by('pk')))
+            .order_by('pk'))
+
+
+def export_rows(queryset=None, chunk_size: int = 2000, absolute_url=None):
+    """
+    Строки выгрузки по одной. Товары читаются iterator(chunk_size), поэтому в памяти
+    одновременно находится не больше одной пачки независимо от размера каталога
+    :param queryset: набор товаров, по умолчанию весь каталог
+    :param chunk_size: кол-во товаров, читаемых из базы данных за раз
+    :param absolute_url: функция, превращающая адрес файла в абсолютный
+    :return: генератор словарей с ключами EXPORT_FIELDS
+    """
+    if queryset is None:
+        queryset = export_queryset()
+    absolute_url = absolute_url or (lambda url: url)
+    for product in queryset.iterator(chunk_size=chunk_size):
+        yield {
+            'vendor_code': product.vendor_code or '',
+            'name': product.name,
+            'slug': product.slug,
+            'price': '' if product.price is None else str(product.price),
+            'quantity': '' if product.quantity is None else product.quantity,
+            'description': product.description,
+            'category': product.category.slug,
+            'category_name': product.category.name,
+            'material': product.material.slug,
+            'material_name': product.material.name,
+            'height': product.height,
+            'length': product.length,
+            'width': product.width,
+            'image': absolute_url(product.image.url) if product.image else '',
+            'gallery': [absolute_url(image.image.url) for image in product.product_image.all() if image.image],
+        }
+
+
+def render_csv(rows):
+    """
+    Строки выгрузки в формате CSV, изображения галереи разделены пробелом
+    :param rows: словари из export_rows
+    :return: генератор строк файла
+    """
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        row['gallery'] = ' '.join(row['gallery'])
+        yield writer.writerow([row[name] for name in EXPORT_FIELDS])
+
+
+def render_jsonl(rows):
+    """
+    Строки выгрузки в формате JSONL: один объект JSON на строку
+    :param rows: словари из export_rows
+    :return: генератор строк файла
+    """
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + '\n'
+
+
+RENDERERS = {
+    'csv': render_csv,
+    'jsonl': render_jsonl,
+}
+
+
+def render_export(file_format: str, rows):
+    """
+    Выгрузка в заданном формате
+    :param file_format: csv или jsonl
+    :param rows: словари из export_rows
+    :return: генератор строк файла
+    """
+    return RENDERERS[file_format](rows)
@@ -0,0 +1,295 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Q
+
+from .models import Product, Category, Material, FacetCount
+
+FACET_COUNTS_CACHE_KEY = 'shop:facet_counts'
+
+# поля товара, от которых зависят значения фильтров
+FACET_FIELDS = ('category_id', 'material_id', 'price', 'height', 'length', 'width')
+
+# наибольшее значение поля BigAutoField
+MAX_ID = 2 ** 63 - 1
+
+
+def _format_bound(value) -> str:
+    return '{:g}'.format(value)
+
+
+class Facet:
+    """
+    Фильтр каталога. Значение фильтра для товара - строка, которая хранится в FacetCount
+    """
+    name = None
+    label = None
+
+    def value_of(self, values: dict):
+        """
+        Значение фильтра для товара
+        :param values: словарь полей товара из FACET_FIELDS
+        :return: строка значения или None, если товар не попадает в фильтр
+        """
+        raise NotImplementedError
+
+    def condition(self, value: str) -> Q:
+        """
+        Условие отбора товаров по значению фильтра
+        :param value: строка значения
+        :return: Q или None для неизвестного значения
+        """
+        raise NotImplementedError
+
+    def aggregate(self, queryset) -> dict:
+        """
+        Полный пересчет кол-ва товаров по значениям фильтра
+        :param queryset: набор товаров
+        :return: словарь {значение: кол-во}
+        """
+        raise NotImplementedError
+
+    def labels(self, values) -> dict:
+        """
+        Подписи значений фильтра для шаблона
+        :param values: значения
+        :return: словарь {значение: подпись}
+        """
+        return {value: value for value in values}
+
+
+class RelationFacet(Facet):
+    """
+    Фильтр по внешнему ключу (категория, материал)
+    """
+
+    def __init__(self, name: str, label: str, field: str, model):
+        self.name = name
+        self.label = label
+        self.field = field
+        self.model = model
+
+    def value_of(self, values: dict):
+        value = values.get(self.field)
+        return None if value is None else str(value)
+
+    def condition(self, value: str):
+        # isdigit пропускает надстрочные цифры вроде '²', которые int не разбирает
+        if not value.isdecimal():
+            return None
+        pk = int(value)
+        # число больше BIGINT база данных не примет, а такого id заведомо нет
+        if pk > MAX_ID:
+            return None
+        return Q(**{self.field: pk})
+
+    def aggregate(self, queryset) -> dict:
+        rows = queryset.exclude(**{f'{self.field}__isnull': True}).values(self.field).annotate(
+            total=Count('pk')).order_by()
+        return {str(row[self.field]): row['total'] for row in rows}
+
+    def labels(self, values) -> dict:
+        names = self.model.objects.filter(pk__in=[int(v) for v in values]).values_list('pk', 'name')
+        return {str(pk): name for pk, name in names}
+
+
+class BandFacet(Facet):
+    """
+    Фильтр по диапазонам числового поля. Диапазон (low, high) включает low и не включает high,
+    high = None означает диапазон без верхней границы
+    """
+
+    def __init__(self, name: str, label: str, field: str, bands):
+        self.name = name
+        self.label = label
+        self.field = field
+        self.bands = {self.band_key(low, high): (low, high) for low, high in bands}
+
+    @staticmethod
+    def band_key(low, high) -> str:
+        return f'{_format_bound(low)}-{"" if high is None else _format_bound(high)}'
+
+    def band_condition(self, low, high) -> Q:
+        condition = Q(**{f'{self.field}__gte': low})
+        if high is not None:
+            condition &= Q(**{f'{self.field}__lt': high})
+        return condition
+
+    def value_of(self, values: dict):
+        try:
+            value = float(values.get(self.field))
+        except (TypeError, ValueError):
+            return None
+        for key, (low, high) in self.bands.items():
+            if value >= low and (high is None or value < high):
+                return key
+        return None
+
+    def condition(self, value: str):
+        if value not in self.bands:
+            return None
+        return self.band_condition(*self.bands[value])
+
+    def aggregate(self, queryset) -> dict:
+        totals = queryset.aggregate(**{
+            key: Count('pk', filter=self.band_condition(low, high)) for key, (low, high) in self.bands.items()
+        })
+        return {key: total for key, total in totals.items() if total}
+
+    def labels(self, values) -> dict:
+        labels = {}
+        for value in values:
+            low, high = self.bands[value]
+            labels[value] = (f'от {_format_bound(low)}' if high is None
+                             else f'{_format_bound(low)} - {_format_bound(high)}')
+        return labels
+
+
+FACETS = (
+    RelationFacet('category', 'Категория', 'category_id', Category),
+    RelationFacet('material', 'Материал', 'material_id', Material),
+    BandFacet('price', 'Цена, руб.', 'price', settings.CATALOG_PRICE_BANDS),
+    BandFacet('height', 'Высота', 'height', settings.CATALOG_SIZE_BANDS),
+    BandFacet('length', 'Длина', 'length', settings.CATALOG_SIZE_BANDS),
+    BandFacet('width', 'Ширина', 'width', settings.CATALOG_SIZE_BANDS),
+)
+
+FACETS_BY_NAME = {facet.name: facet for facet in FACETS}
+
+
+def product_facet_values(values: dict) -> set:
+    """
+    Все пары (фильтр, значение), в которые попадает товар
+    :param values: словарь полей товара из FACET_FIELDS
+    :return: множество пар
+    """
+    pairs = set()
+    if not values:
+        return pairs
+    for facet in FACETS:
+        value = facet.value_of(values)
+        if value is not None:
+            pairs.add((facet.name, value))
+    return pairs
+
+
+def instance_facet_values(product: Product) -> dict:
+    return {field: getattr(product, field) for field in FACET_FIELDS}
+
+
+def apply_facet_delta(before: set, after: set) -> None:
+    """
+    Приращение счетчиков: значения, из которых товар ушел, уменьшаются, новые - увеличиваются
+    :param before: пары (фильтр, значение) до изменения
+    :param after: пары (фильтр, значение) после изменения
+    :return: None
+    """
+    removed = before - after
+    added = after - before
+    if not removed and not added:
+        return
+    for facet, value in removed:
+        FacetCount.objects.filter(facet=facet, value=value).update(count=F('count') - 1)
+    if added:
+        FacetCount.objects.bulk_create([FacetCount(facet=facet, value=value) for facet, value in added],
+                                       ignore_conflicts=True)
+        condition = Q()
+        for facet, value in added:
+            condition |= Q(facet=facet, value=value)
+        FacetCount.objects.filter(condition).update(count=F('count') + 1)
+    invalidate_facet_counts()
+
+
+def rebuild_facet_counts(product_model=Product, facet_count_model=FacetCount) -> None:
+    """
+    Полный пересчет счетчиков одним агрегирующим запросом на каждый фильтр.
+    Модели передаются параметрами, чтобы функцию можно было вызвать из миграции
+    :return: None
+    """
+    rows = []
+    for facet in FACETS:
+        for value, total in facet.aggregate(product_model.objects.all()).items():
+            rows.append(facet_count_model(facet=facet.name, value=value, count=total))
+    facet_count_model.objects.all().delete()
+    facet_count_model.objects.bulk_create(rows)
+    invalidate_facet_counts()
+
+
+def get_facet_counts() -> dict:
+    """
+    Счетчики всех фильтров каталога с подписями значений, кешируются до следующего изменения
+    :return: словарь {фильтр: [(значение, подпись, кол-во), ...]}
+    """
+    counts = cache.get(FACET_COUNTS_CACHE_KEY)
+    if counts is not None:
+        return counts
+    by_facet = {}
+    for facet, value, total in FacetCount.objects.filter(count__gt=0).values_list('facet', 'value', 'count'):
+        by_facet.setdefault(facet, {})[value] = total
+    counts = {}
+    for facet in FACETS:
+        values = by_facet.get(facet.name, {})
+        labels = facet.labels(values)
+        if isinstance(facet, BandFacet):
+            order = list(facet.bands)
+            keys = sorted(values, key=lambda v: order.index(v) if v in order else len(order))
+        else:
+            keys = sorted(values, key=lambda v: labels.get(v, ''))
+        counts[facet.name] = [(value, labels.get(value, value), values[value]) for value in keys
+                              if value in labels]
+    cache.set(FACET_COUNTS_CACHE_KEY, counts)
+    return counts
+
+
+def invalidate_facet_counts() -> None:
+    """
+    Сбрасывает кеш счетчиков сразу и повторно после фиксации транзакции,
+    чтобы параллельный запрос не закешировал данные до коммита
+    """
+    cache.delete(FACET_COUNTS_CACHE_KEY)
+    transaction.on_commit(lambda: cache.delete(FACET_COUNTS_CACHE_KEY))
+
+
+class FacetFilter:
+    """
+    Выбранные в каталоге фильтры. Значения одного фильтра объединяются через ИЛИ, разные фильтры - через И
+    """
+
+    def __init__(self, params):
+        self.selected = {}
+        for facet in FACETS:
+            values = [value for value in params.getlist(facet.name) if facet.condition(value) is not None]
+            if values:
+                self.selected[facet.name] = values
+
+    def __bool__(self):
+        return bool(self.selected)
+
+    def filter(self, queryset):
+        """
+        Применяет выбранные фильтры к набору товаров
+        :param queryset: набор товаров
+        :return: отфильтрованный набор
+        """
+        for name, values in self.selected.items():
+            facet = FACETS_BY_NAME[name]
+            condition = Q()
+            for value in values:
+                condition |= facet.condition(value)
+            queryset = queryset.filter(condition)
+        return queryset
+
+    def facets(self) -> list:
+        """
+        Фильтры для шаблона: подпись, значения со счетчиками и отметкой выбранных
+        :return: список словарей
+        """
+        counts = get_facet_counts()
+        result = []
+        for facet in FACETS:
+            selected = self.selected.get(facet.name, [])
+            choices = [{'value': value, 'label': label, 'count': total, 'selected': value in selected}
+                       for value, label, total in counts.get(facet.name, [])]
+            if choices:
+                result.append({'name': facet.name, 'label': facet.label, 'choices': choices})
+        return result
@@ -0,0 +1,377 @@
+import csv
+import io
+import json
+import sys
+import time
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+
+from django.db import connections, router, transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+from .caching import bump_catalog_version, bump_listing_version, bump_price_version
+from .facets import rebuild_facet_counts
+from .listing import refresh_listings
+from .models import Product, Category, Material
+from .search import get_backend
+
+# транслитерация как в поле slug админки (django/contrib/admin/static/admin/js/urlify.js)
+RUSSIAN_MAP = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'yo', 'ж': 'zh', 'з': 'z', 'и': 'i',
+    'й': 'j', 'к': 'k', 'л': 'l', 'м': 'm', 'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't',
+    'у': 'u', 'ф': 'f', 'х': 'h', 'ц': 'c', 'ч': 'ch', 'ш': 'sh', 'щ': 'sh', 'ъ': '', 'ы': 'y', 'ь': '',
+    'э': 'e', 'ю': 'yu', 'я': 'ya',
+}
+_TRANSLIT = str.maketrans(RUSSIAN_MAP)
+
+SLUG_MAX_LENGTH = Product._meta.get_field('slug').max_length
+
+# поля товара, которые обновляются у существующих по артикулу товаров
+UPDATE_FIELDS = ['name', 'price', 'quantity', 'description', 'category', 'material', 'height', 'length', 'width',
+                 'time_update']
+# поля, по которым строка файла сравнивается с товаром в базе
+COMPARE_FIELDS = ['name', 'price', 'quantity', 'description', 'category_id', 'material_id', 'height', 'length',
+                  'width']
+
+
+class ImportRowError(ValueError):
+    """
+    Строка файла не может быть импортирована
+    """
+
+
+def make_slug(text: str) -> str:
+    """
+    Slug из названия с транслитерацией кириллицы
+    :param text: название
+    :return: slug
+    """
+    return slugify(text.lower().translate(_TRANSLIT))[:SLUG_MAX_LENGTH].strip('-') or 'product'
+
+
+def iter_rows(stream, file_format: str):
+    """
+    Построчно читает файл каталога, весь файл в память не загружается
+    :param stream: текстовый поток
+    :param file_format: csv или jsonl
+    :return: генератор пар (номер строки, словарь полей)
+    """
+    if file_format == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    elif file_format == 'jsonl':
+        for line_number, line in enumerate(stream, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as exc:
+                yield line_number, exc
+                continue
+            yield line_number, row
+    else:
+        raise ValueError(f'Неизвестный формат файла: {file_format}')
+
+
+def _text(row: dict, name: str) -> str:
+    value = row.get(name)
+    return '' if value is None else str(value).strip()
+
+
+def _decimal(row: dict, name: str):
+    value = _text(row, name).replace(',', '.')
+    if not value:
+        return None
+    try:
+        number = Decimal(value)
+    except InvalidOperation:
+        number = None
+    if number is None or not number.is_finite():
+        raise ImportRowError(f'{name}: не число {value!r}')
+    return number
+
+
+def _float(row: dict, name: str):
+    value = _decimal(row, name)
+    return 0 if value is None else float(value)
+
+
+def _int(row: dict, name: str):
+    value = _decimal(row, name)
+    if value is None:
+        return None
+    if value != value.to_integral_value() or value < 0:
+        raise ImportRowError(f'{name}: ожидается целое неотрицательное число')
+    return int(value)
+
+
+def update_products(products: list) -> None:
+    """
+    Обновляет поля UPDATE_FIELDS у товаров одним подготовленным запросом UPDATE на все строки.
+    bulk_update строит выражение CASE WHEN для каждой строки и поля, на тысячах строк
+    построение запроса в ORM занимает больше времени, чем его выполнение
+    :param products: товары с заполненным pk
+    :return: None
+    """
+    db = connections[router.db_for_write(Product)]
+    fields = [Product._meta.get_field(name) for name in UPDATE_FIELDS]
+    columns = ', '.join(f'{db.ops.quote_name(field.column)} = %s' for field in fields)
+    sql = f'UPDATE {db.ops.quote_name(Product._meta.db_table)} SET {columns} WHERE id = %s'
+    params = [[field.get_db_prep_save(getattr(product, field.attname), db) for field in fields] + [product.pk]
+              for product in products]
+    with db.cursor() as cursor:
+        cursor.executemany(sql, params)
+
+
+class GroupMap:
+    """
+    Категории или материалы в памяти: поиск по slug и названию без запросов к базе данных,
+    недостающие группы создаются при первом упоминании
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.by_key = {}
+        self.created = 0
+        for pk, name, slug in model.objects.values_list('pk', 'name', 'slug'):
+            self.by_key[slug.lower()] = pk
+            self.by_key.setdefault(name.lower(), pk)
+
+    def resolve(self, value: str) -> int:
+        """
+        id группы по slug или названию
+        :param value: значение из файла
+        :return: id группы
+        """
+        key = value.lower()
+        pk = self.by_key.get(key)
+        if pk is None:
+            slug = base = make_slug(value)
+            number = 1
+            while self.model.objects.filter(slug=slug).exists():
+                number += 1
+                slug = f'{base}-{number}'
+            pk = self.model.objects.create(name=value, slug=slug).pk
+            self.created += 1
+            self.by_key[key] = self.by_key[slug] = pk
+        return pk
+
+
+@dataclass
+class ImportStats:
+    """
+    Итоги импорта
+    """
+    rows: int = 0
+    created: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    errors: list = field(default_factory=list)
+    error_count: int = 0
+    started: float = field(default_factory=time.monotonic)
+
+    # ошибок в отчете не больше, чтобы память не росла на испорченном файле
+    MAX_REPORTED_ERRORS = 100
+
+    def add_error(self, line_number, message) -> None:
+        self.error_count += 1
+        if len(self.errors) < self.MAX_REPORTED_ERRORS:
+            self.errors.append((line_number, str(message)))
+
+    @property
+    def rate(self) -> float:
+        elapsed = time.monotonic() - self.started
+        return self.rows / elapsed if elapsed else 0.0
+
+
+class CatalogImporter:
+    """
+    Потоковый импорт каталога с обновлением товаров по артикулу (vendor_code).
+    Строки обрабатываются пачками: одна пачка - одна транзакция с bulk_create/bulk_update,
+    поэтому память ограничена размером пачки, а не файла.
+    Массовые операции не вызывают сигналы модели, поэтому поисковый индекс и строки каталога обновляются
+    для каждой пачки, а счетчики фильтров и кеши каталога - один раз в конце
+    """
+
+    def __init__(self, chunk_size: int = 1000, progress=None):
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.categories = GroupMap(Category)
+        self.materials = GroupMap(Material)
+        self.category_ids = set()
+        self.material_ids = set()
+        self.stats = ImportStats()
+
+    def run(self, rows) -> ImportStats:
+        """
+        Импортирует строки
+        :param rows: итерируемые пары (номер строки, словарь полей)
+        :return: ImportStats
+        """
+        chunk = {}
+        for line_number, row in rows:
+            self.stats.rows += 1
+            try:
+                if isinstance(row, Exception):
+                    raise ImportRowError(row)
+                if not isinstance(row, dict):
+                    raise ImportRowError('строка не является объектом JSON')
+                product = self.build_product(row)
+            except ImportRowError as exc:
+                self.stats.add_error(line_number, exc)
+                continue
+            # повтор артикула внутри пачки: действует последняя строка
+            chunk[product.vendor_code] = product
+            if len(chunk) >= self.chunk_size:
+                self.save_chunk(chunk)
+                chunk = {}
+        if chunk:
+            self.save_chunk(chunk)
+        self.finish()
+        return self.stats
+
+    def build_product(self, row: dict) -> Product:
+        """
+        Товар из строки файла, без сохранения
+        :param row: словарь полей
+        :return: Product
+        """
+        vendor_code = _text(row, 'vendor_code')
+        if not vendor_code:
+            raise ImportRowError('не указан артикул')
+        if len(vendor_code) > Product._meta.get_field('vendor_code').max_length:
+            raise ImportRowError('слишком длинный артикул')
+        name = _text(row, 'name')
+        if not name:
+            raise ImportRowError('не указано название')
+        category, material = _text(row, 'category'), _text(row, 'material')
+        if not category or not material:
+            raise ImportRowError('не указана категория или материал')
+        # slug из файла приводится к виду slug админки: пробелы и кириллица в адресе товара недопустимы
+        slug = _text(row, 'slug')
+        product = Product(
+            vendor_code=vendor_code,
+            name=name[:Product._meta.get_field('name').max_length],
+            slug=make_slug(slug) if slug else '',
+            price=_decimal(row, 'price'),
+            quantity=_int(row, 'quantity'),
+            description=_text(row, 'description'),
+            height=_float(row, 'height'),
+            length=_float(row, 'length'),
+            width=_float(row, 'width'),
+        )
+        # группы ищутся и создаются только для строки без ошибок, чтобы испорченные строки не оставляли
+        # пустых категорий и материалов
+        product.category_id = self.categories.resolve(category)
+        product.material_id = self.materials.resolve(material)
+        return product
+
+    def assign_slugs(self, products: list) -> None:
+        """
+        Уникальные slug для новых товаров одной пачки (slug существующих товаров не меняется).
+        Занятый slug дополняется артикулом, который уникален, поэтому обычно на пачку нужно два запроса
+        :param products: новые товары без slug или с желаемым slug
+        :return: None
+        """
+        for product in products:
+            product.slug = product.slug or make_slug(product.name)
+        taken = set(Product.objects.filter(slug__in={p.slug for p in products}).values_list('slug', flat=True))
+        clashed = []
+        for product in products:
+            if product.slug in taken:
+                suffix = f'-{make_slug(product.vendor_code)}'
+                product.slug = product.slug[:SLUG_MAX_LENGTH - len(suffix)] + suffix
+                clashed.append(product)
+            else:
+                taken.add(product.slug)
+        while clashed:
+            taken.update(Product.objects.filter(slug__in={p.slug for p in clashed}).values_list('slug', flat=True))
+            retry = []
+            for product in clashed:
+                if product.slug in taken:
+                    # артикулы совпали после транслитерации, добавляем номер
+                    suffix = f'-{len(retry) + 2}'
+                    product.slug = product.slug[:SLUG_MAX_LENGTH - len(suffix)] + suffix
+                    retry.append(product)
+                else:
+                    taken.add(product.slug)
+            clashed = retry
+
+    @transaction.atomic
+    def save_chunk(self, chunk: dict) -> None:
+        """
+        Сохраняет пачку товаров в одной транзакции
+        :param chunk: словарь {артикул: товар}
+        :return: None
+        """
+        existing = {row['vendor_code']: row for row in Product.objects.filter(
+            vendor_code__in=list(chunk)).values('pk', 'vendor_code', *COMPARE_FIELDS)}
+        now = timezone.now()
+        to_create, to_update = [], []
+        for vendor_code, product in chunk.items():
+            current = existing.get(vendor_code)
+            if current is None:
+                to_create.append(product)
+                self.category_ids.add(product.category_id)
+                self.material_ids.add(product.material_id)
+                continue
+            if all(getattr(product, name) == current[name] for name in COMPARE_FIELDS):
+                # строка не изменилась с прошлого импорта, запись в базу не нужна
+                self.stats.unchanged += 1
+                continue
+            product.pk = current['pk']
+            product.time_update = now
+            to_update.append(product)
+            # прежние категории и материалы тоже теряют товары, их кеш страниц нужно сбросить
+            self.category_ids.update((product.category_id, current['category_id']))
+            self.material_ids.update((product.material_id, current['material_id']))
+
+        if to_update:
+            update_products(to_update)
+        if to_create:
+            self.assign_slugs(to_create)
+            to_create = Product.objects.bulk_create(to_create)
+            if any(product.pk is None for product in to_create):
+                # база данных не вернула id созданных строк
+                created = dict(Product.objects.filter(vendor_code__in=[p.vendor_code for p in to_create])
+                               .values_list('vendor_code', 'pk'))
+                for product in to_create:
+                    product.pk = created[product.vendor_code]
+
+        get_backend().index_products(to_update + to_create)
+        refresh_listings([product.pk for product in to_update + to_create])
+        self.stats.created += len(to_create)
+        self.stats.updated += len(to_update)
+        if self.progress is not None:
+            self.progress(self.stats)
+
+    def finish(self) -> None:
+        """
+        Обновляет данные, которые при поштучном сохранении поддерживаются сигналами
+        :return: None
+        """
+        if not (self.stats.created or self.stats.updated):
+            return
+        rebuild_facet_counts()
+        for category_id in self.category_ids:
+            bump_listing_version('category', category_id)
+        for material_id in self.material_ids:
+            bump_listing_version('material', material_id)
+        bump_catalog_version()
+        if self.stats.updated:
+            bump_price_version()
+
+
+def open_catalog(path: str, encoding: str = 'utf-8-sig'):
+    """
+    Открывает файл каталога для потокового чтения, '-' - стандартный ввод
+    :param path: путь к файлу
+    :param encoding: кодировка
+    :return: текстовый поток
+    """
+    if path == '-':
+        return io.TextIOWrapper(sys.stdin.buffer, encoding=encoding, newline='')
+    return open(path, encoding=encoding, newline='')
@@ -0,0 +1,118 @@
+from django.conf import settings
+from django.urls import reverse
+from django.utils import translation
+from django.utils.formats import number_format
+from django.utils.html import linebreaks
+from django.utils.text import Truncator
+
+from .models import Product, ProductImage, ProductListing
+
+# кол-во слов описания в карточке товара
+SUMMARY_WORDS = 40
+
+# поля строки каталога, которые перезаписываются при обновлении
+LISTING_UPDATE_FIELDS = ['name', 'url', 'price', 'price_display', 'image', 'excerpt_html', 'category',
+                         'category_name', 'material', 'material_name', 'height', 'length', 'width', 'time_create']
+
+
+def card_excerpt(description: str) -> str:
+    """
+    Готовый HTML краткого описания для карточки: первые SUMMARY_WORDS слов, разбитые на абзацы.
+    Описание заполняется в админке и выводится без экранирования, как и на странице товара
+    :param description: описание товара
+    :return: HTML
+    """
+    if not description:
+        return ''
+    return linebreaks(Truncator(description).words(SUMMARY_WORDS, html=True), autoescape=False)
+
+
+def card_price(price) -> str:
+    """
+    Цена для карточки в формате языка сайта, например "1 550,00 руб."
+    :param price: цена товара
+    :return: строка цены или пустая строка, если цена не указана
+    """
+    if price is None:
+        return ''
+    # формат не зависит от языка запроса или команды, в которых сохраняется товар
+    with translation.override(settings.LANGUAGE_CODE):
+        return f'{number_format(price, 2, force_grouping=True)} руб.'
+
+
+def _build_rows(products: list, listing_model, image_model) -> list:
+    """
+    Строки каталога для пачки товаров. Основное изображение - изображение товара,
+    если его нет - первое изображение галереи
+    :param products: товары с загруженными category и material
+    :return: список несохраненных строк
+    """
+    without_image = [product.pk for product in products if not product.image]
+    gallery = {}
+    if without_image:
+        for product_id, image in image_model.objects.filter(product_id__in=without_image).exclude(
+                image='').exclude(image__isnull=True).order_by('pk').values_list('product_id', 'image'):
+            gallery.setdefault(product_id, image)
+    return [
+        listing_model(
+            product_id=product.pk,
+            name=product.name,
+            url=reverse('product_detail', kwargs={'product_slug': product.slug}),
+            price=product.price,
+            price_display=card_price(product.price),
+            image=product.image.name if product.image else gallery.get(product.pk, ''),
+            excerpt_html=card_excerpt(product.description),
+            category_id=product.category_id,
+            category_name=product.category.name,
+            material_id=product.material_id,
+            material_name=product.material.name,
+            height=product.height,
+            length=product.length,
+            width=product.width,
+            time_create=product.time_create,
+        )
+        for product in products
+    ]
+
+
+def refresh_listings(product_ids=None, product_model=Product, listing_model=ProductListing,
+                     image_model=ProductImage, chunk_size: int = 1000) -> int:
+    """
+    Пересчитывает строки каталога товаров одним запросом на пачку с вставкой или обновлением (upsert).
+    Модели передаются параметрами, чтобы функцию можно было вызвать из миграции
+    :param product_ids: id товаров, None - весь каталог
+    :param chunk_size: кол-во товаров в пачке
+    :return: кол-во пересчитанных строк
+    """
+    queryset = product_model.objects.select_related('category', 'material').order_by('pk')
+    if product_ids is not None:
+        queryset = queryset.filter(pk__in=list(product_ids))
+    total = 0
+    chunk = []
+    for product in queryset.iterator(chunk_size=chunk_size):
+        chunk.append(product)
+        if len(chunk) >= chunk_size:
+            total += _save_rows(chunk, listing_model, image_model)
+            chunk = []
+    if chunk:
+        total += _save_rows(chunk, listing_model, image_model)
+    return total
+
+
+def _save_rows(products: list, listing_model, image_model) -> int:
+    rows = _build_rows(products, listing_model, image_model)
+    listing_model.objects.bulk_create(rows, update_conflicts=True, unique_fields=['product'],
+                                      update_fields=LISTING_UPDATE_FIELDS)
+    return len(rows)
+
+
+def rename_group(field: str, group_id, name: str) -> None:
+    """
+    Обновляет название категории или материала во всех строках каталога одним запросом
+    :param field: category или material
+    :param group_id: id группы
+    :param name: новое название
+    :return: None
+    """
+    ProductListing.objects.filter(**{f'{field}_id': group_id}).exclude(**{f'{field}_name': name}).update(
+        **{f'{field}_name': name})
@@ -0,0 +1,33 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from shop.exporter import EXPORT_FORMATS, export_rows, render_export
+
+
+class Command(BaseCommand):
+    help = 'Выгружает каталог товаров в CSV или JSONL, строки пишутся по мере чтения из базы данных'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=sorted(EXPORT_FORMATS), default='csv')
+        parser.add_argument('--output', default='-', help='Путь к файлу, по умолчанию стандартный вывод')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Кол-во товаров, читаемых за раз')
+        parser.add_argument('--base-url', default='', help='Адрес сайта для ссылок на изображения')
+
+    def handle(self, *args, **options):
+        base_url = options['base_url'].rstrip('/')
+        rows = export_rows(chunk_size=options['chunk_size'], absolute_url=lambda url: base_url + url)
+        if options['output'] == '-':
+            self.write_lines(sys.stdout, render_export(options['format'], rows))
+            return
+        with open(options['output'], 'w', encoding='utf-8', newline='') as stream:
+            count = self.write_lines(stream, render_export(options['format'], rows))
+        self.stdout.write(self.style.SUCCESS(f'Выгружено строк: {count}'))
+
+    @staticmethod
+    def write_lines(stream, lines) -> int:
+        count = 0
+        for line in lines:
+            stream.write(line)
+            count += 1
+        return count
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from shop.models import Product, ProductImage
+from shop.thumbnails import generate_thumbnails
+
+
+class Command(BaseCommand):
+    help = 'Строит уменьшенные копии изображений товаров и галерей, которых еще нет'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Перестроить существующие копии')
+
+    def handle(self, *args, **options):
+        names = set(Product.objects.exclude(image='').exclude(image__isnull=True)
+                    .values_list('image', flat=True))
+        names.update(ProductImage.objects.exclude(image='').exclude(image__isnull=True)
+                     .values_list('image', flat=True))
+        built = failed = 0
+        for name in sorted(names):
+            try:
+                built += generate_thumbnails(name, force=options['force'])
+            except OSError as error:
+                failed += 1
+                self.stderr.write(f'{name}: {error}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Изображений: {len(names)}, построено копий: {built}, ошибок: {failed}'))
@@ -0,0 +1,48 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.importer import CatalogImporter, iter_rows, open_catalog
+
+
+class Command(BaseCommand):
+    help = ('Импортирует товары из CSV или JSONL, существующие товары обновляются по артикулу. '
+            'Поля: vendor_code, name, slug, price, quantity, description, category, material, height, length, width. '
+            'Категория и материал указываются slug или названием, недостающие создаются')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к файлу, "-" - стандартный ввод')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Формат файла, по умолчанию по расширению')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Кол-во товаров в одной транзакции')
+        parser.add_argument('--encoding', default='utf-8-sig')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format']
+        if file_format is None:
+            extension = os.path.splitext(path)[1].lower().lstrip('.')
+            file_format = 'jsonl' if extension in ('jsonl', 'ndjson') else 'csv' if extension == 'csv' else None
+        if file_format is None:
+            raise CommandError('Не удалось определить формат файла, укажите --format')
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size должен быть больше нуля')
+
+        importer = CatalogImporter(chunk_size=options['chunk_size'], progress=self.report_progress)
+        try:
+            with open_catalog(path, options['encoding']) as stream:
+                stats = importer.run(iter_rows(stream, file_format))
+        except (OSError, UnicodeDecodeError) as exc:
+            raise CommandError(f'Ошибка чтения файла: {exc}')
+
+        for line_number, message in stats.errors:
+            self.stderr.write(f'строка {line_number}: {message}')
+        if stats.error_count > len(stats.errors):
+            self.stderr.write(f'... и еще ошибок: {stats.error_count - len(stats.errors)}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Строк: {stats.rows}, создано: {stats.created}, обновлено: {stats.updated}, '
+            f'без изменений: {stats.unchanged}, ошибок: {stats.error_count}, новых категорий: {importer.categories.created}, '
+            f'новых материалов: {importer.materials.created}'))
+
+    def report_progress(self, stats) -> None:
+        self.stdout.write(f'Обработано строк: {stats.rows}, создано: {stats.created}, обновлено: {stats.updated}, '
+                          f'ошибок: {stats.error_count}, {stats.rate:.0f} строк/с')
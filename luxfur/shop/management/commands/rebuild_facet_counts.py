@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from shop.facets import rebuild_facet_counts
+from shop.models import FacetCount
+
+
+class Command(BaseCommand):
+    help = 'Полностью пересчитывает счетчики фильтров каталога'
+
+    def handle(self, *args, **options):
+        rebuild_facet_counts()
+        self.stdout.write(self.style.SUCCESS(f'Пересчитано значений фильтров: {FacetCount.objects.count()}'))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from shop.caching import bump_catalog_version, bump_listing_version
+from shop.listing import refresh_listings
+from shop.models import ProductListing, Category, Material
+
+
+class Command(BaseCommand):
+    help = ('Полностью пересчитывает строки каталога ProductListing, '
+            'в том числе готовые поля карточки: адрес, HTML описания и цену')
+
+    def handle(self, *args, **options):
+        # строки удаленных товаров удаляются каскадно, поэтому достаточно пересчитать существующие
+        total = refresh_listings()
+        # закешированные страницы категорий, материалов и каталога построены по прежним строкам
+        for category_id in Category.objects.values_list('pk', flat=True):
+            bump_listing_version('category', category_id)
+        for material_id in Material.objects.values_list('pk', flat=True):
+            bump_listing_version('material', material_id)
+        bump_catalog_version()
+        self.stdout.write(self.style.SUCCESS(f'Пересчитано строк каталога: {total} из {ProductListing.objects.count()}'))
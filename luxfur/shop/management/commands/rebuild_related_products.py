@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.related import rebuild_related_products
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает похожие товары по категории, материалу, цене и размерам. '
+            'По умолчанию только для товаров, затронутых изменениями с прошлого расчета')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Пересчитать весь каталог')
+        parser.add_argument('--top', type=int, help='Кол-во похожих товаров, по умолчанию RELATED_PRODUCTS_COUNT')
+
+    def handle(self, *args, **options):
+        if options['top'] is not None and options['top'] < 1:
+            raise CommandError('--top должен быть больше нуля')
+        total = rebuild_related_products(full=options['full'], count=options['top'])
+        self.stdout.write(self.style.SUCCESS(f'Пересчитаны похожие товары для товаров: {total}'))
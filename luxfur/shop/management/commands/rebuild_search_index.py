@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from shop.caching import bump_catalog_version
+from shop.models import Product
+from shop.search import get_backend
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает поисковый индекс товаров'
+
+    def handle(self, *args, **options):
+        get_backend().rebuild()
+        # индекс перестраивают после изменений в обход сигналов, поэтому закешированные результаты поиска
+        # и индексы подсказок процессов веб-сервера тоже должны перестроиться
+        bump_catalog_version()
+        self.stdout.write(self.style.SUCCESS(f'Проиндексировано товаров: {Product.objects.count()}'))
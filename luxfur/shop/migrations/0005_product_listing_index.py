@@ -0,0 +1,21 @@
+# Generated by Django 5.0.1 on 2026-10-18 12:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0004_product_price_index'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='product',
+            options={'ordering': ['-time_create', '-id'], 'verbose_name': 'Товар', 'verbose_name_plural': 'Товары'},
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['-time_create', '-id'], name='shop_product_listing_idx'),
+        ),
+    ]
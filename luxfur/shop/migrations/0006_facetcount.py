@@ -0,0 +1,63 @@
+# Generated by Django 5.0.1 on 2026-10-18 12:33
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+# фильтры на момент миграции: внешние ключи и диапазоны (от, до) числовых полей, None - без верхней границы.
+# Функции shop.facets не используются, чтобы их последующие изменения не ломали миграцию
+RELATION_FACETS = (('category', 'category_id'), ('material', 'material_id'))
+PRICE_BANDS = [(0, 100), (100, 500), (500, 1000), (1000, 5000), (5000, None)]
+SIZE_BANDS = [(0, 5), (5, 20), (20, 50), (50, None)]
+BAND_FACETS = (('price', PRICE_BANDS), ('height', SIZE_BANDS), ('length', SIZE_BANDS), ('width', SIZE_BANDS))
+
+
+def band_key(low, high) -> str:
+    return f'{low:g}-{"" if high is None else format(high, "g")}'
+
+
+def fill_facet_counts(apps, schema_editor):
+    Product = apps.get_model('shop', 'Product')
+    FacetCount = apps.get_model('shop', 'FacetCount')
+    rows = []
+    for name, field in RELATION_FACETS:
+        totals = Product.objects.exclude(**{f'{field}__isnull': True}).values(field).annotate(
+            total=Count('pk')).order_by()
+        rows.extend(FacetCount(facet=name, value=str(row[field]), count=row['total']) for row in totals)
+    for name, bands in BAND_FACETS:
+        conditions = {}
+        for low, high in bands:
+            condition = Q(**{f'{name}__gte': low})
+            if high is not None:
+                condition &= Q(**{f'{name}__lt': high})
+            conditions[band_key(low, high)] = Count('pk', filter=condition)
+        totals = Product.objects.aggregate(**conditions)
+        rows.extend(FacetCount(facet=name, value=key, count=total) for key, total in totals.items() if total)
+    FacetCount.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0005_product_listing_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FacetCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('facet', models.CharField(max_length=50, verbose_name='Фильтр')),
+                ('value', models.CharField(max_length=50, verbose_name='Значение')),
+                ('count', models.IntegerField(default=0, verbose_name='Кол-во товаров')),
+            ],
+            options={
+                'verbose_name': 'Счетчик фильтра',
+                'verbose_name_plural': 'Счетчики фильтров',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='facetcount',
+            constraint=models.UniqueConstraint(fields=('facet', 'value'), name='shop_facetcount_facet_value_uniq'),
+        ),
+        migrations.RunPython(fill_facet_counts, migrations.RunPython.noop),
+    ]
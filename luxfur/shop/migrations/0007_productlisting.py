@@ -0,0 +1,81 @@
+# Generated by Django 5.0.1 on 2026-10-18 13:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils.text import Truncator
+
+# кол-во слов описания в строке каталога на момент миграции
+SUMMARY_WORDS = 40
+
+
+def fill_product_listings(apps, schema_editor):
+    """
+    Заполняет строки каталога по полям модели на момент миграции. Функции shop.listing не используются,
+    так как они строят строки по текущей модели ProductListing, а не по этой версии
+    """
+    Product = apps.get_model('shop', 'Product')
+    ProductListing = apps.get_model('shop', 'ProductListing')
+    ProductImage = apps.get_model('shop', 'ProductImage')
+    gallery = {}
+    for product_id, image in ProductImage.objects.exclude(image='').exclude(image__isnull=True).order_by(
+            'pk').values_list('product_id', 'image'):
+        gallery.setdefault(product_id, image)
+    rows = []
+    for product in Product.objects.select_related('category', 'material').order_by('pk').iterator(chunk_size=1000):
+        rows.append(ProductListing(
+            product_id=product.pk,
+            name=product.name,
+            # адрес страницы товара из shop/urls.py на момент миграции
+            url=f'/product/{product.slug}/',
+            price=product.price,
+            image=product.image.name if product.image else gallery.get(product.pk, ''),
+            summary=Truncator(product.description).words(SUMMARY_WORDS),
+            category_id=product.category_id,
+            category_name=product.category.name,
+            material_id=product.material_id,
+            material_name=product.material.name,
+            height=product.height,
+            length=product.length,
+            width=product.width,
+            time_create=product.time_create,
+        ))
+        if len(rows) >= 1000:
+            ProductListing.objects.bulk_create(rows)
+            rows = []
+    ProductListing.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0006_facetcount'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductListing',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='listing', serialize=False, to='shop.product', verbose_name='Товар')),
+                ('name', models.CharField(max_length=255, verbose_name='Название товара')),
+                ('url', models.CharField(max_length=300, verbose_name='Адрес страницы товара')),
+                ('price', models.DecimalField(db_index=True, decimal_places=2, max_digits=10, null=True, verbose_name='Цена')),
+                ('image', models.ImageField(blank=True, default='', upload_to='', verbose_name='Основное изображение')),
+                ('summary', models.TextField(blank=True, verbose_name='Краткое описание')),
+                ('category_name', models.CharField(max_length=255, verbose_name='Название категории')),
+                ('material_name', models.CharField(max_length=255, verbose_name='Название материала')),
+                ('height', models.FloatField(null=True, verbose_name='Высота')),
+                ('length', models.FloatField(null=True, verbose_name='Длина')),
+                ('width', models.FloatField(null=True, verbose_name='Ширина')),
+                ('time_create', models.DateTimeField(verbose_name='Время создания товара')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='shop.category', verbose_name='Категория')),
+                ('material', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='shop.material', verbose_name='Материал')),
+            ],
+            options={
+                'verbose_name': 'Строка каталога',
+                'verbose_name_plural': 'Строки каталога',
+                'ordering': ['-time_create', '-product_id'],
+                'indexes': [models.Index(fields=['-time_create', '-product'], name='shop_listing_order_idx'), models.Index(fields=['category', '-time_create', '-product'], name='shop_listing_category_idx'), models.Index(fields=['material', '-time_create', '-product'], name='shop_listing_material_idx')],
+            },
+        ),
+        migrations.RunPython(fill_product_listings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.0.1 on 2026-10-18 13:20
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import translation
+from django.utils.formats import number_format
+from django.utils.html import linebreaks
+from django.utils.text import Truncator
+
+# кол-во слов описания в карточке товара на момент миграции
+SUMMARY_WORDS = 40
+
+
+def fill_card_fields(apps, schema_editor):
+    """
+    Заполняет новые поля карточки в существующих строках каталога так же, как shop.listing на момент миграции
+    """
+    Product = apps.get_model('shop', 'Product')
+    ProductListing = apps.get_model('shop', 'ProductListing')
+    rows = []
+    with translation.override(settings.LANGUAGE_CODE):
+        for pk, description, price in Product.objects.filter(listing__isnull=False).order_by('pk').values_list(
+                'pk', 'description', 'price').iterator(chunk_size=1000):
+            rows.append(ProductListing(
+                product_id=pk,
+                excerpt_html=(linebreaks(Truncator(description).words(SUMMARY_WORDS, html=True), autoescape=False)
+                              if description else ''),
+                price_display='' if price is None else f'{number_format(price, 2, force_grouping=True)} руб.',
+            ))
+            if len(rows) >= 1000:
+                ProductListing.objects.bulk_update(rows, ['excerpt_html', 'price_display'])
+                rows = []
+    ProductListing.objects.bulk_update(rows, ['excerpt_html', 'price_display'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0007_productlisting'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='productlisting',
+            name='summary',
+        ),
+        migrations.AddField(
+            model_name='productlisting',
+            name='excerpt_html',
+            field=models.TextField(blank=True, verbose_name='Краткое описание (HTML)'),
+        ),
+        migrations.AddField(
+            model_name='productlisting',
+            name='price_display',
+            field=models.CharField(blank=True, max_length=50, verbose_name='Цена для карточки'),
+        ),
+        migrations.RunPython(fill_card_fields, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-18 14:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0009_relatedproduct'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='time_recommendations',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Время расчета рекомендаций'),
+        ),
+    ]
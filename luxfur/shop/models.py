@@ -20,9 +20,12 @@ class Product(models.Model):
     description = models.TextField(blank=True, verbose_name="Описание товара")
     vendor_code = models.CharField(max_length=50, null=True, blank=True, default=None, unique=True,
                                    verbose_name="Артикул")
-    price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Цена", null=True)
+    price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Цена", null=True, db_index=True)
     time_create = models.DateTimeField(auto_now_add=True, verbose_name="Время создания")
     time_update = models.DateTimeField(auto_now=True, verbose_name="Время изменения")
+    # время расчета похожих товаров и товаров, которые покупают вместе, для ETag страницы товара
+    time_recommendations = models.DateTimeField(null=True, blank=True, editable=False,
+                                                verbose_name="Время расчета рекомендаций")
     category = models.ForeignKey('Category', on_delete=models.PROTECT, related_name='products',
                                  verbose_name="Категория")
     height = models.FloatField(blank=True, null=True, verbose_name="Высота", default=0)
@@ -39,8 +42,12 @@ class Product(models.Model):
     class Meta:
         verbose_name = "Товар"
         verbose_name_plural = "Товары"
-        ordering = ['-time_create']
+        ordering = ['-time_create', '-id']
         index_together = (('id', 'slug'),)
+        indexes = [
+            # индекс под постраничный вывод каталога по курсору
+            models.Index(fields=['-time_create', '-id'], name='shop_product_listing_idx'),
+        ]
 
     def get_absolute_url(self):
         return reverse('product_detail', kwargs={"product_slug": self.slug})
@@ -93,3 +100,89 @@ class Material(models.Model):
 
     def get_absolute_url(self):
         return reverse('material', kwargs={"material_slug": self.slug})
+
+
+class FacetCount(models.Model):
+    """
+    Предрассчитанное кол-во товаров для значения фильтра каталога.
+    Обновляется приращениями при сохранении и удалении товаров, полностью пересчитывается командой
+    rebuild_facet_counts
+    """
+    facet = models.CharField(max_length=50, verbose_name="Фильтр")
+    value = models.CharField(max_length=50, verbose_name="Значение")
+    count = models.IntegerField(default=0, verbose_name="Кол-во товаров")
+
+    def __str__(self):
+        return f'{self.facet}={self.value}: {self.count}'
+
+    class Meta:
+        verbose_name = "Счетчик фильтра"
+        verbose_name_plural = "Счетчики фильтров"
+        constraints = [
+            models.UniqueConstraint(fields=['facet', 'value'], name='shop_facetcount_facet_value_uniq'),
+        ]
+
+
+class ProductListing(models.Model):
+    """
+    Плоская строка товара для списков каталога и выдачи поиска: все, что нужно карточке товара,
+    без обращения к связанным таблицам. Поддерживается сигналами Product, Category, Material и ProductImage,
+    полностью перестраивается командой rebuild_product_listings
+    """
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='listing',
+                                   verbose_name="Товар")
+    name = models.CharField(max_length=255, verbose_name="Название товара")
+    url = models.CharField(max_length=300, verbose_name="Адрес страницы товара")
+    price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Цена", null=True, db_index=True)
+    image = models.ImageField(blank=True, default='', verbose_name="Основное изображение")
+    excerpt_html = models.TextField(blank=True, verbose_name="Краткое описание (HTML)")
+    price_display = models.CharField(max_length=50, blank=True, verbose_name="Цена для карточки")
+    category = models.ForeignKey('Category', on_delete=models.CASCADE, related_name='+', verbose_name="Категория")
+    category_name = models.CharField(max_length=255, verbose_name="Название категории")
+    material = models.ForeignKey('Material', on_delete=models.CASCADE, related_name='+', verbose_name="Материал")
+    material_name = models.CharField(max_length=255, verbose_name="Название материала")
+    height = models.FloatField(null=True, verbose_name="Высота")
+    length = models.FloatField(null=True, verbose_name="Длина")
+    width = models.FloatField(null=True, verbose_name="Ширина")
+    time_create = models.DateTimeField(verbose_name="Время создания товара")
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        verbose_name = "Строка каталога"
+        verbose_name_plural = "Строки каталога"
+        ordering = ['-time_create', '-product_id']
+        indexes = [
+            # порядок каталога на главной и в списках категорий и материалов
+            models.Index(fields=['-time_create', '-product'], name='shop_listing_order_idx'),
+            models.Index(fields=['category', '-time_create', '-product'], name='shop_listing_category_idx'),
+            models.Index(fields=['material', '-time_create', '-product'], name='shop_listing_material_idx'),
+        ]
+
+    def get_absolute_url(self):
+        return self.url
+
+
+class RelatedProduct(models.Model):
+    """
+    Похожий товар: заранее рассчитанные ближайшие соседи товара по категории, материалу, цене и размерам.
+    Заполняется командой rebuild_related_products
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='related_products',
+                                verbose_name="Товар")
+    related = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+', verbose_name="Похожий товар")
+    rank = models.PositiveSmallIntegerField(verbose_name="Место в списке")
+    score = models.FloatField(verbose_name="Сходство")
+    computed_at = models.DateTimeField(verbose_name="Время расчета")
+
+    def __str__(self):
+        return f'{self.product_id} -> {self.related_id}'
+
+    class Meta:
+        verbose_name = "Похожий товар"
+        verbose_name_plural = "Похожие товары"
+        ordering = ['product', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'rank'], name='shop_relatedproduct_product_rank_uniq'),
+        ]
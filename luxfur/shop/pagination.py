@@ -0,0 +1,114 @@
+import base64
+import binascii
+from datetime import datetime
+
+from django.db.models import Q
+
+
+def encode_cursor(time_create: datetime, pk: int) -> str:
+    """
+    Кодирует позицию в списке товаров для передачи в url
+    :param time_create: время создания товара
+    :param pk: id товара
+    :return: строка курсора
+    """
+    raw = f'{time_create.isoformat()}|{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str):
+    """
+    Раскодирует курсор, полученный из url
+    :param cursor: строка курсора
+    :return: кортеж (time_create, pk) или None, если курсор испорчен
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        time_create, pk = raw.rsplit('|', 1)
+        return datetime.fromisoformat(time_create), int(pk)
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        return None
+
+
+class KeysetPage:
+    """
+    Страница списка товаров, полученная по курсору.
+    У пустой страницы (курсор за концом списка или товары с тех пор удалены) соседних страниц нет:
+    курсор для них брать не из чего
+    """
+
+    def __init__(self, object_list, has_next: bool, has_previous: bool):
+        self.object_list = object_list
+        self._has_next = has_next and bool(object_list)
+        self._has_previous = has_previous and bool(object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self) -> bool:
+        return self._has_next
+
+    def has_previous(self) -> bool:
+        return self._has_previous
+
+    def has_other_pages(self) -> bool:
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        if not self._has_next:
+            return None
+        last = self.object_list[-1]
+        return encode_cursor(last.time_create, last.pk)
+
+    @property
+    def previous_cursor(self):
+        if not self._has_previous:
+            return None
+        first = self.object_list[0]
+        return encode_cursor(first.time_create, first.pk)
+
+
+class KeysetPaginator:
+    """
+    Постраничный вывод по курсору для списка, упорядоченного по (-time_create, -id).
+    Вместо OFFSET используется условие по последней показанной позиции, поэтому
+    любая страница выбирается по индексу так же быстро, как первая
+    """
+
+    def __init__(self, queryset, per_page: int):
+        self.queryset = queryset
+        self.per_page = per_page
+
+    def page(self, after: str = None, before: str = None) -> KeysetPage:
+        """
+        Возвращает страницу после курсора after или перед курсором before.
+        Без курсора (или с испорченным курсором) возвращается первая страница
+        :param after: курсор последнего товара предыдущей страницы
+        :param before: курсор первого товара следующей страницы
+        :return: KeysetPage
+        """
+        position = decode_cursor(after) if after else None
+        if position is not None:
+            time_create, pk = position
+            queryset = self.queryset.filter(Q(time_create__lt=time_create) |
+                                            Q(time_create=time_create, pk__lt=pk))
+            object_list = list(queryset.order_by('-time_create', '-pk')[:self.per_page + 1])
+            return KeysetPage(object_list[:self.per_page], len(object_list) > self.per_page, True)
+
+        position = decode_cursor(before) if before else None
+        if position is not None:
+            time_create, pk = position
+            queryset = self.queryset.filter(Q(time_create__gt=time_create) |
+                                            Q(time_create=time_create, pk__gt=pk))
+            object_list = list(queryset.order_by('time_create', 'pk')[:self.per_page + 1])
+            has_previous = len(object_list) > self.per_page
+            object_list = object_list[:self.per_page]
+            object_list.reverse()
+            return KeysetPage(object_list, True, has_previous)
+
+        object_list = list(self.queryset.order_by('-time_create', '-pk')[:self.per_page + 1])
+        return KeysetPage(object_list[:self.per_page], len(object_list) > self.per_page, False)
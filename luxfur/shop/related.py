@@ -0,0 +1,271 @@
+import numpy as np
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import Count, Max, Min
+from django.utils import timezone
+
+from .models import Product, RelatedProduct
+
+# веса признаков в расстоянии между товарами: совпадение категории важнее совпадения материала.
+# Цена и размеры сравниваются в логарифмической шкале, то есть по отношению значений:
+# разница в цене в два раза добавляет к расстоянию около 0.48 * вес
+CATEGORY_WEIGHT = 4.0
+MATERIAL_WEIGHT = 1.0
+NUMERIC_WEIGHTS = {'price': 2.0, 'height': 0.5, 'length': 0.5, 'width': 0.5}
+
+# ограничение размера матрицы расстояний, которая считается за один шаг
+BLOCK_ELEMENTS = 8_000_000
+
+
+class FeatureMatrix:
+    """
+    Признаки всех товаров каталога в массивах NumPy: номера категории и материала
+    и логарифмы цены и размеров. Расстояние между товарами:
+    CATEGORY_WEIGHT * (категории разные) + MATERIAL_WEIGHT * (материалы разные) +
+    сумма квадратов разностей числовых признаков с весами NUMERIC_WEIGHTS
+    """
+
+    def __init__(self, rows: list):
+        """
+        :param rows: кортежи (id, category_id, material_id, price, height, length, width)
+        """
+        self.ids = np.array([row[0] for row in rows], dtype=np.int64)
+        self.categories = np.array([row[1] for row in rows], dtype=np.int64)
+        self.materials = np.array([row[2] if row[2] is not None else -1 for row in rows], dtype=np.int64)
+        # веса числовых признаков учитываются масштабом столбца, так как расстояние - сумма квадратов
+        self.numeric = np.zeros((len(rows), len(NUMERIC_WEIGHTS)), dtype=np.float32)
+        for column, weight in enumerate(NUMERIC_WEIGHTS.values()):
+            self.numeric[:, column] = self._logarithm([row[3 + column] for row in rows]) * np.sqrt(weight)
+        self.positions = {product_id: position for position, product_id in enumerate(self.ids.tolist())}
+
+    @classmethod
+    def load(cls) -> 'FeatureMatrix':
+        """
+        Признаки всех товаров одним запросом без создания объектов модели
+        :return: FeatureMatrix
+        """
+        return cls(list(Product.objects.order_by('pk').values_list(
+            'pk', 'category_id', 'material_id', 'price', 'height', 'length', 'width')))
+
+    @staticmethod
+    def _logarithm(values: list) -> np.ndarray:
+        """
+        log1p значений признака. Шкала не зависит от остальных товаров, поэтому сохраненные
+        расстояния остаются верными при изменении каталога. Пропущенные значения заменяются медианой
+        :param values: значения признака, None - не указано
+        :return: массив float32
+        """
+        column = np.array([np.nan if value is None else max(float(value), 0) for value in values], dtype=np.float64)
+        column = np.log1p(column)
+        known = ~np.isnan(column)
+        column[~known] = np.median(column[known]) if known.any() else 0
+        return column.astype(np.float32)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def distances(self, positions: np.ndarray, candidates: np.ndarray = None) -> np.ndarray:
+        """
+        Квадраты расстояний от товаров positions до товаров candidates
+        :param positions: номера строк матрицы
+        :param candidates: номера строк матрицы, None - весь каталог
+        :return: массив len(positions) x len(candidates)
+        """
+        if candidates is None:
+            candidates = np.arange(len(self))
+        distances = np.zeros((len(positions), len(candidates)), dtype=np.float32)
+        for column in range(self.numeric.shape[1]):
+            values = self.numeric[:, column]
+            distances += np.square(values[positions, None] - values[None, candidates])
+        distances += CATEGORY_WEIGHT * (self.categories[positions, None] != self.categories[None, candidates])
+        distances += MATERIAL_WEIGHT * (self.materials[positions, None] != self.materials[None, candidates])
+        return distances
+
+    def blocks(self, positions: np.ndarray, candidates: np.ndarray = None):
+        """
+        Матрица расстояний по частям, чтобы в памяти не было больше BLOCK_ELEMENTS значений
+        :param positions: номера строк матрицы
+        :param candidates: номера строк матрицы, None - весь каталог
+        :return: генератор пар (номера строк блока, расстояния)
+        """
+        size = max(1, BLOCK_ELEMENTS // max(len(self) if candidates is None else len(candidates), 1))
+        for start in range(0, len(positions), size):
+            block = positions[start:start + size]
+            yield block, self.distances(block, candidates)
+
+    def stages(self):
+        """
+        Этапы поиска соседей: сначала среди товаров той же категории и материала, затем той же категории,
+        затем во всем каталоге. Товар другой группы не ближе веса признака, которым группы различаются,
+        поэтому если найденные в группе соседи ближе этой границы, результат точный
+        :return: список пар (ключи групп товаров или None для всего каталога, граница расстояния)
+        """
+        return [
+            (self.categories * (self.materials.max(initial=0) + 2) + self.materials + 1,
+             min(CATEGORY_WEIGHT, MATERIAL_WEIGHT)),
+            (self.categories, CATEGORY_WEIGHT),
+            (None, np.inf),
+        ]
+
+    def nearest(self, positions: np.ndarray, count: int):
+        """
+        Ближайшие соседи товаров. Расстояния считаются сначала внутри групп (см. stages),
+        что при нескольких категориях во много раз меньше полного перебора каталога
+        :param positions: номера строк матрицы
+        :param count: кол-во соседей
+        :return: генератор пар (id товара, список пар (id соседа, квадрат расстояния) по возрастанию расстояния)
+        """
+        count = min(count, len(self) - 1)
+        if count < 1:
+            return
+        for keys, bound in self.stages():
+            if keys is None:
+                groups = [(positions, None)]
+            else:
+                groups = [(positions[keys[positions] == key], np.flatnonzero(keys == key))
+                          for key in np.unique(keys[positions])]
+            rest = []
+            for group, candidates in groups:
+                if candidates is not None and len(candidates) <= count:
+                    rest.append(group)
+                    continue
+                for block, distances in self.blocks(group, candidates):
+                    for row, (product_id, neighbours) in enumerate(self._select(block, candidates, distances, count)):
+                        if neighbours[-1][1] < bound:
+                            yield product_id, neighbours
+                        else:
+                            rest.append(block[row:row + 1])
+            if not rest:
+                return
+            positions = np.concatenate(rest)
+
+    def _select(self, block: np.ndarray, candidates, distances: np.ndarray, count: int):
+        """
+        count ближайших из посчитанных расстояний
+        :return: генератор пар (id товара, список пар (id соседа, квадрат расстояния))
+        """
+        ids = self.ids if candidates is None else self.ids[candidates]
+        # сам товар не может быть похож на себя
+        distances[ids[None, :] == self.ids[block, None]] = np.inf
+        selected = np.argpartition(distances, count - 1, axis=1)[:, :count]
+        for row, position in enumerate(block):
+            columns = selected[row]
+            # при равных расстояниях раньше идет товар с меньшим id
+            order = np.lexsort((ids[columns], distances[row, columns]))
+            yield int(self.ids[position]), [(int(ids[columns[i]]), float(distances[row, columns[i]])) for i in order]
+
+
+def similarity(distance: float) -> float:
+    """
+    Сходство товаров по квадрату расстояния: 1 - одинаковые товары, чем дальше, тем ближе к 0
+    """
+    return 1 / (1 + distance)
+
+
+def products_to_refresh(matrix: FeatureMatrix, count: int) -> set:
+    """
+    Товары, у которых мог измениться список похожих с прошлого расчета:
+    измененные и новые товары, товары без полного списка (например, после удаления соседа),
+    товары, среди соседей которых есть измененные, и товары, к которым измененный товар стал ближе
+    самого дальнего из сохраненных соседей
+    :param matrix: признаки каталога
+    :param count: кол-во похожих товаров
+    :return: множество id товаров
+    """
+    last_computed = RelatedProduct.objects.aggregate(last=Max('computed_at'))['last']
+    if last_computed is None:
+        return set(matrix.ids.tolist())
+    changed = set(Product.objects.filter(time_update__gt=last_computed).values_list('pk', flat=True))
+    if len(changed) * 2 > len(matrix):
+        # после массового изменения (например, импорта) полный расчет по группам быстрее проверки соседей
+        return set(matrix.ids.tolist())
+    expected = min(count, len(matrix) - 1)
+    complete = dict(RelatedProduct.objects.values('product_id').annotate(total=Count('pk'), worst=Min('score'))
+                    .filter(total__gte=expected).values_list('product_id', 'worst'))
+    refresh = changed | (set(matrix.ids.tolist()) - set(complete))
+    refresh.update(RelatedProduct.objects.filter(related_id__in=changed).values_list('product_id', flat=True))
+
+    positions = np.array([matrix.positions[pk] for pk in changed if pk in matrix.positions], dtype=np.int64)
+    if len(positions):
+        # самое дальнее расстояние среди сохраненных соседей каждого товара
+        worst = np.full(len(matrix), np.inf, dtype=np.float32)
+        for product_id, score in complete.items():
+            if product_id in matrix.positions:
+                worst[matrix.positions[product_id]] = 1 / score - 1 if score > 0 else np.inf
+        for _, distances in matrix.blocks(positions):
+            closer = (distances < worst[None, :]).any(axis=0)
+            refresh.update(matrix.ids[closer].tolist())
+    return refresh
+
+
+def rebuild_related_products(full: bool = False, count: int = None, chunk_size: int = 1000) -> int:
+    """
+    Пересчитывает таблицу похожих товаров. По умолчанию только для товаров,
+    затронутых изменениями с прошлого расчета (см. products_to_refresh)
+    :param full: пересчитать весь каталог
+    :param count: кол-во похожих товаров, по умолчанию RELATED_PRODUCTS_COUNT
+    :param chunk_size: кол-во товаров, строки которых записываются в одной транзакции
+    :return: кол-во пересчитанных товаров
+    """
+    count = count or settings.RELATED_PRODUCTS_COUNT
+    # время берется до чтения товаров: товары, измененные во время расчета, попадут в следующий
+    computed_at = timezone.now()
+    matrix = FeatureMatrix.load()
+    if full:
+        RelatedProduct.objects.all().delete()
+        refresh = set(matrix.ids.tolist())
+    else:
+        refresh = products_to_refresh(matrix, count)
+    positions = np.array(sorted(matrix.positions[pk] for pk in refresh if pk in matrix.positions), dtype=np.int64)
+
+    total = 0
+    chunk = {}
+    for product_id, neighbours in matrix.nearest(positions, count):
+        chunk[product_id] = neighbours
+        if len(chunk) >= chunk_size:
+            total += _save_related(chunk, computed_at)
+            chunk = {}
+    if chunk:
+        total += _save_related(chunk, computed_at)
+    return total
+
+
+def _save_related(chunk: dict, computed_at) -> int:
+    """
+    Заменяет строки похожих товаров пачки товаров в одной транзакции. Строки вставляются одним
+    подготовленным запросом INSERT: bulk_create на сотнях тысяч строк тратит больше времени на подготовку
+    объектов модели, чем база данных на запись
+    :param chunk: словарь {id товара: список пар (id соседа, квадрат расстояния)}
+    :param computed_at: время расчета
+    :return: кол-во товаров пачки
+    """
+    db = connections[router.db_for_write(RelatedProduct)]
+    fields = [RelatedProduct._meta.get_field(name) for name in ('product', 'related', 'rank', 'score', 'computed_at')]
+    sql = (f'INSERT INTO {db.ops.quote_name(RelatedProduct._meta.db_table)} '
+           f'({", ".join(db.ops.quote_name(field.column) for field in fields)}) '
+           f'VALUES ({", ".join(["%s"] * len(fields))})')
+    computed_at = fields[-1].get_db_prep_save(computed_at, db)
+    params = [(product_id, related_id, rank, similarity(distance), computed_at)
+              for product_id, neighbours in chunk.items()
+              for rank, (related_id, distance) in enumerate(neighbours, start=1)]
+    with transaction.atomic(using=db.alias):
+        RelatedProduct.objects.using(db.alias).filter(product_id__in=list(chunk)).delete()
+        with db.cursor() as cursor:
+            cursor.executemany(sql, params)
+        # время расчета у товара меняет ETag его страницы без подзапроса к таблице похожих товаров
+        Product.objects.using(db.alias).filter(pk__in=list(chunk)).update(time_recommendations=computed_at)
+    return len(chunk)
+
+
+def get_related_products(product_id: int, count: int = None) -> list:
+    """
+    Похожие товары для страницы товара: одним запросом по уникальному индексу (product, rank)
+    вместе со строками каталога соседей
+    :param product_id: id товара
+    :param count: кол-во товаров, по умолчанию RELATED_PRODUCTS_COUNT
+    :return: список строк каталога ProductListing
+    """
+    count = count or settings.RELATED_PRODUCTS_COUNT
+    rows = (RelatedProduct.objects.filter(product_id=product_id, rank__lte=count)
+            .select_related('related__listing').order_by('rank'))
+    return [row.related.listing for row in rows if hasattr(row.related, 'listing')]
@@ -0,0 +1,6 @@
+from .backends import get_backend, search_product_ids
+from .cache import cached_search_product_ids, normalize_query, search_cache
+from .planner import SearchPlan, plan_query
+
+__all__ = ('get_backend', 'search_product_ids', 'cached_search_product_ids', 'normalize_query', 'search_cache',
+           'SearchPlan', 'plan_query')
@@ -0,0 +1,187 @@
+import logging
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+
+from shop.models import Product
+from .planner import SearchPlan, SearchBudgetExceeded, plan_query, query_budget
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = 'shop_product_fts'
+
+# веса колонок для bm25 в порядке их объявления в таблице: name, vendor_code, description
+FTS_WEIGHTS = (10.0, 5.0, 1.0)
+
+
+def price_condition(plan: SearchPlan) -> Q:
+    """
+    Условие по цене: цена попадает хотя бы в один из диапазонов плана
+    :param plan: SearchPlan
+    :return: Q
+    """
+    condition = Q()
+    for price_range in plan.price_ranges:
+        condition |= Q(price__gte=price_range.low, price__lte=price_range.high)
+    return condition
+
+
+class SearchBackend:
+    """
+    Базовый класс поискового бэкенда.
+    Бэкенд хранит инвертированный индекс по полям name, vendor_code и description товара
+    """
+
+    def index_products(self, products) -> None:
+        """
+        Добавляет или обновляет товары в индексе
+        :param products: итерируемый набор объектов Product
+        :return: None
+        """
+
+    def remove_products(self, product_ids) -> None:
+        """
+        Удаляет товары из индекса
+        :param product_ids: id удаляемых товаров
+        :return: None
+        """
+
+    def rebuild(self) -> None:
+        """
+        Полностью перестраивает индекс по таблице товаров
+        :return: None
+        """
+
+    def search_terms(self, plan: SearchPlan, limit: int) -> list:
+        """
+        Ищет товары, содержащие все слова плана, с учетом условия по цене
+        :param plan: SearchPlan с непустым списком terms
+        :param limit: максимальное кол-во результатов
+        :return: список id товаров, отсортированный по релевантности
+        """
+        raise NotImplementedError
+
+    def search(self, plan: SearchPlan, limit: int) -> list:
+        """
+        Выполняет план поиска: сначала точные совпадения по артикулу, затем слова и цена
+        :param plan: SearchPlan
+        :param limit: максимальное кол-во результатов
+        :return: список id товаров
+        """
+        product_ids = []
+        if plan.vendor_codes:
+            # точный поиск по уникальному индексу, регистр артикула пользователь может не соблюдать
+            codes = set()
+            for code in plan.vendor_codes:
+                codes.update((code, code.upper(), code.lower()))
+            product_ids.extend(Product.objects.filter(vendor_code__in=codes).values_list('pk', flat=True))
+
+        if plan.terms:
+            found = self.search_terms(plan, limit)
+        elif plan.price_ranges:
+            found = (Product.objects.filter(price_condition(plan)).order_by('price', 'pk')
+                     .values_list('pk', flat=True)[:limit])
+        else:
+            found = []
+
+        seen = set(product_ids)
+        product_ids.extend(pk for pk in found if pk not in seen)
+        return product_ids[:limit]
+
+
+class SqliteFTSBackend(SearchBackend):
+    """
+    Поиск через виртуальную таблицу SQLite FTS5.
+    rowid таблицы совпадает с id товара, ранжирование выполняется функцией bm25
+    """
+
+    def index_products(self, products) -> None:
+        rows = [(p.pk, p.name, p.vendor_code or '', p.description or '') for p in products]
+        if not rows:
+            return
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(row[0],) for row in rows])
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, name, vendor_code, description) VALUES (%s, %s, %s, %s)',
+                rows,
+            )
+
+    def remove_products(self, product_ids) -> None:
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(pk,) for pk in product_ids])
+
+    def rebuild(self) -> None:
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, name, vendor_code, description) '
+                f"SELECT id, name, COALESCE(vendor_code, ''), description FROM {Product._meta.db_table}"
+            )
+
+    def search_terms(self, plan: SearchPlan, limit: int) -> list:
+        weights = ', '.join(str(w) for w in FTS_WEIGHTS)
+        sql = f'SELECT {FTS_TABLE}.rowid FROM {FTS_TABLE} '
+        params = [plan.fts_match()]
+        where = f'{FTS_TABLE} MATCH %s'
+        if plan.price_ranges:
+            # условие по цене проверяется по таблице товаров только для найденных индексом строк
+            product_table = Product._meta.db_table
+            sql += f'JOIN {product_table} ON {product_table}.id = {FTS_TABLE}.rowid '
+            ranges = []
+            for price_range in plan.price_ranges:
+                ranges.append(f'{product_table}.price BETWEEN %s AND %s')
+                params.extend([str(price_range.low), str(price_range.high)])
+            where += ' AND ({})'.format(' OR '.join(ranges))
+        sql += f'WHERE {where} ORDER BY bm25({FTS_TABLE}, {weights}) LIMIT %s'
+        params.append(limit)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [row[0] for row in cursor.fetchall()]
+
+
+class FallbackBackend(SearchBackend):
+    """
+    Поиск для СУБД без FTS5: каждое слово ищется по name, vendor_code и description через icontains.
+    Отдельный индекс не ведется
+    """
+
+    def search_terms(self, plan: SearchPlan, limit: int) -> list:
+        condition = Q()
+        for term in plan.terms:
+            condition &= (Q(name__icontains=term) | Q(vendor_code__icontains=term) |
+                          Q(description__icontains=term))
+        condition &= price_condition(plan)
+        return list(Product.objects.filter(condition).values_list('pk', flat=True)[:limit])
+
+
+def get_backend() -> SearchBackend:
+    """
+    Возвращает поисковый бэкенд для текущей базы данных
+    :return: SearchBackend
+    """
+    if connection.vendor == 'sqlite':
+        return SqliteFTSBackend()
+    return FallbackBackend()
+
+
+def search_product_ids(query: str, limit: int = None) -> list:
+    """
+    Ищет товары и возвращает их id в порядке убывания релевантности.
+    Строка запроса разбирается планировщиком, выполнение ограничено лимитом стоимости:
+    если лимит превышен, возвращается пустой список
+    :param query: строка запроса
+    :param limit: максимальное кол-во результатов, по умолчанию SEARCH_MAX_RESULTS
+    :return: список id товаров
+    """
+    if limit is None:
+        limit = settings.SEARCH_MAX_RESULTS
+    plan = plan_query(query)
+    if not plan:
+        return []
+    try:
+        with query_budget():
+            return get_backend().search(plan, limit)
+    except SearchBudgetExceeded:
+        logger.warning('Поисковый запрос %r превысил лимит стоимости', query)
+        return []
@@ -0,0 +1,180 @@
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from django.conf import settings
+
+from ..caching import get_catalog_version
+from .backends import search_product_ids
+from .planner import plan_query
+
+# латинские буквы, которые выглядят как кириллические (после приведения к нижнему регистру)
+LATIN_TO_CYRILLIC = {
+    'a': 'а', 'b': 'в', 'c': 'с', 'e': 'е', 'h': 'н', 'k': 'к', 'm': 'м',
+    'o': 'о', 'p': 'р', 't': 'т', 'x': 'х', 'y': 'у',
+}
+CYRILLIC_TO_LATIN = {cyrillic: latin for latin, cyrillic in LATIN_TO_CYRILLIC.items()}
+
+# таблицы замены для обоих регистров, регистр букв при замене сохраняется
+_TO_CYRILLIC = str.maketrans({**LATIN_TO_CYRILLIC,
+                              **{latin.upper(): cyrillic.upper() for latin, cyrillic in LATIN_TO_CYRILLIC.items()}})
+_TO_LATIN = str.maketrans({**CYRILLIC_TO_LATIN,
+                           **{cyrillic.upper(): latin.upper() for cyrillic, latin in CYRILLIC_TO_LATIN.items()}})
+
+
+def _is_cyrillic(char: str) -> bool:
+    return 'а' <= char <= 'я' or char == 'ё'
+
+
+def _is_latin(char: str) -> bool:
+    return 'a' <= char <= 'z'
+
+
+def _normalize_token(token: str) -> str:
+    """
+    Приводит слово со смешением кириллицы и латиницы к одному алфавиту.
+    Алфавит определяется по буквам, у которых нет двойника; если таких нет, слово считается русским.
+    Слова из одного алфавита не меняются, поэтому артикулы на латинице остаются как есть
+    """
+    lower = token.lower()
+    has_cyrillic = any(_is_cyrillic(char) for char in lower)
+    has_latin = any(_is_latin(char) for char in lower)
+    if not (has_cyrillic and has_latin):
+        return token
+    if any(_is_latin(char) and char not in LATIN_TO_CYRILLIC for char in lower) and \
+            not any(_is_cyrillic(char) and char not in CYRILLIC_TO_LATIN for char in lower):
+        return token.translate(_TO_LATIN)
+    return token.translate(_TO_CYRILLIC)
+
+
+def normalize_query(query: str, keep_case: bool = False) -> str:
+    """
+    Нормализует строку поиска: совместимые символы Unicode, регистр, пробелы и
+    латинские буквы-двойники в русских словах (и наоборот).
+    Одинаковые по смыслу запросы дают одну строку, она же основа ключа кеша
+    :param query: строка из формы поиска
+    :param keep_case: не приводить к нижнему регистру, так строка передается в поиск:
+     артикул ищется в написании пользователя
+    :return: нормализованная строка
+    """
+    query = unicodedata.normalize('NFKC', query or '')
+    if not keep_case:
+        query = query.lower()
+    return ' '.join(_normalize_token(token) for token in query.split())
+
+
+def search_cache_key(query: str) -> str:
+    """
+    Ключ кеша результатов поиска: нормализованная строка в нижнем регистре.
+    Артикул ищется как написан, а также в верхнем и нижнем регистре (см. SearchBackend.search),
+    поэтому результат для артикула в смешанном регистре, например Ab-12, зависит от написания,
+    и такие артикулы добавляются к ключу как есть
+    :param query: строка поиска после normalize_query(query, keep_case=True)
+    :return: ключ или пустая строка для пустого запроса
+    """
+    key = normalize_query(query)
+    mixed_case = [code for code in plan_query(query).vendor_codes if code not in (code.upper(), code.lower())]
+    if key and mixed_case:
+        key = f'{key}|{" ".join(mixed_case)}'
+    return key
+
+
+class SearchResultCache:
+    """
+    Кеш результатов поиска в памяти процесса: вытеснение давно не использованных записей (LRU)
+    и ограниченное время жизни записи (TTL). Каждая запись помечена версией каталога,
+    запись другой версии считается устаревшей
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str, version: int):
+        """
+        Результат из кеша
+        :param key: нормализованный запрос
+        :param version: текущая версия каталога
+        :return: список id товаров или None при промахе
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry_version, expires, value = entry
+                if entry_version == version and expires > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+            return None
+
+    def set(self, key: str, version: int, value: list) -> None:
+        """
+        Сохраняет результат, при переполнении вытесняет давно не использованные записи
+        :param key: нормализованный запрос
+        :param version: версия каталога, по которой получен результат
+        :param value: список id товаров
+        :return: None
+        """
+        with self._lock:
+            self._entries[key] = (version, time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def stats(self) -> dict:
+        """
+        Счетчики кеша для мониторинга
+        :return: словарь со счетчиками и долей попаданий
+        """
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_ratio': round(self.hits / requests, 4) if requests else 0.0,
+            }
+
+
+search_cache = SearchResultCache(settings.SEARCH_CACHE_SIZE, settings.SEARCH_CACHE_TTL)
+
+
+def cached_search_product_ids(query: str) -> list:
+    """
+    Поиск товаров через кеш результатов.
+    Запрос нормализуется без изменения регистра, ключ кеша строится по нормализованной строке
+    (см. search_cache_key), при промахе выполняется search_product_ids по строке в регистре пользователя
+    :param query: строка из формы поиска
+    :return: список id товаров в порядке релевантности
+    """
+    query = normalize_query(query, keep_case=True)
+    key = search_cache_key(query)
+    if not key:
+        return []
+    version = get_catalog_version()
+    product_ids = search_cache.get(key, version)
+    if product_ids is None:
+        # пустой результат из-за превышения лимита стоимости тоже кешируется,
+        # чтобы повторы тяжелого запроса не нагружали базу данных
+        product_ids = search_product_ids(query)
+        search_cache.set(key, version, product_ids)
+    return list(product_ids)
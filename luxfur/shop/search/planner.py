@@ -0,0 +1,173 @@
+import re
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+
+# цена: 1500, 1500.50, 1500,50 или диапазон 1000-2000
+PRICE_RE = re.compile(r'^(\d{1,8}(?:[.,]\d{1,2})?)(?:-(\d{1,8}(?:[.,]\d{1,2})?))?$')
+
+# артикул: латиница, цифры и разделители, обязательно есть цифра и буква или разделитель (M/365-223, sd223444)
+VENDOR_CODE_RE = re.compile(r'^(?=.*\d)(?=.*[A-Za-z/\-_.])[A-Za-z0-9][A-Za-z0-9/\-_.]{2,49}$')
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+# слова короче этой длины ищутся целиком, без поиска по префиксу
+MIN_PREFIX_LENGTH = 2
+
+
+class SearchBudgetExceeded(Exception):
+    """
+    Запрос превысил отведенный ему лимит стоимости
+    """
+
+
+@dataclass(frozen=True)
+class PriceRange:
+    """
+    Диапазон цены, границы включительно
+    """
+    low: Decimal
+    high: Decimal
+
+
+@dataclass
+class SearchPlan:
+    """
+    Разобранный поисковый запрос.
+    Товары ищутся по условию: (все слова terms И цена в одном из price_ranges) ИЛИ артикул из vendor_codes
+    """
+    terms: list = field(default_factory=list)
+    price_ranges: list = field(default_factory=list)
+    vendor_codes: list = field(default_factory=list)
+    truncated: bool = False
+
+    def __bool__(self):
+        return bool(self.terms or self.price_ranges or self.vendor_codes)
+
+    def fts_match(self) -> str:
+        """
+        Выражение MATCH для FTS5: каждое слово в кавычках, длинные слова ищутся по префиксу
+        :return: строка выражения
+        """
+        parts = []
+        for term in self.terms:
+            quoted = '"{}"'.format(term.replace('"', '""'))
+            parts.append(quoted + '*' if len(term) >= MIN_PREFIX_LENGTH else quoted)
+        return ' '.join(parts)
+
+
+def _to_decimal(value: str) -> Decimal:
+    return Decimal(value.replace(',', '.'))
+
+
+def _price_range(token: str):
+    """
+    Превращает числовой токен в диапазон цены.
+    Целое число N означает цены от N до N.99, дробное - точную цену
+    :param token: токен запроса
+    :return: PriceRange или None, если токен не число
+    """
+    match = PRICE_RE.match(token)
+    if not match:
+        return None
+    try:
+        low = _to_decimal(match.group(1))
+        if match.group(2):
+            high = _to_decimal(match.group(2))
+            low, high = min(low, high), max(low, high)
+        elif low == low.to_integral_value() and not re.search(r'[.,]', match.group(1)):
+            high = low + Decimal('0.99')
+        else:
+            high = low
+    except InvalidOperation:
+        return None
+    return PriceRange(low, high)
+
+
+def plan_query(query: str) -> SearchPlan:
+    """
+    Разбирает строку поиска на типизированные условия.
+    Числа становятся диапазонами цены (и кандидатами в артикул), токены вида артикула -
+    точным поиском по уникальному индексу vendor_code, остальное - словами полнотекстового поиска.
+    Длина запроса и кол-во условий ограничены настройками SEARCH_MAX_QUERY_LENGTH и SEARCH_MAX_TERMS
+    :param query: строка из формы поиска
+    :return: SearchPlan
+    """
+    plan = SearchPlan()
+    query = (query or '').strip()
+    if len(query) > settings.SEARCH_MAX_QUERY_LENGTH:
+        query = query[:settings.SEARCH_MAX_QUERY_LENGTH]
+        plan.truncated = True
+
+    budget = settings.SEARCH_MAX_TERMS
+    for token in query.split():
+        if budget <= 0:
+            plan.truncated = True
+            break
+        price_range = _price_range(token)
+        if price_range is not None:
+            if price_range not in plan.price_ranges:
+                plan.price_ranges.append(price_range)
+            if '-' not in token and token not in plan.vendor_codes:
+                plan.vendor_codes.append(token)
+            budget -= 1
+            continue
+        if VENDOR_CODE_RE.match(token):
+            if token not in plan.vendor_codes:
+                plan.vendor_codes.append(token)
+            budget -= 1
+            continue
+        for word in WORD_RE.findall(token):
+            if budget <= 0:
+                plan.truncated = True
+                break
+            word = word.lower()
+            if word not in plan.terms:
+                plan.terms.append(word)
+                budget -= 1
+    return plan
+
+
+@contextmanager
+def query_budget():
+    """
+    Ограничивает стоимость запросов внутри блока.
+    В SQLite выполнение прерывается обработчиком прогресса после SEARCH_COST_LIMIT инструкций виртуальной машины,
+    в PostgreSQL используется statement_timeout = SEARCH_TIMEOUT_MS.
+    При превышении лимита выбрасывается SearchBudgetExceeded, транзакция откатывается до точки сохранения
+    """
+    try:
+        with transaction.atomic():
+            if connection.vendor == 'sqlite':
+                connection.ensure_connection()
+                raw_connection = connection.connection
+                # обработчик вызывается каждые step инструкций, ненулевой ответ прерывает запрос
+                step = max(min(1000, settings.SEARCH_COST_LIMIT), 1)
+                calls_left = [max(settings.SEARCH_COST_LIMIT // step, 1)]
+
+                def progress_handler():
+                    calls_left[0] -= 1
+                    return 1 if calls_left[0] <= 0 else 0
+
+                raw_connection.set_progress_handler(progress_handler, step)
+                try:
+                    yield
+                finally:
+                    raw_connection.set_progress_handler(None, step)
+            else:
+                if connection.vendor == 'postgresql':
+                    with connection.cursor() as cursor:
+                        cursor.execute('SET LOCAL statement_timeout = %s', [settings.SEARCH_TIMEOUT_MS])
+                yield
+    except DatabaseError as exc:
+        if _is_budget_error(exc):
+            raise SearchBudgetExceeded(str(exc)) from exc
+        raise
+
+
+def _is_budget_error(exc: DatabaseError) -> bool:
+    message = str(exc).lower()
+    return 'interrupted' in message or 'statement timeout' in message
@@ -0,0 +1,170 @@
+import bisect
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.urls import reverse
+
+from ..caching import get_catalog_version
+from ..models import Product, Category
+from .cache import normalize_query
+
+logger = logging.getLogger(__name__)
+
+# порядок видов подсказок в выдаче
+KIND_ORDER = {'category': 0, 'product': 1, 'vendor_code': 2}
+
+
+def _word_suffixes(text: str) -> set:
+    """
+    Ключи префиксного поиска для строки: вся строка и ее хвосты с начала каждого слова,
+    поэтому "скоб" находит "Ручка скоба"
+    :param text: название
+    :return: множество нормализованных ключей
+    """
+    words = normalize_query(text).split()
+    return {' '.join(words[i:]) for i in range(len(words))}
+
+
+class SuggestionIndex:
+    """
+    Префиксный индекс названий товаров, категорий и артикулов в памяти процесса.
+    Ключи хранятся в отсортированном списке, подсказки по префиксу находятся двоичным поиском
+    без обращения к базе данных. Изменения товаров и категорий вносятся точечно сигналами,
+    изменения из других процессов подхватываются полной перестройкой по версии каталога
+    """
+
+    def __init__(self):
+        self._keys = []  # отсортированный список (ключ, вид, id)
+        self._items = {}  # (вид, id) -> (подпись, адрес, ключи)
+        self._lock = threading.RLock()
+        self.version = None
+        self.checked_at = 0.0
+
+    def build(self) -> None:
+        """
+        Полная перестройка индекса из базы данных
+        :return: None
+        """
+        version = get_catalog_version()
+        items = {}
+        for pk, name, slug, vendor_code in Product.objects.values_list('pk', 'name', 'slug', 'vendor_code'):
+            items.update(self._product_items(pk, name, slug, vendor_code))
+        for pk, name, slug in Category.objects.values_list('pk', 'name', 'slug'):
+            items.update(self._category_items(pk, name, slug))
+        keys = sorted((key, kind, pk) for (kind, pk), (_, _, item_keys) in items.items() for key in item_keys)
+        with self._lock:
+            self._items = items
+            self._keys = keys
+            self.version = version
+            self.checked_at = time.monotonic()
+
+    def ensure_fresh(self) -> None:
+        """
+        Строит индекс при первом обращении и перестраивает, если каталог изменен в другом процессе.
+        Версия каталога проверяется не чаще раза в SUGGEST_CHECK_INTERVAL секунд
+        :return: None
+        """
+        if self.version is not None and time.monotonic() - self.checked_at < settings.SUGGEST_CHECK_INTERVAL:
+            return
+        if self.version is None or get_catalog_version() != self.version:
+            self.build()
+        else:
+            self.checked_at = time.monotonic()
+
+    def suggest(self, prefix: str, limit: int = None) -> list:
+        """
+        Подсказки по началу строки
+        :param prefix: введенная строка
+        :param limit: максимальное кол-во подсказок, по умолчанию SUGGEST_LIMIT
+        :return: список словарей с label, kind и url
+        """
+        limit = limit or settings.SUGGEST_LIMIT
+        prefix = normalize_query(prefix)
+        if len(prefix) < settings.SUGGEST_MIN_LENGTH:
+            return []
+        self.ensure_fresh()
+        found = []
+        with self._lock:
+            position = bisect.bisect_left(self._keys, (prefix,))
+            seen = set()
+            # ключей одного элемента несколько, поэтому просматриваем с запасом
+            while position < len(self._keys) and len(seen) < limit * 3:
+                key, kind, pk = self._keys[position]
+                if not key.startswith(prefix):
+                    break
+                if (kind, pk) not in seen:
+                    seen.add((kind, pk))
+                    label, url, _ = self._items[(kind, pk)]
+                    found.append({'label': label, 'kind': kind, 'url': url})
+                position += 1
+        found.sort(key=lambda item: (KIND_ORDER[item['kind']], len(item['label']), item['label']))
+        return found[:limit]
+
+    @staticmethod
+    def _product_items(pk, name, slug, vendor_code) -> dict:
+        url = reverse('product_detail', kwargs={'product_slug': slug})
+        items = {('product', pk): (name, url, _word_suffixes(name))}
+        if vendor_code:
+            items[('vendor_code', pk)] = (vendor_code, url, {normalize_query(vendor_code)})
+        return items
+
+    @staticmethod
+    def _category_items(pk, name, slug) -> dict:
+        return {('category', pk): (name, reverse('category', kwargs={'cat_slug': slug}), _word_suffixes(name))}
+
+    def _replace(self, kinds: tuple, pk, items: dict) -> None:
+        with self._lock:
+            if self.version is None:
+                # индекс еще не построен, он будет построен целиком при первом обращении
+                return
+            for kind in kinds:
+                old = self._items.pop((kind, pk), None)
+                if old is None:
+                    continue
+                for key in old[2]:
+                    position = bisect.bisect_left(self._keys, (key, kind, pk))
+                    if position < len(self._keys) and self._keys[position] == (key, kind, pk):
+                        del self._keys[position]
+            for (kind, item_pk), item in items.items():
+                self._items[(kind, item_pk)] = item
+                for key in item[2]:
+                    bisect.insort(self._keys, (key, kind, item_pk))
+
+    def update_product(self, product: Product) -> None:
+        self._replace(('product', 'vendor_code'), product.pk,
+                      self._product_items(product.pk, product.name, product.slug, product.vendor_code))
+
+    def remove_product(self, pk) -> None:
+        self._replace(('product', 'vendor_code'), pk, {})
+
+    def update_category(self, category: Category) -> None:
+        self._replace(('category',), category.pk, self._category_items(category.pk, category.name, category.slug))
+
+    def remove_category(self, pk) -> None:
+        self._replace(('category',), pk, {})
+
+    def mark_current(self) -> None:
+        """
+        Запоминает текущую версию каталога после точечного изменения в этом процессе,
+        чтобы оно не вызвало полную перестройку
+        :return: None
+        """
+        with self._lock:
+            if self.version is not None:
+                self.version = get_catalog_version()
+
+    def warm(self) -> None:
+        """
+        Построение индекса при старте процесса, ошибка базы данных откладывает его до первого обращения
+        :return: None
+        """
+        try:
+            self.build()
+        except DatabaseError as exc:
+            logger.warning('Индекс подсказок не построен при старте: %s', exc)
+
+
+suggestion_index = SuggestionIndex()
@@ -0,0 +1,259 @@
+import threading
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .caching import (bump_catalog_version, bump_group_version, bump_listing_version, bump_price_version,
+                      forget_cached_group)
+from .facets import FACET_FIELDS, apply_facet_delta, instance_facet_values, invalidate_facet_counts, \
+    product_facet_values
+from .listing import refresh_listings, rename_group
+from .models import Product, ProductImage, Category, Material
+from .search import get_backend
+from .search.suggest import suggestion_index
+from .thumbnails import schedule_thumbnails
+
+# id товаров, которые удаляются в текущем потоке
+_deleting = threading.local()
+
+
+def _deleting_product_ids() -> set:
+    if not hasattr(_deleting, 'product_ids'):
+        _deleting.product_ids = set()
+    return _deleting.product_ids
+
+
+@receiver(pre_delete, sender=Product)
+def mark_product_deleting(sender, instance: Product, **kwargs):
+    """
+    Товар удаляется вместе с изображениями галереи: они удаляются каскадно раньше товара,
+    и обновлять после каждого из них товар и его строку каталога незачем
+    """
+    _deleting_product_ids().add(instance.pk)
+
+
+@receiver(post_delete, sender=Product)
+def unmark_product_deleting(sender, instance: Product, **kwargs):
+    _deleting_product_ids().discard(instance.pk)
+
+
+@receiver(pre_save, sender=Product)
+def remember_product_state(sender, instance: Product, **kwargs):
+    """
+    Запоминает значения полей товара до сохранения, чтобы после сохранения
+    обновить только затронутые счетчики фильтров и списки категорий
+    """
+    before = None
+    if instance.pk:
+        before = Product.objects.filter(pk=instance.pk).values(*FACET_FIELDS).first()
+    instance._catalog_state_before = before
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance: Product, **kwargs):
+    """
+    Обновляет поисковый индекс после сохранения товара
+    """
+    get_backend().index_products([instance])
+
+
+@receiver(post_save, sender=Product)
+def update_product_listing(sender, instance: Product, **kwargs):
+    """
+    Пересчитывает строку каталога товара
+    """
+    refresh_listings([instance.pk])
+
+
+@receiver(post_save, sender=Product)
+def update_product_facets(sender, instance: Product, **kwargs):
+    """
+    Обновляет счетчики фильтров после сохранения товара
+    """
+    before = getattr(instance, '_catalog_state_before', None)
+    apply_facet_delta(product_facet_values(before), product_facet_values(instance_facet_values(instance)))
+
+
+@receiver(post_save, sender=Product)
+def invalidate_product_listings(sender, instance: Product, **kwargs):
+    """
+    Сбрасывает кеш страниц категории и материала товара, в том числе прежних, если товар перенесен
+    """
+    before = getattr(instance, '_catalog_state_before', None) or {}
+    for category_id in {before.get('category_id'), instance.category_id}:
+        bump_listing_version('category', category_id)
+    for material_id in {before.get('material_id'), instance.material_id}:
+        bump_listing_version('material', material_id)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=ProductImage)
+def build_thumbnails(sender, instance, **kwargs):
+    """
+    Ставит в очередь построение уменьшенных копий загруженного изображения
+    """
+    if instance.image:
+        schedule_thumbnails(instance.image.name)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_catalog(sender, instance: Product, **kwargs):
+    """
+    Меняет версию каталога, от нее зависят закешированные результаты поиска
+    """
+    bump_catalog_version()
+
+
+@receiver(post_save, sender=Product)
+def invalidate_prices(sender, instance: Product, created=False, **kwargs):
+    """
+    Меняет версию цен, если цена товара изменилась
+    """
+    before = getattr(instance, '_catalog_state_before', None)
+    if created or before is None:
+        return
+    # цена могла быть присвоена строкой или числом
+    price = None if instance.price is None else Decimal(str(instance.price))
+    if before['price'] != price:
+        bump_price_version()
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance: Product, **kwargs):
+    """
+    Удаляет товар из поискового индекса
+    """
+    get_backend().remove_products([instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+def remove_product_facets(sender, instance: Product, **kwargs):
+    """
+    Уменьшает счетчики фильтров после удаления товара
+    """
+    apply_facet_delta(product_facet_values(instance_facet_values(instance)), set())
+
+
+@receiver(post_delete, sender=Product)
+def invalidate_deleted_product_listings(sender, instance: Product, **kwargs):
+    """
+    Сбрасывает кеш страниц категории и материала удаленного товара
+    """
+    bump_listing_version('category', instance.category_id)
+    bump_listing_version('material', instance.material_id)
+
+
+@receiver(pre_save, sender=Category)
+@receiver(pre_save, sender=Material)
+def remember_group_slug(sender, instance, **kwargs):
+    """
+    Запоминает прежний slug категории или материала
+    """
+    instance._slug_before = None
+    if instance.pk:
+        instance._slug_before = sender.objects.filter(pk=instance.pk).values_list('slug', flat=True).first()
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Material)
+@receiver(post_delete, sender=Material)
+def refresh_group_caches(sender, instance, **kwargs):
+    """
+    Сбрасывает кеши, в которых хранятся названия категорий и материалов:
+    счетчики фильтров, группу по slug, страницы ее товаров и ETag страниц товаров
+    """
+    invalidate_facet_counts()
+    forget_cached_group(sender, instance.slug, getattr(instance, '_slug_before', None))
+    bump_listing_version(sender._meta.model_name, instance.pk)
+    bump_catalog_version()
+    bump_group_version()
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Material)
+def rename_listing_group(sender, instance, raw=False, **kwargs):
+    """
+    Обновляет название категории или материала в строках каталога.
+    При загрузке фикстур группы загружаются после товаров, поэтому строки их товаров строятся здесь
+    """
+    field = sender._meta.model_name
+    if raw:
+        refresh_listings(Product.objects.filter(**{f'{field}_id': instance.pk}).values_list('pk', flat=True))
+    else:
+        rename_group(field, instance.pk, instance.name)
+
+
+def _update_suggestions(update, *args) -> None:
+    """
+    Вносит изменение в индекс подсказок после фиксации транзакции, чтобы откат не оставил в нем лишнего.
+    Обработчик регистрируется после смены версии каталога, поэтому индекс запоминает уже новую версию
+    """
+    def apply():
+        update(*args)
+        suggestion_index.mark_current()
+
+    transaction.on_commit(apply)
+
+
+@receiver(post_save, sender=Product)
+def update_product_suggestions(sender, instance: Product, **kwargs):
+    """
+    Обновляет подсказки поиска после сохранения товара
+    """
+    _update_suggestions(suggestion_index.update_product, instance)
+
+
+@receiver(post_delete, sender=Product)
+def remove_product_suggestions(sender, instance: Product, **kwargs):
+    """
+    Удаляет товар из подсказок поиска
+    """
+    _update_suggestions(suggestion_index.remove_product, instance.pk)
+
+
+@receiver(post_save, sender=Category)
+def update_category_suggestions(sender, instance: Category, **kwargs):
+    """
+    Обновляет подсказки поиска после сохранения категории
+    """
+    _update_suggestions(suggestion_index.update_category, instance)
+
+
+@receiver(post_delete, sender=Category)
+def remove_category_suggestions(sender, instance: Category, **kwargs):
+    """
+    Удаляет категорию из подсказок поиска
+    """
+    _update_suggestions(suggestion_index.remove_category, instance.pk)
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def touch_product(sender, instance: ProductImage, **kwargs):
+    """
+    Обновляет время изменения товара при изменении его изображений, от него зависит ETag страницы товара
+    """
+    if instance.product_id in _deleting_product_ids():
+        return
+    Product.objects.filter(pk=instance.product_id).update(time_update=timezone.now())
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def update_listing_image(sender, instance: ProductImage, **kwargs):
+    """
+    Пересчитывает строку каталога товара: изображение галереи заменяет отсутствующее основное изображение.
+    При удалении самого товара строка удаляется вместе с ним, пересчет вставил бы ее заново
+    """
+    if instance.product_id in _deleting_product_ids():
+        return
+    if not refresh_listings([instance.product_id]):
+        return
+    groups = Product.objects.filter(pk=instance.product_id).values('category_id', 'material_id').first()
+    bump_listing_version('category', groups['category_id'])
+    bump_listing_version('material', groups['material_id'])
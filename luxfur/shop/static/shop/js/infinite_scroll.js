@@ -0,0 +1,43 @@
+// Бесконечная прокрутка каталога: когда блок-маркер .product-list-next попадает в область видимости,
+// следующая страница загружается фрагментом и дописывается в конец списка
+(function () {
+    var list = document.getElementById('product-list');
+    if (!list || !('IntersectionObserver' in window) || !window.fetch) {
+        return;
+    }
+    var pagination = document.querySelector('.pagination');
+    var loading = false;
+
+    var observer = new IntersectionObserver(function (entries) {
+        entries.forEach(function (entry) {
+            if (!entry.isIntersecting || loading) {
+                return;
+            }
+            var marker = entry.target;
+            loading = true;
+            observer.unobserve(marker);
+            fetch(marker.dataset.nextUrl, {headers: {'X-Requested-With': 'XMLHttpRequest'}})
+                .then(function (response) {
+                    return response.text();
+                })
+                .then(function (html) {
+                    marker.remove();
+                    list.insertAdjacentHTML('beforeend', html);
+                    loading = false;
+                    observeMarker();
+                });
+        });
+    }, {rootMargin: '400px'});
+
+    function observeMarker() {
+        var marker = list.querySelector('.product-list-next');
+        if (marker) {
+            observer.observe(marker);
+        }
+    }
+
+    if (pagination && list.querySelector('.product-list-next')) {
+        pagination.style.display = 'none';
+    }
+    observeMarker();
+})();
@@ -0,0 +1,35 @@
+// Подсказки при наборе в строке поиска
+(function () {
+    var input = document.querySelector('input[data-suggest-url]');
+    if (!input || !window.fetch) {
+        return;
+    }
+    var list = document.getElementById(input.getAttribute('list'));
+    var timer = null;
+    var lastQuery = '';
+
+    function render(suggestions) {
+        list.innerHTML = '';
+        suggestions.forEach(function (item) {
+            var option = document.createElement('option');
+            option.value = item.label;
+            list.appendChild(option);
+        });
+    }
+
+    input.addEventListener('input', function () {
+        clearTimeout(timer);
+        var query = input.value.trim();
+        if (query.length < 2 || query === lastQuery) {
+            return;
+        }
+        // запрос отправляется после паузы в наборе, а не на каждую клавишу
+        timer = setTimeout(function () {
+            lastQuery = query;
+            fetch(input.dataset.suggestUrl + '?q=' + encodeURIComponent(query))
+                .then(function (response) { return response.json(); })
+                .then(function (data) { render(data.suggestions); })
+                .catch(function () {});
+        }, 150);
+    });
+})();
@@ -0,0 +1,25 @@
+from django import template
+from django.conf import settings
+
+from shop.thumbnails import thumbnail_urls
+
+register = template.Library()
+
+
+@register.simple_tag
+def thumbnail(image, alias: str) -> dict:
+    """
+    Уменьшенная копия изображения для шаблона.
+    Пока копия не построена, используется исходное изображение
+    :param image: значение ImageField
+    :param alias: размер из THUMBNAIL_SIZES
+    :return: словарь с адресами url (JPEG), webp и размерами width, height
+    """
+    width, height, crop = settings.THUMBNAIL_SIZES[alias]
+    # у копий галереи пропорции исходника, поэтому размеры в разметке задаем только для обрезанных копий
+    sizes = {'width': width, 'height': height} if crop else {'width': None, 'height': None}
+    urls = thumbnail_urls(image, alias)
+    if urls is None:
+        return {'url': image.url if image else settings.DEFAULT_PRODUCT_IMAGE, 'webp': None, **sizes}
+    url, webp = urls
+    return {'url': url, 'webp': webp, **sizes}
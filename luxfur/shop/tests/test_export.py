@@ -0,0 +1,84 @@
+import csv
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from shop.models import Product, Material, Category
+
+
+class ExportCatalogTestCase(TestCase):
+    """
+    Тестируем выгрузку каталога
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.tmp_dir = tempfile.mkdtemp()
+        cls.material = Material.objects.create(name='Латунь', slug='Latun')
+        cls.category = Category.objects.create(name='Ручки для мебели', slug='ruchki-dlya-mebeli')
+        cls.handle = Product.objects.create(name='Ручка скоба', slug='ruchka-skoba', price=220, vendor_code='RSB-1',
+                                            image='product_images/skoba.jpeg', height=3,
+                                            material=cls.material, category=cls.category)
+        cls.knob = Product.objects.create(name='Ручка кнопка', slug='ruchka-knopka', vendor_code='RK-2',
+                                          material=cls.material, category=cls.category)
+        cls.knob.product_image.create(image='product_images/knopka-1.jpeg')
+        cls.staff = get_user_model().objects.create(username='staff', email='staff@example.com', is_staff=True)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(cls.tmp_dir, ignore_errors=True)
+
+    def test_export_command_csv(self) -> None:
+        """
+        Тест выгрузки командой в CSV
+        :return: None
+        """
+        path = os.path.join(self.tmp_dir, 'catalog.csv')
+        call_command('export_catalog', '--output', path, '--base-url', 'https://lux-fur.ru/', stdout=StringIO())
+        with open(path, encoding='utf-8') as file:
+            rows = list(csv.DictReader(file))
+        self.assertEqual([row['vendor_code'] for row in rows], ['RSB-1', 'RK-2'])
+        self.assertEqual(rows[0]['category'], 'ruchki-dlya-mebeli')
+        self.assertEqual(rows[0]['price'], '220.00')
+        self.assertEqual(rows[0]['image'], 'https://lux-fur.ru/media/product_images/skoba.jpeg')
+        self.assertEqual(rows[1]['price'], '')
+        self.assertEqual(rows[1]['gallery'], 'https://lux-fur.ru/media/product_images/knopka-1.jpeg')
+
+    def test_export_reimport_without_changes(self) -> None:
+        """
+        Тест совместимости выгрузки с импортом: повторный импорт ничего не меняет
+        :return: None
+        """
+        for file_format in ('csv', 'jsonl'):
+            path = os.path.join(self.tmp_dir, f'catalog.{file_format}')
+            call_command('export_catalog', '--format', file_format, '--output', path, stdout=StringIO())
+            out = StringIO()
+            call_command('import_catalog', path, stdout=out, stderr=StringIO())
+            self.assertIn('создано: 0, обновлено: 0, без изменений: 2, ошибок: 0', out.getvalue())
+
+    def test_export_view_streams_for_staff(self) -> None:
+        """
+        Тест выгрузки по адресу: только для сотрудников, ответ отдается потоком
+        :return: None
+        """
+        response = self.client.get(reverse('catalog_export'))
+        self.assertEqual(response.status_code, 302)
+
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('catalog_export'), {'format': 'jsonl'})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="catalog.jsonl"')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(rows[1]['gallery'], ['http://testserver/media/product_images/knopka-1.jpeg'])
+
+        response = self.client.get(reverse('catalog_export'), {'format': 'xml'})
+        self.assertEqual(response.status_code, 404)
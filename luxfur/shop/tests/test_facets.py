@@ -0,0 +1,107 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from shop.facets import get_facet_counts, rebuild_facet_counts
+from shop.models import Product, Material, Category, FacetCount
+
+
+class FacetCountTestCase(TestCase):
+    """
+    Тестируем счетчики и фильтры каталога
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.zinc = Material.objects.create(name='Цинк', slug='Zink')
+        cls.brass = Material.objects.create(name='Латунь', slug='Latun')
+        cls.rollers = Category.objects.create(name='Ролики', slug='roliki')
+        cls.handles = Category.objects.create(name='Ручки', slug='ruchki')
+        cls.roller = Product.objects.create(name='Ролик', slug='Rolik', price=250, height=15,
+                                            material=cls.zinc, category=cls.rollers)
+        cls.handle = Product.objects.create(name='Ручка', slug='Ruchka', price='1500', height=3,
+                                            material=cls.brass, category=cls.handles)
+
+    def setUp(self):
+        cache.clear()
+
+    def counts(self, facet: str) -> dict:
+        return dict(FacetCount.objects.filter(facet=facet, count__gt=0).values_list('value', 'count'))
+
+    def test_counts_after_create(self) -> None:
+        """
+        Тест счетчиков после создания товаров
+        :return: None
+        """
+        self.assertEqual(self.counts('category'), {str(self.rollers.pk): 1, str(self.handles.pk): 1})
+        self.assertEqual(self.counts('price'), {'100-500': 1, '1000-5000': 1})
+        self.assertEqual(self.counts('height'), {'0-5': 1, '5-20': 1})
+
+    def test_counts_after_update(self) -> None:
+        """
+        Тест приращения счетчиков при изменении товара
+        :return: None
+        """
+        product = Product.objects.get(pk=self.handle.pk)
+        product.category = self.rollers
+        product.price = 50
+        product.save()
+        self.assertEqual(self.counts('category'), {str(self.rollers.pk): 2})
+        self.assertEqual(self.counts('price'), {'0-100': 1, '100-500': 1})
+
+    def test_counts_after_delete(self) -> None:
+        """
+        Тест счетчиков после удаления товара
+        :return: None
+        """
+        Product.objects.get(pk=self.roller.pk).delete()
+        self.assertEqual(self.counts('material'), {str(self.brass.pk): 1})
+
+    def test_incremental_counts_match_rebuild(self) -> None:
+        """
+        Тест совпадения приращений с полным пересчетом
+        :return: None
+        """
+        incremental = get_facet_counts()
+        rebuild_facet_counts()
+        self.assertEqual(get_facet_counts(), incremental)
+
+    def test_facet_counts_labels(self) -> None:
+        """
+        Тест подписей значений фильтров
+        :return: None
+        """
+        counts = get_facet_counts()
+        self.assertEqual(counts['material'], [(str(self.brass.pk), 'Латунь', 1), (str(self.zinc.pk), 'Цинк', 1)])
+        self.assertEqual(counts['price'], [('100-500', '100 - 500', 1), ('1000-5000', '1000 - 5000', 1)])
+
+    def test_filter_home_page(self) -> None:
+        """
+        Тест фильтрации каталога на главной странице
+        :return: None
+        """
+        response = self.client.get(reverse('home'), {'category': self.rollers.pk})
+        self.assertEqual([p.pk for p in response.context['products']], [self.roller.pk])
+
+        response = self.client.get(reverse('home'), {'price': ['100-500', '1000-5000'], 'height': '0-5'})
+        self.assertEqual([p.pk for p in response.context['products']], [self.handle.pk])
+
+        response = self.client.get(reverse('home'), {'price': 'неизвестно'})
+        self.assertEqual(len(response.context['products']), 2)
+
+        # значения, которые не являются id, отбрасываются, а не приводят к ошибке
+        for value in ('²', '1' * 30, 'abc'):
+            response = self.client.get(reverse('home'), {'category': value})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.context['products']), 2)
+
+    def test_home_page_facets_context(self) -> None:
+        """
+        Тест фильтров в контексте главной страницы
+        :return: None
+        """
+        response = self.client.get(reverse('home'), {'material': self.zinc.pk})
+        material = [facet for facet in response.context['facets'] if facet['name'] == 'material'][0]
+        selected = [choice['label'] for choice in material['choices'] if choice['selected']]
+        self.assertEqual(selected, ['Цинк'])
@@ -0,0 +1,153 @@
+import json
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+
+from shop.caching import get_catalog_version, get_listing_version, get_price_version
+from shop.facets import get_facet_counts
+from shop.importer import make_slug
+from shop.models import Product, Material, Category
+from shop.search import search_product_ids
+from shop.tests.utils import eval_in_other_process
+
+
+class ImportCatalogTestCase(TestCase):
+    """
+    Тестируем импорт каталога командой import_catalog
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.tmp_dir = tempfile.mkdtemp()
+        cls.material = Material.objects.create(name='Латунь', slug='Latun')
+        cls.category = Category.objects.create(name='Ручки для мебели', slug='ruchki-dlya-mebeli')
+        cls.product = Product.objects.create(name='Ручка скоба', slug='ruchka-skoba', price=220, vendor_code='RSB-1',
+                                             material=cls.material, category=cls.category)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(cls.tmp_dir, ignore_errors=True)
+
+    def setUp(self) -> None:
+        cache.clear()
+
+    def write(self, name: str, content: str) -> str:
+        path = os.path.join(self.tmp_dir, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def run_import(self, path: str, *args) -> str:
+        out, err = StringIO(), StringIO()
+        call_command('import_catalog', path, *args, stdout=out, stderr=err)
+        return out.getvalue() + err.getvalue()
+
+    def test_make_slug(self) -> None:
+        """
+        Тест транслитерации slug как в админке
+        :return: None
+        """
+        self.assertEqual(make_slug('Ролики мебельные'), 'roliki-mebelnye')
+        self.assertEqual(make_slug('Цинк'), 'cink')
+        self.assertEqual(make_slug('!!!'), 'product')
+
+    def test_import_csv_creates_and_updates(self) -> None:
+        """
+        Тест создания новых товаров и обновления существующих по артикулу
+        :return: None
+        """
+        path = self.write('catalog.csv',
+                          'vendor_code,name,price,quantity,category,material,height\n'
+                          'RSB-1,Ручка скоба хром,"250,50",3,ruchki-dlya-mebeli,Латунь,4\n'
+                          'RT-2,Ручка скоба,100,,Ручки для мебели,Цинк,1\n'
+                          'RT-3,Ролик,xx,1,Ролики,Цинк,1\n'
+                          ',Без артикула,1,1,Ролики,Цинк,1\n')
+        output = self.run_import(path, '--chunk-size', '1')
+
+        product = Product.objects.get(pk=self.product.pk)
+        self.assertEqual(product.name, 'Ручка скоба хром')
+        self.assertEqual(product.price, Decimal('250.50'))
+        self.assertEqual(product.slug, 'ruchka-skoba')
+
+        created = Product.objects.get(vendor_code='RT-2')
+        # slug названия занят, к нему добавляется артикул
+        self.assertEqual(created.slug, 'ruchka-skoba-rt-2')
+        self.assertIsNone(created.quantity)
+        self.assertEqual(created.category, self.category)
+        self.assertEqual(created.material.slug, 'cink')
+
+        self.assertIn('строка 4: price', output)
+        self.assertIn('строка 5: не указан артикул', output)
+        self.assertIn('создано: 1, обновлено: 1', output)
+        # категория 'Ролики' есть только в строках с ошибками и не создается
+        self.assertFalse(Category.objects.filter(name='Ролики').exists())
+
+    def test_import_slug_from_file(self) -> None:
+        """
+        Тест slug из файла: пробелы и кириллица приводятся к виду slug админки, и страница товара открывается
+        :return: None
+        """
+        path = self.write('slugs.csv', 'vendor_code,name,slug,price,category,material\n'
+                                       'RT-7,Ручка,bad slug,100,ruchki-dlya-mebeli,Latun\n'
+                                       'RT-8,Ручка,Ручка рейлинг,100,ruchki-dlya-mebeli,Latun\n')
+        self.assertIn('создано: 2', self.run_import(path))
+        self.assertEqual(Product.objects.get(vendor_code='RT-7').slug, 'bad-slug')
+        product = Product.objects.get(vendor_code='RT-8')
+        self.assertEqual(product.slug, 'ruchka-rejling')
+        self.assertEqual(self.client.get(product.get_absolute_url()).status_code, 200)
+
+    def test_import_updates_search_and_facets(self) -> None:
+        """
+        Тест обновления поискового индекса и счетчиков фильтров после импорта
+        :return: None
+        """
+        path = self.write('catalog.jsonl',
+                          json.dumps({'vendor_code': 'RT-5', 'name': 'Ручка кнопка', 'price': 90,
+                                      'category': 'ruchki-dlya-mebeli', 'material': 'Latun'},
+                                     ensure_ascii=False) + '\n\n{испорчено\n')
+        output = self.run_import(path)
+        self.assertIn('строка 3:', output)
+
+        product = Product.objects.get(vendor_code='RT-5')
+        self.assertEqual(search_product_ids('кнопка'), [product.pk])
+        self.assertIn((str(self.material.pk), 'Латунь', 2), get_facet_counts()['material'])
+
+    def test_reimport_skips_unchanged_rows(self) -> None:
+        """
+        Тест повторного импорта того же файла: строки без изменений не записываются
+        :return: None
+        """
+        path = self.write('same.csv', 'vendor_code,name,price,category,material\n'
+                                      'RT-6,Ручка,100,ruchki-dlya-mebeli,Latun\n')
+        self.run_import(path)
+        time_update = Product.objects.get(vendor_code='RT-6').time_update
+        output = self.run_import(path)
+        self.assertIn('обновлено: 0, без изменений: 1', output)
+        self.assertEqual(Product.objects.get(vendor_code='RT-6').time_update, time_update)
+
+    def test_import_visible_to_other_processes(self) -> None:
+        """
+        Тест: импорт пишет в обход сигналов, поэтому процессы веб-сервера узнают об изменениях
+        только по версиям каталога, цен и категории в общем кеше
+        :return: None
+        """
+        def versions() -> list:
+            return [get_catalog_version(), get_price_version(), get_listing_version('category', self.category.pk)]
+
+        before = versions()
+        path = self.write('price.csv', 'vendor_code,name,price,category,material\n'
+                                       'RSB-1,Ручка скоба,230,ruchki-dlya-mebeli,Latun\n')
+        self.assertIn('обновлено: 1', self.run_import(path))
+        after = versions()
+        self.assertTrue(all(old != new for old, new in zip(before, after)))
+
+        self.assertEqual(eval_in_other_process(f"[get_catalog_version(), get_price_version(), "
+                                               f"get_listing_version('category', {self.category.pk})]"), after)
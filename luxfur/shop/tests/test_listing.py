@@ -0,0 +1,146 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from shop.caching import get_listing_version
+from shop.models import Product, ProductImage, ProductListing, Material, Category
+from shop.search import search_cache
+
+
+class ProductListingTestCase(TestCase):
+    """
+    Тестируем плоскую таблицу каталога ProductListing
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.material = Material.objects.create(name='Латунь', slug='Latun')
+        cls.category = Category.objects.create(name='Ручки', slug='ruchki')
+        cls.handle = Product.objects.create(name='Ручка скоба', slug='ruchka-skoba', price=220,
+                                            description='Мебельная ручка', image='product_images/skoba.jpeg',
+                                            material=cls.material, category=cls.category)
+        cls.knob = Product.objects.create(name='Ручка кнопка', slug='ruchka-knopka', price=90,
+                                          material=cls.material, category=cls.category)
+
+    def setUp(self) -> None:
+        cache.clear()
+        search_cache.clear()
+
+    def shop_queries(self, queries) -> int:
+        return len([query for query in queries if 'shop_' in query['sql']])
+
+    def test_listing_created_on_save(self) -> None:
+        """
+        Тест строки каталога, созданной при сохранении товара
+        :return: None
+        """
+        listing = ProductListing.objects.get(pk=self.handle.pk)
+        self.assertEqual(listing.url, '/product/ruchka-skoba/')
+        self.assertEqual(listing.category_name, 'Ручки')
+        self.assertEqual(listing.material_name, 'Латунь')
+        self.assertEqual(listing.image.name, 'product_images/skoba.jpeg')
+        self.assertEqual(listing.excerpt_html, '<p>Мебельная ручка</p>')
+        self.assertEqual(listing.price_display, '220,00 руб.')
+
+    def test_listing_updated_on_product_and_group_change(self) -> None:
+        """
+        Тест обновления строки при изменении товара и названия категории
+        :return: None
+        """
+        product = Product.objects.get(pk=self.knob.pk)
+        product.slug = 'knopka'
+        product.price = 95
+        product.save()
+        category = Category.objects.get(pk=self.category.pk)
+        category.name = 'Мебельные ручки'
+        category.save()
+        listing = ProductListing.objects.get(pk=self.knob.pk)
+        self.assertEqual(listing.url, '/product/knopka/')
+        self.assertEqual(listing.price, 95)
+        self.assertEqual(listing.category_name, 'Мебельные ручки')
+
+    def test_gallery_image_used_without_main_image(self) -> None:
+        """
+        Тест основного изображения из галереи для товара без изображения
+        :return: None
+        """
+        image = ProductImage.objects.create(product=self.knob, image='product_images/knopka.jpeg')
+        self.assertEqual(ProductListing.objects.get(pk=self.knob.pk).image.name, 'product_images/knopka.jpeg')
+        image.delete()
+        self.assertEqual(ProductListing.objects.get(pk=self.knob.pk).image.name, '')
+
+    def test_listing_deleted_with_product(self) -> None:
+        """
+        Тест удаления строки вместе с товаром
+        :return: None
+        """
+        Product.objects.get(pk=self.knob.pk).delete()
+        self.assertFalse(ProductListing.objects.filter(pk=self.knob.pk).exists())
+
+    def test_listing_deleted_with_product_images(self) -> None:
+        """
+        Тест удаления товара с изображениями галереи: строка каталога не вставляется заново
+        при каскадном удалении изображений
+        :return: None
+        """
+        ProductImage.objects.create(product=self.knob, image='product_images/knopka.jpeg')
+        ProductImage.objects.create(product=self.knob, image='product_images/knopka-2.jpeg')
+        Product.objects.filter(pk=self.knob.pk).delete()
+        self.assertFalse(ProductListing.objects.filter(pk=self.knob.pk).exists())
+        # внешние ключи в SQLite проверяются при фиксации транзакции, проверяем их сразу
+        connection.check_constraints()
+
+    def test_home_and_search_queries(self) -> None:
+        """
+        Тест главной страницы и выдачи поиска: кол-во запросов не зависит от кол-ва карточек
+        :return: None
+        """
+        self.client.get(reverse('home'))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('home'))
+        # счетчики фильтров из кеша, карточки - одним запросом к строкам каталога
+        self.assertEqual(self.shop_queries(queries), 1)
+        self.assertContains(response, 'Категория: Ручки', count=2)
+
+        self.client.get(reverse('home'), {'search': 'ручка'})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('home'), {'search': 'ручка'})
+        # результат поиска из кеша
+        self.assertEqual(self.shop_queries(queries), 1)
+        self.assertEqual({p.pk for p in response.context['products']}, {self.handle.pk, self.knob.pk})
+
+    def test_rebuild_command(self) -> None:
+        """
+        Тест полного пересчета строк каталога
+        :return: None
+        """
+        ProductListing.objects.filter(pk=self.handle.pk).update(category_name='устарело')
+        version = get_listing_version('category', self.category.pk)
+        call_command('rebuild_product_listings', stdout=StringIO())
+        self.assertEqual(ProductListing.objects.get(pk=self.handle.pk).category_name, 'Ручки')
+        # закешированные страницы категории построены по прежним строкам
+        self.assertNotEqual(get_listing_version('category', self.category.pk), version)
+
+    def test_card_fields(self) -> None:
+        """
+        Тест готовых полей карточки: описание обрезается до 40 слов с сохранением разметки, цена форматируется
+        :return: None
+        """
+        product = Product.objects.get(pk=self.knob.pk)
+        product.description = 'Первый абзац\n\n<b>второй</b> ' + 'слово ' * 50
+        product.price = 1550
+        product.save()
+        listing = ProductListing.objects.get(pk=self.knob.pk)
+        self.assertTrue(listing.excerpt_html.startswith('<p>Первый абзац</p>\n\n<p><b>второй</b> слово'))
+        self.assertTrue(listing.excerpt_html.endswith('слово…</p>'))
+        self.assertEqual(listing.price_display, '1\xa0550,00 руб.')
+
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, '<p>Первый абзац</p>')
+        self.assertContains(response, '1\xa0550,00 руб.')
@@ -97,7 +97,7 @@ class CategoryModelTest(TestCase):
         """
         category = CategoryModelTest.category
         get_absolute_url_cat = category.get_absolute_url()
-        self.assertEqual(get_absolute_url_cat, '/category/first-post/')
+        self.assertEqual(get_absolute_url_cat, '/category/ruchka-dly-dvery/')
 
 
 class MaterialModelTestCase(TestCase):
@@ -177,7 +177,7 @@ class MaterialModelTestCase(TestCase):
         Если не определен urlconf тест покажет ошибку
         :return: None
         """
-        self.assertEqual(MaterialModelTestCase.material.get_absolute_url(), 'material/Latun')
+        self.assertEqual(MaterialModelTestCase.material.get_absolute_url(), '/material/Latun/')
 
 
 class ProductModelTestCase(TestCase):
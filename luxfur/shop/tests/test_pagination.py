@@ -0,0 +1,104 @@
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from shop.models import Product, Material, Category
+from shop.pagination import KeysetPaginator, encode_cursor, decode_cursor
+
+
+@override_settings(CATALOG_PAGE_SIZE=2)
+class KeysetPaginationTestCase(TestCase):
+    """
+    Тестируем постраничный вывод каталога по курсору
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.material = Material.objects.create(name='Цинк', slug='Zink')
+        cls.category = Category.objects.create(name='Ролик для мебели', slug='Rolik-dly-mebely')
+        cls.products = [Product.objects.create(name=f'Ролик {i}', slug=f'Rolik-{i}', price=100 + i,
+                                               material=cls.material, category=cls.category)
+                        for i in range(5)]
+        # порядок каталога: новые товары первыми
+        cls.expected = list(Product.objects.values_list('pk', flat=True))
+
+    def test_cursor_roundtrip(self) -> None:
+        """
+        Тест кодирования и раскодирования курсора
+        :return: None
+        """
+        product = self.products[0]
+        self.assertEqual(decode_cursor(encode_cursor(product.time_create, product.pk)),
+                         (product.time_create, product.pk))
+        self.assertIsNone(decode_cursor('испорченный'))
+
+    def test_walk_forward_and_back(self) -> None:
+        """
+        Тест обхода всех страниц вперед и назад без пропусков и повторов
+        :return: None
+        """
+        paginator = KeysetPaginator(Product.objects.all(), 2)
+        pages = [paginator.page()]
+        while pages[-1].has_next():
+            pages.append(paginator.page(after=pages[-1].next_cursor))
+        self.assertEqual([p.pk for page in pages for p in page], self.expected)
+        self.assertFalse(pages[0].has_previous())
+
+        previous = paginator.page(before=pages[-1].previous_cursor)
+        self.assertEqual([p.pk for p in previous], [p.pk for p in pages[-2]])
+
+    def test_empty_page(self) -> None:
+        """
+        Тест курсора, по которому ничего не нашлось: пустая страница без ссылок на соседние
+        :return: None
+        """
+        paginator = KeysetPaginator(Product.objects.all(), 2)
+        last = Product.objects.get(pk=self.expected[-1])
+        first = Product.objects.get(pk=self.expected[0])
+        for page in (paginator.page(after=encode_cursor(last.time_create, last.pk)),
+                     paginator.page(before=encode_cursor(first.time_create, first.pk))):
+            self.assertEqual(len(page), 0)
+            self.assertFalse(page.has_other_pages())
+            self.assertIsNone(page.next_cursor)
+            self.assertIsNone(page.previous_cursor)
+
+        response = self.client.get(reverse('home'), {'after': encode_cursor(last.time_create, last.pk)})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'rel="next"')
+
+    def test_broken_cursor_returns_first_page(self) -> None:
+        """
+        Тест испорченного курсора: выдается первая страница
+        :return: None
+        """
+        response = self.client.get(reverse('home'), {'after': '!!!'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p.pk for p in response.context['products']], self.expected[:2])
+
+    def test_home_page_links(self) -> None:
+        """
+        Тест ссылок rel=next/prev на главной странице
+        :return: None
+        """
+        response = self.client.get(reverse('home'))
+        self.assertEqual(len(response.context['products']), 2)
+        self.assertNotIn('previous_url', response.context)
+        self.assertContains(response, 'rel="next"')
+
+        response = self.client.get(response.context['next_url'])
+        self.assertEqual([p.pk for p in response.context['products']], self.expected[2:4])
+        self.assertContains(response, 'rel="prev"')
+
+    def test_fragment_endpoint(self) -> None:
+        """
+        Тест фрагмента для бесконечной прокрутки
+        :return: None
+        """
+        response = self.client.get(reverse('home'))
+        fragment_url = response.context['fragment_next_url']
+        self.assertTrue(fragment_url.startswith(reverse('product_list_fragment')))
+
+        response = self.client.get(fragment_url)
+        self.assertTemplateUsed(response, 'shop/includes/product_list.html')
+        self.assertTemplateNotUsed(response, 'base.html')
+        self.assertEqual([p.pk for p in response.context['products']], self.expected[2:4])
@@ -0,0 +1,89 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from shop.models import Product, Material, Category, RelatedProduct
+from shop.related import rebuild_related_products, get_related_products
+
+
+class RelatedProductsTestCase(TestCase):
+    """
+    Тестируем расчет похожих товаров
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.brass = Material.objects.create(name='Латунь', slug='Latun')
+        cls.zinc = Material.objects.create(name='Цинк', slug='cink')
+        cls.handles = Category.objects.create(name='Ручки для мебели', slug='ruchki-dlya-mebeli')
+        cls.rollers = Category.objects.create(name='Ролики', slug='roliki')
+        cls.handle = Product.objects.create(name='Ручка скоба', slug='ruchka-skoba', price=220, height=3,
+                                            material=cls.brass, category=cls.handles)
+        cls.twin = Product.objects.create(name='Ручка скоба 2', slug='ruchka-skoba-2', price=230, height=3,
+                                          material=cls.brass, category=cls.handles)
+        cls.zinc_handle = Product.objects.create(name='Ручка цинк', slug='ruchka-cink', price=220, height=3,
+                                                 material=cls.zinc, category=cls.handles)
+        cls.roller = Product.objects.create(name='Ролик', slug='rolik', price=220, height=3,
+                                            material=cls.brass, category=cls.rollers)
+
+    def related_ids(self, product: Product) -> list:
+        return list(RelatedProduct.objects.filter(product=product).values_list('related_id', flat=True))
+
+    def test_nearest_by_category_material_and_price(self) -> None:
+        """
+        Тест порядка похожих товаров: категория важнее материала, материал важнее небольшой разницы в цене
+        :return: None
+        """
+        self.assertEqual(rebuild_related_products(count=3), 4)
+        self.assertEqual(self.related_ids(self.handle), [self.twin.pk, self.zinc_handle.pk, self.roller.pk])
+        scores = list(RelatedProduct.objects.filter(product=self.handle).values_list('score', flat=True))
+        self.assertEqual(scores, sorted(scores, reverse=True))
+
+    def test_incremental_rebuild(self) -> None:
+        """
+        Тест повторного расчета: пересчитываются только товары, которых касаются изменения
+        :return: None
+        """
+        rebuild_related_products(count=1)
+        self.assertEqual(rebuild_related_products(count=1), 0)
+
+        # ролик переносится в категорию ручек и становится ближайшим к ручке из цинка
+        Product.objects.filter(pk=self.roller.pk).update(category=self.handles, material=self.zinc)
+        Product.objects.get(pk=self.roller.pk).save()
+        refreshed = rebuild_related_products(count=1)
+        self.assertLess(refreshed, 4)
+        self.assertEqual(self.related_ids(self.zinc_handle), [self.roller.pk])
+        self.assertEqual(self.related_ids(self.handle), [self.twin.pk])
+
+    def test_rebuild_after_delete(self) -> None:
+        """
+        Тест пересчета товаров, у которых удален похожий товар
+        :return: None
+        """
+        call_command('rebuild_related_products', '--full', '--top', '1', stdout=StringIO())
+        twin = Product.objects.create(name='Ручка скоба 3', slug='ruchka-skoba-3', price=225, height=3,
+                                      material=self.brass, category=self.handles)
+        rebuild_related_products(count=1)
+        self.assertEqual(self.related_ids(self.handle), [twin.pk])
+        twin.delete()
+        rebuild_related_products(count=1)
+        self.assertEqual(self.related_ids(self.handle), [self.twin.pk])
+
+    def test_detail_page_related_block(self) -> None:
+        """
+        Тест вывода похожих товаров на странице товара одним запросом
+        :return: None
+        """
+        rebuild_related_products(count=2)
+        with CaptureQueriesContext(connection) as queries:
+            related = get_related_products(self.handle.pk, 2)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual([row.pk for row in related], [self.twin.pk, self.zinc_handle.pk])
+
+        response = self.client.get(self.handle.get_absolute_url())
+        self.assertContains(response, 'Похожие товары')
+        self.assertContains(response, self.twin.get_absolute_url())
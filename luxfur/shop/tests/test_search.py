@@ -0,0 +1,348 @@
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, SimpleTestCase, override_settings
+from django.urls import reverse
+
+from shop.models import Product, Material, Category
+from shop.search import search_product_ids, plan_query, cached_search_product_ids, normalize_query, search_cache
+from shop.search.cache import SearchResultCache
+from shop.search.suggest import suggestion_index
+from shop.search.planner import PriceRange
+
+
+class ProductSearchTestCase(TestCase):
+    """
+    Тестируем полнотекстовый поиск товаров
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.material = Material.objects.create(name='Латунь', slug='Latun')
+        cls.category = Category.objects.create(name='Фурнитура', slug='furnitura')
+        cls.handle = Product.objects.create(name='Ручка скоба', slug='ruchka-skoba', price=220,
+                                            vendor_code='RSB-348392', description='Мебельная ручка',
+                                            material=cls.material, category=cls.category)
+        cls.roller = Product.objects.create(name='Ролик для тумбы', slug='rolik-dly-tumby', price=250,
+                                            vendor_code='sd223444', description='Ручка в комплект не входит',
+                                            material=cls.material, category=cls.category)
+
+    def test_search_by_name(self) -> None:
+        """
+        Тест поиска по названию товара без учета регистра
+        :return: None
+        """
+        self.assertEqual(search_product_ids('РОЛИК'), [self.roller.pk])
+
+    def test_search_by_prefix(self) -> None:
+        """
+        Тест поиска по началу слова
+        :return: None
+        """
+        self.assertEqual(search_product_ids('скоб'), [self.handle.pk])
+
+    def test_search_by_vendor_code(self) -> None:
+        """
+        Тест поиска по артикулу
+        :return: None
+        """
+        self.assertEqual(search_product_ids('sd223444'), [self.roller.pk])
+
+    def test_search_ranking(self) -> None:
+        """
+        Тест ранжирования: совпадение в названии важнее совпадения в описании
+        :return: None
+        """
+        self.assertEqual(search_product_ids('ручка'), [self.handle.pk, self.roller.pk])
+
+    def test_index_updated_on_save(self) -> None:
+        """
+        Тест обновления индекса при изменении товара
+        :return: None
+        """
+        product = Product.objects.get(pk=self.roller.pk)
+        product.name = 'Колесо для тумбы'
+        product.save()
+        self.assertEqual(search_product_ids('ролик'), [])
+        self.assertEqual(search_product_ids('колесо'), [self.roller.pk])
+
+    def test_index_updated_on_delete(self) -> None:
+        """
+        Тест удаления товара из индекса
+        :return: None
+        """
+        Product.objects.get(pk=self.handle.pk).delete()
+        self.assertEqual(search_product_ids('ручка'), [self.roller.pk])
+
+    def test_special_characters_in_query(self) -> None:
+        """
+        Тест поиска со служебными символами FTS5 в запросе
+        :return: None
+        """
+        self.assertEqual(search_product_ids('"ролик*'), [self.roller.pk])
+        self.assertEqual(search_product_ids('.*('), [])
+
+    def test_search_by_price(self) -> None:
+        """
+        Тест поиска по цене и диапазону цен
+        :return: None
+        """
+        self.assertEqual(search_product_ids('220'), [self.handle.pk])
+        self.assertEqual(search_product_ids('200-300'), [self.handle.pk, self.roller.pk])
+        self.assertEqual(search_product_ids('ручка 250'), [self.roller.pk])
+
+    def test_search_by_vendor_code_ignores_case(self) -> None:
+        """
+        Тест точного поиска по артикулу без учета регистра
+        :return: None
+        """
+        self.assertEqual(search_product_ids('rsb-348392'), [self.handle.pk])
+
+    @override_settings(SEARCH_COST_LIMIT=1)
+    def test_search_cost_limit(self) -> None:
+        """
+        Тест лимита стоимости: запрос прерывается и возвращает пустой результат
+        :return: None
+        """
+        self.assertEqual(search_product_ids('ручка'), [])
+        self.assertEqual(Product.objects.count(), 2)
+
+    def test_home_view_search(self) -> None:
+        """
+        Тест поиска на главной странице
+        :return: None
+        """
+        response = self.client.get(reverse('home'), {'search': 'ручка'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p.pk for p in response.context['products']], [self.handle.pk, self.roller.pk])
+
+
+class SearchPlannerTestCase(SimpleTestCase):
+    """
+    Тестируем разбор поисковой строки
+    """
+
+    def test_plan_text_terms(self) -> None:
+        """
+        Тест разбора слов: регистр приводится к нижнему, служебные символы отбрасываются
+        :return: None
+        """
+        plan = plan_query('Ручка (скоба|*')
+        self.assertEqual(plan.terms, ['ручка', 'скоба'])
+        self.assertEqual(plan.fts_match(), '"ручка"* "скоба"*')
+
+    def test_plan_price(self) -> None:
+        """
+        Тест разбора цены и диапазона цен
+        :return: None
+        """
+        plan = plan_query('1500 100,50 300-200')
+        self.assertEqual(plan.price_ranges, [PriceRange(Decimal('1500'), Decimal('1500.99')),
+                                             PriceRange(Decimal('100.50'), Decimal('100.50')),
+                                             PriceRange(Decimal('200'), Decimal('300'))])
+        self.assertEqual(plan.terms, [])
+
+    def test_plan_vendor_code(self) -> None:
+        """
+        Тест разбора артикулов
+        :return: None
+        """
+        plan = plan_query('M/365-223 sd223444 ролик')
+        self.assertEqual(plan.vendor_codes, ['M/365-223', 'sd223444'])
+        self.assertEqual(plan.terms, ['ролик'])
+
+    @override_settings(SEARCH_MAX_TERMS=2)
+    def test_plan_terms_limit(self) -> None:
+        """
+        Тест ограничения кол-ва условий в запросе
+        :return: None
+        """
+        plan = plan_query('один два три четыре')
+        self.assertEqual(plan.terms, ['один', 'два'])
+        self.assertTrue(plan.truncated)
+
+    def test_empty_plan(self) -> None:
+        """
+        Тест пустого запроса
+        :return: None
+        """
+        self.assertFalse(plan_query('  ?!  '))
+
+
+class SearchResultCacheTestCase(TestCase):
+    """
+    Тестируем кеш результатов поиска
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.material = Material.objects.create(name='Латунь', slug='Latun')
+        cls.category = Category.objects.create(name='Фурнитура', slug='furnitura')
+        cls.roller = Product.objects.create(name='Ролик для тумбы', slug='rolik-dly-tumby', price=250,
+                                            vendor_code='sd223444', material=cls.material, category=cls.category)
+
+    def setUp(self) -> None:
+        search_cache.clear()
+
+    def test_normalize_query(self) -> None:
+        """
+        Тест нормализации: регистр, пробелы и латинские буквы-двойники в русских словах
+        :return: None
+        """
+        # в слове "Ролик" латинские P и o
+        self.assertEqual(normalize_query('  Pолик   ДЛЯ '), 'ролик для')
+        self.assertEqual(normalize_query('SD223444'), 'sd223444')
+        # в артикуле кириллическая с
+        self.assertEqual(normalize_query('sd2234с4'), 'sd2234c4')
+        # строка для поиска сохраняет регистр, двойники заменяются с сохранением регистра
+        self.assertEqual(normalize_query('  Pолик  Ab-12', keep_case=True), 'Ролик Ab-12')
+
+    def test_cache_hit_for_equivalent_queries(self) -> None:
+        """
+        Тест попадания в кеш для одинаковых после нормализации запросов
+        :return: None
+        """
+        self.assertEqual(cached_search_product_ids('ролик'), [self.roller.pk])
+        with self.assertNumQueries(0):
+            self.assertEqual(cached_search_product_ids('  PОЛИК'), [self.roller.pk])
+        self.assertEqual(search_cache.stats()['hits'], 1)
+        self.assertEqual(search_cache.stats()['misses'], 1)
+
+    def test_mixed_case_vendor_code(self) -> None:
+        """
+        Тест артикула в смешанном регистре: поиск выполняется по строке в регистре пользователя,
+        а запросы, результат которых зависит от регистра, не делят запись кеша
+        :return: None
+        """
+        product = Product.objects.create(name='Петля', slug='petlya', price=40, vendor_code='Ab-12',
+                                         material=self.material, category=self.category)
+        search_cache.clear()
+        self.assertEqual(cached_search_product_ids('Ab-12'), [product.pk])
+        self.assertEqual(cached_search_product_ids('aB-12'), [])
+        with self.assertNumQueries(0):
+            self.assertEqual(cached_search_product_ids('  Ab-12 '), [product.pk])
+
+    def test_cache_invalidated_on_product_save(self) -> None:
+        """
+        Тест сброса кеша при изменении каталога
+        :return: None
+        """
+        self.assertEqual(cached_search_product_ids('тумбы'), [self.roller.pk])
+        product = Product.objects.get(pk=self.roller.pk)
+        product.name = 'Ролик для шкафа'
+        product.save()
+        self.assertEqual(cached_search_product_ids('тумбы'), [])
+
+    def test_lru_and_ttl(self) -> None:
+        """
+        Тест вытеснения давно не использованных записей и истечения времени жизни
+        :return: None
+        """
+        cache = SearchResultCache(max_size=2, ttl=60)
+        cache.set('a', 1, [1])
+        cache.set('b', 1, [2])
+        cache.get('a', 1)
+        cache.set('c', 1, [3])
+        self.assertIsNone(cache.get('b', 1))
+        self.assertEqual(cache.get('a', 1), [1])
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+        cache = SearchResultCache(max_size=2, ttl=0)
+        cache.set('a', 1, [1])
+        self.assertIsNone(cache.get('a', 1))
+        self.assertEqual(cache.stats()['expirations'], 1)
+
+    def test_stats_view_for_staff_only(self) -> None:
+        """
+        Тест страницы счетчиков кеша: доступна только сотрудникам
+        :return: None
+        """
+        response = self.client.get(reverse('search_cache_stats'))
+        self.assertEqual(response.status_code, 302)
+
+        staff = get_user_model().objects.create(username='staff', email='staff@example.com', is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get(reverse('search_cache_stats'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('hit_ratio', response.json())
+
+
+class SearchSuggestionTestCase(TestCase):
+    """
+    Тестируем подсказки при наборе в строке поиска
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.material = Material.objects.create(name='Латунь', slug='Latun')
+        cls.category = Category.objects.create(name='Ролики', slug='roliki')
+        cls.handle = Product.objects.create(name='Ручка скоба', slug='ruchka-skoba', price=220,
+                                            vendor_code='RSB-348392', material=cls.material, category=cls.category)
+        cls.roller = Product.objects.create(name='Ролик для тумбы', slug='rolik-dly-tumby', price=250,
+                                            material=cls.material, category=cls.category)
+
+    def setUp(self) -> None:
+        suggestion_index.build()
+
+    def labels(self, prefix: str) -> list:
+        return [item['label'] for item in suggestion_index.suggest(prefix)]
+
+    def test_suggest_by_prefix(self) -> None:
+        """
+        Тест подсказок по началу названия, слова в названии и артикула
+        :return: None
+        """
+        self.assertEqual(self.labels('рол'), ['Ролики', 'Ролик для тумбы'])
+        self.assertEqual(self.labels('СКОБ'), ['Ручка скоба'])
+        self.assertEqual(self.labels('rsb-34'), ['RSB-348392'])
+        self.assertEqual(self.labels('р'), [])
+
+    def test_suggest_endpoint_without_queries(self) -> None:
+        """
+        Тест ответа подсказок без запросов к базе данных
+        :return: None
+        """
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('search_suggestions'), {'q': 'ручка'})
+        self.assertEqual(response.json()['suggestions'],
+                         [{'label': 'Ручка скоба', 'kind': 'product', 'url': self.handle.get_absolute_url()}])
+
+    def test_incremental_update(self) -> None:
+        """
+        Тест точечного обновления индекса при изменении и удалении товара
+        :return: None
+        """
+        product = Product.objects.get(pk=self.handle.pk)
+        product.name = 'Ручка кнопка'
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+        self.assertEqual(self.labels('скоб'), [])
+        self.assertEqual(self.labels('кноп'), ['Ручка кнопка'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            product.delete()
+        self.assertEqual(self.labels('ручка'), [])
+        self.assertEqual(self.labels('rsb'), [])
+        # после точечного изменения в этом процессе индекс не перестраивается
+        with self.assertNumQueries(0):
+            self.labels('рол')
+
+    @override_settings(SUGGEST_CHECK_INTERVAL=0)
+    def test_rebuilt_after_rebuild_command(self) -> None:
+        """
+        Тест перестройки индекса подсказок после изменения каталога в обход сигналов
+        и команды rebuild_search_index (например, в другом процессе)
+        :return: None
+        """
+        Product.objects.filter(pk=self.handle.pk).update(name='Ручка кнопка')
+        suggestion_index.ensure_fresh()
+        self.assertEqual(self.labels('кноп'), [])
+
+        call_command('rebuild_search_index', stdout=StringIO())
+        suggestion_index.ensure_fresh()
+        self.assertEqual(self.labels('кноп'), ['Ручка кнопка'])
@@ -0,0 +1,104 @@
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from shop.models import Product, ProductImage, Material, Category
+from shop.thumbnails import thumbnail_name
+
+# Временная папка для media-файлов, после тестов удаляется
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def make_image(name: str, size=(600, 400), image_format='PNG') -> SimpleUploadedFile:
+    buffer = BytesIO()
+    Image.new('RGBA' if image_format == 'PNG' else 'RGB', size, (200, 30, 30)).save(buffer, image_format)
+    return SimpleUploadedFile(name=name, content=buffer.getvalue(), content_type=f'image/{image_format.lower()}')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_ASYNC=False)
+class ThumbnailTestCase(TestCase):
+    """
+    Тестируем построение уменьшенных копий изображений товаров
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.material = Material.objects.create(name='Цинк', slug='Zink')
+        cls.category = Category.objects.create(name='Ролики', slug='roliki')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create_product(self, slug: str) -> Product:
+        with self.captureOnCommitCallbacks(execute=True):
+            return Product.objects.create(name='Ролик', slug=slug, price=250, image=make_image(f'{slug}.png'),
+                                          material=self.material, category=self.category)
+
+    def test_thumbnails_after_upload(self) -> None:
+        """
+        Тест построения копий всех размеров в JPEG и WebP после загрузки изображения
+        :return: None
+        """
+        product = self.create_product('Rolik')
+        for alias, (width, height, crop) in settings.THUMBNAIL_SIZES.items():
+            for extension, image_format in (('jpg', 'JPEG'), ('webp', 'WEBP')):
+                with Image.open(default_storage.path(thumbnail_name(product.image.name, alias, extension))) as image:
+                    self.assertEqual(image.format, image_format)
+                    if crop:
+                        self.assertEqual(image.size, (width, height))
+                    else:
+                        self.assertLessEqual(max(image.size), max(width, height))
+
+    def test_gallery_image_thumbnails(self) -> None:
+        """
+        Тест копий изображений галереи с сохранением пропорций
+        :return: None
+        """
+        product = self.create_product('Rolik-gallery')
+        with self.captureOnCommitCallbacks(execute=True):
+            gallery = ProductImage.objects.create(product=product,
+                                                  image=make_image('big.jpg', (2000, 1000), 'JPEG'))
+        with Image.open(default_storage.path(thumbnail_name(gallery.image.name, 'gallery'))) as image:
+            self.assertEqual(image.size, (800, 400))
+
+    def test_thumbnail_tag(self) -> None:
+        """
+        Тест тега шаблона: копия, если построена, иначе исходное изображение.
+        Наличие копий проверяется одним обращением к хранилищу
+        :return: None
+        """
+        product = self.create_product('Rolik-tag')
+        template = Template("{% load shop_tags %}{% thumbnail image 'card' as thumb %}{{ thumb.url }} {{ thumb.webp }}")
+        with mock.patch.object(default_storage, 'exists', wraps=default_storage.exists) as exists:
+            rendered = template.render(Context({'image': product.image}))
+        self.assertEqual(exists.call_count, 1)
+        self.assertEqual(rendered, f"{default_storage.url(thumbnail_name(product.image.name, 'card'))} "
+                                   f"{default_storage.url(thumbnail_name(product.image.name, 'card', 'webp'))}")
+
+        # WebP строится последней, без нее копии считаются недостроенными
+        default_storage.delete(thumbnail_name(product.image.name, 'card', 'webp'))
+        rendered = template.render(Context({'image': product.image}))
+        self.assertEqual(rendered, f'{product.image.url} None')
+
+    def test_generate_thumbnails_command(self) -> None:
+        """
+        Тест команды, которая достраивает недостающие копии
+        :return: None
+        """
+        product = self.create_product('Rolik-command')
+        name = thumbnail_name(product.image.name, 'cart', 'webp')
+        default_storage.delete(name)
+        call_command('generate_thumbnails', stdout=StringIO())
+        self.assertTrue(default_storage.exists(name))
@@ -1,10 +1,17 @@
-from django.test import TestCase, RequestFactory
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.test import TestCase, RequestFactory, override_settings
 
+from shop.caching import get_listing_page, get_listing_version
 from shop.views import *
 
 from django.urls import reverse
 
+from orders.bought_together import refresh_bought_together
 from shop.models import Product, Material, Category
+from shop.tests.utils import eval_in_other_process
 
 
 class ShopHomeListViewTestCase(TestCase):
@@ -68,14 +75,15 @@ class ShopHomeListViewTestCase(TestCase):
 
     def test_view_get_right_queryset(self) -> None:
         """
-        Тестируем view ShopHome, проверка на получение списка объектов модели Product
+        Тестируем view ShopHome, проверка на получение строк каталога всех товаров в порядке модели Product
         :return: None
         """
         request = RequestFactory().get('')
         test_view = ShopHome()
         test_view.request = request
         queryset = test_view.get_queryset()
-        self.assertQuerysetEqual(queryset, Product.objects.all())
+        self.assertQuerysetEqual(queryset, Product.objects.values_list('pk', flat=True),
+                                 transform=lambda listing: listing.pk)
 
     def test_product_list_exists(self) -> None:
         """
@@ -147,3 +155,227 @@ class DetailProductViewTestCase(TestCase):
         response = self.client.get('/product/Rolik/')
         self.assertIn('product_image', response.context)
         self.assertIn('cart_product_form', response.context)
+
+
+class DetailProductConditionalGetTestCase(TestCase):
+    """
+    Тестируем условные запросы страницы товара
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.test_material = Material.objects.create(name='Цинк', slug='Zink')
+        cls.test_category = Category.objects.create(name='Ролик для мебели', slug='Rolik-dly-mebely')
+        cls.test_product = Product.objects.create(name='Ролик', slug='Rolik', price=1550, material=cls.test_material,
+                                                  category=cls.test_category)
+
+    def get_etag(self) -> str:
+        # первый ответ устанавливает CSRF cookie, которая входит в ETag, поэтому берем ETag второго ответа
+        self.client.get('/product/Rolik/')
+        response = self.client.get('/product/Rolik/')
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def test_validators_in_response(self) -> None:
+        """
+        Тест заголовков ETag и Last-Modified
+        :return: None
+        """
+        response = self.client.get('/product/Rolik/')
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+
+    def test_not_modified(self) -> None:
+        """
+        Тест ответа 304 одним запросом к таблице товаров
+        :return: None
+        """
+        etag = self.get_etag()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/product/Rolik/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len([q for q in queries if 'shop_product' in q['sql']]), 1)
+        self.assertFalse([q for q in queries if 'shop_productimage' in q['sql'] or 'JOIN' in q['sql']])
+
+    def test_not_modified_for_user_without_cart_query(self) -> None:
+        """
+        Тест ответа 304 авторизованному пользователю: корзина в базе данных при этом не читается,
+        а ее изменение меняет ETag
+        :return: None
+        """
+        self.client.force_login(get_user_model().objects.create_user(username='buyer', password='secret-123'))
+        etag = self.get_etag()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/product/Rolik/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse([q for q in queries if 'cart_cartitem' in q['sql']])
+
+        self.client.post(reverse('cart:cart_add', args=[self.test_product.pk]), {'quantity': 1})
+        response = self.client.get('/product/Rolik/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_modified_after_product_change(self) -> None:
+        """
+        Тест смены ETag после изменения товара и его изображений
+        :return: None
+        """
+        etag = self.get_etag()
+        product = Product.objects.get(pk=self.test_product.pk)
+        product.price = 1600
+        product.save()
+        response = self.client.get('/product/Rolik/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        etag = response['ETag']
+        ProductImage.objects.create(product=product)
+        response = self.client.get('/product/Rolik/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_modified_after_group_rename(self) -> None:
+        """
+        Тест смены ETag после переименования категории, название которой выводится на странице
+        :return: None
+        """
+        etag = self.get_etag()
+        category = Category.objects.get(pk=self.test_category.pk)
+        category.name = 'Ролики'
+        category.save()
+        response = self.client.get('/product/Rolik/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_modified_after_recommendations(self) -> None:
+        """
+        Тест смены ETag после расчета товаров, которые покупают вместе
+        :return: None
+        """
+        etag = self.get_etag()
+        refresh_bought_together([self.test_product.pk])
+        response = self.client.get('/product/Rolik/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_modified_after_cart_change(self) -> None:
+        """
+        Тест смены ETag после изменения корзины, которая выводится в шапке страницы
+        :return: None
+        """
+        etag = self.get_etag()
+        self.client.post(reverse('cart:cart_add', args=[self.test_product.pk]), {'quantity': 1})
+        response = self.client.get('/product/Rolik/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Last-Modified', response)
+
+    def test_unknown_product(self) -> None:
+        """
+        Тест несуществующего товара
+        :return: None
+        """
+        response = self.client.get('/product/net-takogo/')
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(CATALOG_PAGE_SIZE=2)
+class CategoryProductsViewTestCase(TestCase):
+    """
+    Тестируем страницы категории и материала
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.test_material = Material.objects.create(name='Цинк', slug='Zink')
+        cls.test_category = Category.objects.create(name='Ролик для мебели', slug='Rolik-dly-mebely')
+        cls.other_category = Category.objects.create(name='Ручки', slug='Ruchki')
+        cls.products = [Product.objects.create(name=f'Ролик {i}', slug=f'Rolik-{i}', price=1550,
+                                               material=cls.test_material, category=cls.test_category)
+                        for i in range(3)]
+        cls.other_product = Product.objects.create(name='Ручка', slug='Ruchka', price=100,
+                                                   material=cls.test_material, category=cls.other_category)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_category_url_exists(self) -> None:
+        """
+        Тест страницы категории по get_absolute_url
+        :return: None
+        """
+        response = self.client.get(self.test_category.get_absolute_url())
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'shop/category.html')
+        self.assertEqual(response.context['title'], 'Ролик для мебели')
+
+    def test_unknown_category(self) -> None:
+        """
+        Тест несуществующей категории
+        :return: None
+        """
+        response = self.client.get(reverse('category', kwargs={'cat_slug': 'net-takoy'}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_category_pages(self) -> None:
+        """
+        Тест постраничного вывода товаров категории
+        :return: None
+        """
+        expected = list(Product.objects.filter(category=self.test_category).values_list('pk', flat=True))
+        first = self.client.get(self.test_category.get_absolute_url())
+        second = self.client.get(self.test_category.get_absolute_url(), {'page': 2})
+        self.assertEqual([p.pk for p in first.context['products']] + [p.pk for p in second.context['products']],
+                         expected)
+        self.assertTrue(first.context['page_obj'].has_next())
+
+    def test_material_page(self) -> None:
+        """
+        Тест страницы материала
+        :return: None
+        """
+        response = self.client.get(self.test_material.get_absolute_url(), {'page': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['page_obj'].paginator.count, 4)
+
+    def test_cached_page_without_queries(self) -> None:
+        """
+        Тест повторного открытия страницы категории: данные берутся из кеша без запросов к товарам
+        :return: None
+        """
+        view = CategoryProducts()
+        view.kwargs = {'cat_slug': self.test_category.slug}
+        view.request = RequestFactory().get('')
+        queryset = view.get_queryset()
+        view.paginate_queryset(queryset, 2)
+        with self.assertNumQueries(0):
+            view.paginate_queryset(view.get_queryset(), 2)
+
+    def test_cache_invalidated_by_product_change(self) -> None:
+        """
+        Тест сброса кеша при изменении товара категории и сохранения кеша при изменении товара другой категории
+        :return: None
+        """
+        url = self.test_category.get_absolute_url()
+        self.client.get(url)
+
+        other = Product.objects.get(pk=self.other_product.pk)
+        other.name = 'Ручка скоба'
+        other.save()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_listing_page('category', self.test_category.pk, None, 1, 2).paginator.count, 3)
+
+        other.category = self.test_category
+        other.save()
+        response = self.client.get(url)
+        self.assertEqual(response.context['page_obj'].paginator.count, 4)
+        self.assertEqual(response.context['products'][0].name, 'Ручка скоба')
+
+    def test_version_shared_between_processes(self) -> None:
+        """
+        Тест общего кеша: версию списка, смененную в этом процессе, видит другой процесс
+        (например, смена из команды импорта видна процессам веб-сервера)
+        :return: None
+        """
+        product = Product.objects.get(pk=self.other_product.pk)
+        product.name = 'Ручка кнопка'
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+        self.assertEqual(eval_in_other_process(f"get_listing_version('category', {self.other_category.pk})"),
+                         get_listing_version('category', self.other_category.pk))
@@ -0,0 +1,30 @@
+import json
+import subprocess
+import sys
+
+from django.conf import settings
+
+# настройки другого процесса: только кеш тестового прогона, без базы данных и настроек сайта
+OTHER_PROCESS_SCRIPT = '''
+import json, sys
+import django
+from django.conf import settings
+settings.configure(CACHES=json.loads(sys.argv[1]))
+django.setup()
+from shop import caching
+print(json.dumps(eval(sys.argv[2], vars(caching))))
+'''
+
+
+def eval_in_other_process(expression: str):
+    """
+    Вычисляет выражение над функциями shop.caching в отдельном процессе с тем же кешем,
+    как это делает другой процесс веб-сервера или команда
+    :param expression: выражение, например "get_catalog_version()"
+    :return: результат выражения
+    """
+    caches = {alias: {**options, 'LOCATION': str(options.get('LOCATION', ''))}
+              for alias, options in settings.CACHES.items()}
+    output = subprocess.run([sys.executable, '-c', OTHER_PROCESS_SCRIPT, json.dumps(caches), expression],
+                            cwd=settings.BASE_DIR, capture_output=True, text=True, check=True).stdout
+    return json.loads(output)
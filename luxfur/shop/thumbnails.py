@@ -0,0 +1,148 @@
+import logging
+import os
+import posixpath
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# форматы копий: (расширение, формат Pillow), WebP строится последней (см. thumbnail_urls)
+THUMBNAIL_FORMATS = (('jpg', 'JPEG'), ('webp', 'WEBP'))
+
+_executor = None
+
+
+def thumbnail_name(name: str, alias: str, extension: str = 'jpg') -> str:
+    """
+    Имя файла уменьшенной копии в хранилище
+    :param name: имя исходного изображения, например product_images/2024/01/01/rolik.png
+    :param alias: размер из THUMBNAIL_SIZES
+    :param extension: jpg или webp
+    :return: например thumbnails/card/product_images/2024/01/01/rolik.jpg
+    """
+    root, _ = posixpath.splitext(name)
+    return posixpath.join(settings.THUMBNAIL_DIR, alias, f'{root}.{extension}')
+
+
+def render_thumbnails(source: str, targets: list, jpeg_quality: int, webp_quality: int) -> int:
+    """
+    Строит уменьшенные копии одного изображения. Работает только с файлами и Pillow,
+    поэтому выполняется в отдельном процессе без обращения к Django
+    :param source: путь к исходному файлу
+    :param targets: список (путь копии, формат Pillow, ширина, высота, обрезать)
+    :param jpeg_quality: качество JPEG
+    :param webp_quality: качество WebP
+    :return: кол-во построенных копий
+    """
+    with Image.open(source) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+        for path, image_format, width, height, crop in targets:
+            if crop:
+                thumbnail = ImageOps.fit(image, (width, height), Image.LANCZOS)
+            else:
+                thumbnail = image.copy()
+                thumbnail.thumbnail((width, height), Image.LANCZOS)
+            if image_format == 'JPEG':
+                if thumbnail.mode == 'RGBA':
+                    # у JPEG нет прозрачности, прозрачный фон заливаем белым
+                    background = Image.new('RGB', thumbnail.size, 'white')
+                    background.paste(thumbnail, mask=thumbnail.getchannel('A'))
+                    thumbnail = background
+                options = {'quality': jpeg_quality, 'optimize': True, 'progressive': True}
+            else:
+                options = {'quality': webp_quality, 'method': 6}
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # пишем во временный файл, чтобы страница не получила недописанную копию
+            tmp_path = f'{path}.tmp'
+            thumbnail.save(tmp_path, image_format, **options)
+            os.replace(tmp_path, path)
+    return len(targets)
+
+
+def _targets(name: str, force: bool = False) -> list:
+    targets = []
+    for alias, (width, height, crop) in settings.THUMBNAIL_SIZES.items():
+        for extension, image_format in THUMBNAIL_FORMATS:
+            path = default_storage.path(thumbnail_name(name, alias, extension))
+            if force or not os.path.exists(path):
+                targets.append((path, image_format, width, height, crop))
+    return targets
+
+
+def generate_thumbnails(name: str, force: bool = False) -> int:
+    """
+    Строит недостающие уменьшенные копии изображения в текущем процессе
+    :param name: имя исходного изображения в хранилище
+    :param force: перестроить существующие копии
+    :return: кол-во построенных копий
+    """
+    targets = _targets(name, force)
+    if not targets:
+        return 0
+    return render_thumbnails(default_storage.path(name), targets,
+                             settings.THUMBNAIL_JPEG_QUALITY, settings.THUMBNAIL_WEBP_QUALITY)
+
+
+def get_executor() -> ProcessPoolExecutor:
+    """
+    Пул процессов для построения копий, создается при первом обращении
+    :return: ProcessPoolExecutor
+    """
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=settings.THUMBNAIL_WORKERS)
+    return _executor
+
+
+def _log_failure(name: str):
+    def callback(future):
+        if future.exception() is not None:
+            logger.error('Не удалось построить уменьшенные копии %s: %s', name, future.exception())
+    return callback
+
+
+def schedule_thumbnails(name: str) -> None:
+    """
+    Ставит построение копий в пул процессов после фиксации транзакции,
+    запрос, загрузивший изображение, не ждет обработки
+    :param name: имя исходного изображения в хранилище
+    :return: None
+    """
+    if not name:
+        return
+
+    def submit():
+        targets = _targets(name)
+        if not targets:
+            return
+        if not settings.THUMBNAIL_ASYNC:
+            generate_thumbnails(name)
+            return
+        future = get_executor().submit(render_thumbnails, default_storage.path(name), targets,
+                                       settings.THUMBNAIL_JPEG_QUALITY, settings.THUMBNAIL_WEBP_QUALITY)
+        future.add_done_callback(_log_failure(name))
+
+    transaction.on_commit(submit)
+
+
+def thumbnail_urls(image, alias: str):
+    """
+    Адреса уменьшенных копий изображения. Наличие копий проверяется одним обращением к хранилищу:
+    render_thumbnails пишет копию WebP после JPEG того же размера, поэтому готовая WebP означает,
+    что готова и JPEG
+    :param image: значение ImageField
+    :param alias: размер из THUMBNAIL_SIZES
+    :return: кортеж (адрес JPEG, адрес WebP) или None, если копии еще не построены
+    """
+    if not image:
+        return None
+    if not default_storage.exists(thumbnail_name(image.name, alias, 'webp')):
+        return None
+    return (default_storage.url(thumbnail_name(image.name, alias, 'jpg')),
+            default_storage.url(thumbnail_name(image.name, alias, 'webp')))
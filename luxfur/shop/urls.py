@@ -4,5 +4,11 @@ from .views import *
 
 urlpatterns = [
     path('', ShopHome.as_view(), name='home'),
+    path('products/more/', ProductListFragment.as_view(), name='product_list_fragment'),
+    path('catalog/export/', catalog_export, name='catalog_export'),
+    path('search/suggest/', search_suggestions, name='search_suggestions'),
+    path('search/stats/', search_cache_stats, name='search_cache_stats'),
     path('product/<slug:product_slug>/', DetailProduct.as_view(), name='product_detail'),
+    path('category/<str:cat_slug>/', CategoryProducts.as_view(), name='category'),
+    path('material/<str:material_slug>/', MaterialProducts.as_view(), name='material'),
 ]
\ No newline at end of file
@@ -1,11 +1,28 @@
-from django.db.models import Q
-from django.http import HttpResponse, HttpRequest
+import hashlib
+import json
+import os
+
+from django.conf import settings
+from django.db.models import Case, When
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import HttpResponse, HttpRequest, Http404, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404
+from django.urls import reverse
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 from django.views.generic import ListView, DetailView
 
 
+from .caching import get_cached_group, get_group_version, get_listing_page, get_user_cart_version
+from .exporter import EXPORT_FORMATS, export_rows, render_export
+from .facets import FacetFilter
 from .models import *
+from .pagination import KeysetPaginator
+from .related import get_related_products
+from .search import cached_search_product_ids, search_cache
+from .search.suggest import suggestion_index
 from cart.forms import CartAddProductForm
+from orders.bought_together import get_bought_together
 
 
 # def index(request: HttpRequest) -> HttpResponse:
@@ -34,9 +51,10 @@ from cart.forms import CartAddProductForm
 
 class ShopHome(ListView):
     """
-    Класс для отображения главной страницы сайта со списком товаров
+    Класс для отображения главной страницы сайта со списком товаров.
+    Карточки строятся по плоской таблице ProductListing без обращения к связанным таблицам
     """
-    model = Product
+    model = ProductListing
     context_object_name = 'products'
     template_name = 'shop/index.html'
     extra_context = {
@@ -45,21 +63,130 @@ class ShopHome(ListView):
     }
 
     def get_queryset(self):
+        self.facet_filter = FacetFilter(self.request.GET)
         query = self.request.GET.get('search')
-        print(query)
         if query:
-            product_list = Product.objects.filter(Q(name__iregex=query) | Q(price__icontains=query))
-            return product_list
+            # поиск по полнотекстовому индексу, товары выдаются в порядке релевантности
+            product_ids = cached_search_product_ids(query)
+            if not product_ids:
+                return ProductListing.objects.none()
+            ranking = Case(*[When(pk=pk, then=position) for position, pk in enumerate(product_ids)])
+            product_list = ProductListing.objects.filter(pk__in=product_ids).order_by(ranking)
+            return self.facet_filter.filter(product_list)
+
+        return self.facet_filter.filter(ProductListing.objects.all())
+
+    def get_paginate_by(self, queryset):
+        if self.request.GET.get('search'):
+            # выдача поиска уже ограничена SEARCH_MAX_RESULTS и упорядочена по релевантности
+            return None
+        return settings.CATALOG_PAGE_SIZE
+
+    def paginate_queryset(self, queryset, page_size):
+        """
+        Постраничный вывод по курсору вместо номера страницы
+        """
+        paginator = KeysetPaginator(queryset, page_size)
+        page = paginator.page(after=self.request.GET.get('after'), before=self.request.GET.get('before'))
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    def get_page_url(self, path: str, direction: str, cursor: str) -> str:
+        """
+        Собирает url соседней страницы, сохраняя остальные параметры запроса
+        :param path: путь страницы
+        :param direction: after или before
+        :param cursor: курсор
+        :return: url
+        """
+        params = self.request.GET.copy()
+        params.pop('after', None)
+        params.pop('before', None)
+        params[direction] = cursor
+        return f'{path}?{params.urlencode()}'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        page = context['page_obj']
+        if page is not None:
+            if page.has_next():
+                context['next_url'] = self.get_page_url(reverse('home'), 'after', page.next_cursor)
+                context['fragment_next_url'] = self.get_page_url(reverse('product_list_fragment'), 'after',
+                                                                 page.next_cursor)
+            if page.has_previous():
+                context['previous_url'] = self.get_page_url(reverse('home'), 'before', page.previous_cursor)
+        context['facets'] = self.facet_filter.facets()
+        context['search'] = self.request.GET.get('search', '')
+        return context
+
+
+class ProductListFragment(ShopHome):
+    """
+    Фрагмент списка товаров для бесконечной прокрутки: только карточки без базового шаблона
+    """
+    template_name = 'shop/includes/product_list.html'
+
+
 
-        return Product.objects.all().select_related('category')
 
 
+def product_validators(request: HttpRequest, product_slug: str):
+    """
+    Данные для проверки условного запроса страницы товара: время изменения товара (меняется и при изменении
+    его изображений) и время расчета рекомендаций. Выбираются одним запросом по уникальному индексу slug
+    без загрузки самого товара, результат запоминается в request, так как нужен и для ETag, и для Last-Modified
+    :param request: HttpRequest
+    :param product_slug: slug товара
+    :return: словарь или None, если товар не найден
+    """
+    if not hasattr(request, '_product_validators'):
+        request._product_validators = (Product.objects.filter(slug=product_slug)
+                                       .values('pk', 'time_update', 'time_recommendations').first())
+    return request._product_validators
+
+
+def is_personalized(request: HttpRequest) -> bool:
+    """
+    Страница содержит данные посетителя: имя пользователя или непустую корзину в шапке
+    """
+    return request.user.is_authenticated or bool(request.session.get(settings.CART_SESSION_ID))
 
 
+def product_etag(request: HttpRequest, product_slug: str):
+    """
+    ETag страницы товара. Кроме данных товара учитывает версию категорий и материалов, названия которых
+    выводятся на странице, а также пользователя, корзину и CSRF cookie. Корзина авторизованного пользователя
+    учитывается по ее версии в кеше, без запроса к таблице корзины
+    """
+    validators = product_validators(request, product_slug)
+    if validators is None:
+        return None
+    if request.user.is_authenticated:
+        cart = get_user_cart_version(request.user.pk)
+    else:
+        cart = json.dumps(request.session.get(settings.CART_SESSION_ID), sort_keys=True, default=str)
+    parts = [
+        validators['pk'], validators['time_update'].isoformat(), validators['time_recommendations'],
+        get_group_version(), request.user.pk, request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''), cart,
+    ]
+    return hashlib.md5(':'.join(str(part) for part in parts).encode()).hexdigest()
 
+
+def product_last_modified(request: HttpRequest, product_slug: str):
+    """
+    Last-Modified страницы товара. Для страниц с данными посетителя не отдается,
+    так как их изменение не отражается во времени изменения товара
+    """
+    validators = product_validators(request, product_slug)
+    if validators is None or is_personalized(request):
+        return None
+    return max(filter(None, (validators['time_update'], validators['time_recommendations'])))
+
+
+@method_decorator(condition(etag_func=product_etag, last_modified_func=product_last_modified), name='get')
 class DetailProduct(DetailView):
     """
-    Клас для отображения детальной информации о товаре
+    Клас для отображения детальной информации о товаре.
+    Поддерживает условные запросы: если страница не изменилась, отдается ответ 304 без рендера шаблона
     """
     context_object_name = 'product'
     template_name = 'shop/product_detail.html'
@@ -74,17 +201,100 @@ class DetailProduct(DetailView):
         product_image = ProductImage.objects.filter(product_id=product)
         context['product_image'] = product_image
         context['cart_product_form'] = cart_product_form
+        context['related_products'] = get_related_products(product.pk)
+        context['bought_together'] = get_bought_together([product.pk])
 
         return context
 
     def get_object(self, queryset=None):
-        return get_object_or_404(Product, slug=self.kwargs[self.slug_url_kwarg])
+        return get_object_or_404(Product.objects.select_related('category', 'material'),
+                                 slug=self.kwargs[self.slug_url_kwarg])
 
 
 
 
 
-class Category(ListView):
-    context_object_name = 'category'
-    slug_url_kwarg = 'category_slug'
+class ProductGroupView(ListView):
+    """
+    Базовый класс страницы со списком товаров одной группы (категории или материала).
+    Страницы списка кешируются для каждой группы и сбрасываются при изменении ее товаров
+    """
+    context_object_name = 'products'
     template_name = 'shop/category.html'
+    group_model = None
+    group_field = None
+    slug_url_kwarg = None
+
+    def get_queryset(self):
+        self.group = get_cached_group(self.group_model, self.kwargs[self.slug_url_kwarg])
+        if self.group is None:
+            raise Http404
+        return ProductListing.objects.filter(**{self.group_field: self.group['pk']})
+
+    def get_paginate_by(self, queryset):
+        return settings.CATALOG_PAGE_SIZE
+
+    def paginate_queryset(self, queryset, page_size):
+        page = get_listing_page(self.group_model._meta.model_name, self.group['pk'], queryset,
+                                self.request.GET.get('page'), page_size)
+        return page.paginator, page, page.object_list, page.has_other_pages()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['group'] = self.group
+        context['title'] = self.group['name']
+        return context
+
+
+class CategoryProducts(ProductGroupView):
+    """
+    Класс для отображения товаров категории
+    """
+    group_model = Category
+    group_field = 'category_id'
+    slug_url_kwarg = 'cat_slug'
+
+
+class MaterialProducts(ProductGroupView):
+    """
+    Класс для отображения товаров из одного материала
+    """
+    group_model = Material
+    group_field = 'material_id'
+    slug_url_kwarg = 'material_slug'
+
+
+@staff_member_required
+def search_cache_stats(request: HttpRequest) -> JsonResponse:
+    """
+    Счетчики кеша результатов поиска текущего процесса для мониторинга
+    :param request: запрос сотрудника
+    :return: JSON со счетчиками
+    """
+    return JsonResponse({'pid': os.getpid(), **search_cache.stats()})
+
+
+def search_suggestions(request: HttpRequest) -> JsonResponse:
+    """
+    Подсказки при наборе в строке поиска из индекса в памяти, без запросов к базе данных
+    :param request: запрос с началом строки в параметре q
+    :return: JSON со списком подсказок
+    """
+    return JsonResponse({'suggestions': suggestion_index.suggest(request.GET.get('q', ''))})
+
+
+@staff_member_required
+def catalog_export(request: HttpRequest) -> HttpResponse:
+    """
+    Выгрузка каталога для партнеров и бухгалтерии. Ответ отдается потоком по мере чтения товаров,
+    поэтому память не зависит от размера каталога
+    :param request: запрос сотрудника, формат в параметре format (csv или jsonl)
+    :return: StreamingHttpResponse с файлом выгрузки
+    """
+    file_format = request.GET.get('format', 'csv')
+    if file_format not in EXPORT_FORMATS:
+        raise Http404('Неизвестный формат выгрузки')
+    rows = export_rows(absolute_url=request.build_absolute_uri)
+    response = StreamingHttpResponse(render_export(file_format, rows), content_type=EXPORT_FORMATS[file_format])
+    response['Content-Disposition'] = f'attachment; filename="catalog.{file_format}"'
+    return response